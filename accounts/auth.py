@@ -0,0 +1,66 @@
+from asgiref.sync import sync_to_async
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+def get_user_id_from_token(raw_token):
+    """
+    Validates a SimpleJWT access token and returns the user ID it was issued for.
+
+    Used where DRF authentication is not available (e.g. WebSocket consumers).
+    The token signature and expiry are verified, no database query is made.
+
+    Args:
+        raw_token (str): The encoded access token.
+
+    Returns:
+        int | None: The user ID, or None if the token is missing or invalid.
+    """
+    if not raw_token:
+        return None
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    return token.get(api_settings.USER_ID_CLAIM)
+
+
+def get_request_user(request):
+    """
+    Authenticates a request to a plain (non DRF) Django view with the DRF authentication classes
+    (settings.REST_FRAMEWORK["DEFAULT_AUTHENTICATION_CLASSES"]), so it accepts the same credentials as the API views.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        CustomUser | None: The authenticated user, or None if the credentials are missing or invalid.
+    """
+    # * Read (and cache) the body first: OAuth2 parses the request data, which consumes the stream *
+    request.body
+    drf_request = Request(
+        request,
+        parsers=[
+            parser_class() for parser_class in drf_settings.DEFAULT_PARSER_CLASSES
+        ],
+        authenticators=[
+            authentication_class()
+            for authentication_class in drf_settings.DEFAULT_AUTHENTICATION_CLASSES
+        ],
+    )
+    try:
+        user = drf_request.user
+    except APIException:
+        return None
+    return user if user.is_authenticated else None
+
+
+async def aget_request_user(request):
+    """
+    Async version of get_request_user(), the authenticators (database queries) run in a thread.
+    """
+    return await sync_to_async(get_request_user)(request)
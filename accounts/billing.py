@@ -0,0 +1,103 @@
+"""
+Stripe Customer of a user, shared by the shop payments and the premium subscription.
+
+The Customer ID is stored on the user (CustomUser.stripe_customer_id) the first time it is needed,
+afterwards no Stripe call is made to find the customer.
+
+Stripe's HTTP client (httpx) is configured here: every network call times out after settings.STRIPE_TIMEOUT seconds
+and is retried by the Stripe library (settings.STRIPE_MAX_RETRIES, with backoff) on connection errors, timeouts,
+rate limits and 5xx. Async views use the *_async methods (e.g. stripe.Customer.create_async), so a slow Stripe
+holds no thread, only a connection of the httpx pool.
+"""
+
+import hashlib
+import json
+import stripe
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .models import CustomUser
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+# ! Pass an idempotency_key to create calls, a timed out request may still succeed at Stripe !
+stripe.default_http_client = stripe.HTTPXClient(
+    timeout=settings.STRIPE_TIMEOUT, allow_sync_methods=True
+)
+stripe.max_network_retries = settings.STRIPE_MAX_RETRIES
+
+
+def customer_idempotency_key(user, create_kwargs):
+    # * Same request (retry / double click) -> same idempotency key -> Stripe returns the same customer *
+    params_hash = hashlib.sha256(
+        json.dumps(create_kwargs, sort_keys=True, default=str).encode()
+    ).hexdigest()[:16]
+    return f"customer-create-{user.pk}-{params_hash}"
+
+
+def store_stripe_customer_id(user, customer_id):
+    """
+    Stores the Stripe Customer ID on the user, unless a concurrent request stored one first.
+
+    Returns:
+        str: The stored Stripe Customer ID.
+    """
+    stored = CustomUser.objects.filter(
+        pk=user.pk, stripe_customer_id__isnull=True
+    ).update(stripe_customer_id=customer_id)
+    if not stored:
+        customer_id = CustomUser.objects.values_list(
+            "stripe_customer_id", flat=True
+        ).get(pk=user.pk)
+    user.stripe_customer_id = customer_id
+    return customer_id
+
+
+def get_stripe_customer_id(user, **create_kwargs):
+    """
+    Returns the Stripe Customer ID of the user, creating the customer at Stripe if needed.
+
+    First use only: looks up the customer by email (customers created before the ID was stored),
+    else creates it, then stores the ID on the user.
+
+    Args:
+        user (CustomUser): The user.
+        **create_kwargs: Extra stripe.Customer.create() params (name, source, ...), only used when the customer is created.
+
+    Returns:
+        str: The Stripe Customer ID.
+    """
+    if user.stripe_customer_id:
+        return user.stripe_customer_id
+
+    existing_customer = stripe.Customer.list(email=user.email, limit=1).data
+    if existing_customer:
+        customer_id = existing_customer[0].id
+    else:
+        customer = stripe.Customer.create(
+            email=user.email,
+            idempotency_key=customer_idempotency_key(user, create_kwargs),
+            **create_kwargs,
+        )
+        customer_id = customer.id
+    return store_stripe_customer_id(user, customer_id)
+
+
+async def aget_stripe_customer_id(user, **create_kwargs):
+    """
+    Async version of get_stripe_customer_id(), Stripe is called with the *_async methods.
+    """
+    if user.stripe_customer_id:
+        return user.stripe_customer_id
+
+    existing_customer = (
+        await stripe.Customer.list_async(email=user.email, limit=1)
+    ).data
+    if existing_customer:
+        customer_id = existing_customer[0].id
+    else:
+        customer = await stripe.Customer.create_async(
+            email=user.email,
+            idempotency_key=customer_idempotency_key(user, create_kwargs),
+            **create_kwargs,
+        )
+        customer_id = customer.id
+    return await sync_to_async(store_stripe_customer_id)(user, customer_id)
@@ -0,0 +1,90 @@
+"""
+Premium entitlement lookups.
+
+Answers "does this user have an active premium subscription?" from the local
+PremiumUser.has_active_subscription column through the cache, instead of calling Stripe on every request.
+
+The column is kept in sync by:
+    - CreateSubscriptionView (on subscribe).
+    - StripeWebhookAPI (Stripe 'customer.subscription.*' events).
+    - 'python manage.py sync_premium_subscriptions' (periodic full sync).
+
+Cached entries are invalidated whenever a PremiumUser is saved or deleted (accounts/signals.py).
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from .models import PremiumUser
+
+
+def entitlement_cache_key(user_id):
+    return f"premium_entitlement_{user_id}"
+
+
+def has_premium_access(user):
+    """
+    Checks if the user has an active premium subscription.
+
+    Args:
+        user (CustomUser | AnonymousUser): The user to check.
+
+    Returns:
+        bool: True if the user is a Premium User with an active subscription.
+    """
+    if user.is_anonymous:
+        return False
+
+    cache_key = entitlement_cache_key(user.pk)
+    has_access = cache.get(cache_key)
+
+    if has_access is None:
+        has_access = PremiumUser.objects.filter(
+            user=user, has_active_subscription=True
+        ).exists()
+        cache.set(cache_key, has_access, settings.PREMIUM_ENTITLEMENT_CACHE_TTL)
+
+    return has_access
+
+
+def invalidate_premium_access(user_id):
+    """
+    Removes the cached entitlement of a user, next lookup reads the database again.
+    """
+    cache.delete(entitlement_cache_key(user_id))
+
+
+def set_subscription_status(stripe_customer_id, stripe_subscription_id, is_active):
+    """
+    Updates the local subscription status of the Premium User(s) of a Stripe Customer.
+
+    Args:
+        stripe_customer_id (str): The Stripe Customer ID.
+        stripe_subscription_id (str): The Stripe Subscription ID the status belongs to.
+        is_active (bool): If the subscription is active.
+
+    Returns:
+        int: Number of Premium Users updated.
+
+    An active subscription always activates the customer. An inactive one only deactivates
+    the customer if it is the subscription stored on the Premium User, so cancelling an old
+    subscription doesn't remove the access given by a newer one.
+    """
+    premium_users = PremiumUser.objects.filter(stripe_customer_id=stripe_customer_id)
+    if is_active:
+        fields = {
+            "stripe_subscription_id": stripe_subscription_id,
+            "has_active_subscription": True,
+        }
+    else:
+        premium_users = premium_users.filter(
+            stripe_subscription_id=stripe_subscription_id
+        )
+        fields = {"has_active_subscription": False}
+
+    updated = 0
+    for premium_user in premium_users:  # save() -> post_save signal invalidates the cache.
+        for field, value in fields.items():
+            setattr(premium_user, field, value)
+        premium_user.save(update_fields=list(fields))
+        updated += 1
+    return updated
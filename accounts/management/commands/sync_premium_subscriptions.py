@@ -0,0 +1,45 @@
+import stripe
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from accounts.models import PremiumUser
+
+
+class Command(BaseCommand):
+    """
+    Syncs PremiumUser.has_active_subscription with Stripe.
+
+    The Stripe webhook keeps the status updated, this command is a periodic safety net
+    (missed webhooks) and should also be run once after the 'has_active_subscription' migration.
+
+    Usage:
+        python manage.py sync_premium_subscriptions
+    """
+
+    help = "Syncs the local premium subscription status of all Premium Users with Stripe."
+
+    def handle(self, *args, **options):
+        stripe.api_key = settings.STRIPE_SECRET_KEY
+        premium_users = PremiumUser.objects.exclude(stripe_customer_id__isnull=True)
+
+        changed = 0
+        failed = 0
+        for premium_user in premium_users.iterator():
+            try:
+                is_active = premium_user.check_stripe_subscription()
+            except stripe.StripeError as e:
+                failed += 1
+                self.stderr.write(f"{premium_user}: {e}")
+                continue
+
+            if premium_user.has_active_subscription != is_active:
+                premium_user.has_active_subscription = is_active
+                premium_user.save(
+                    update_fields=["has_active_subscription"]
+                )  # Signal invalidates the cached entitlement.
+                changed += 1
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Synced Premium Users: {changed} changed, {failed} failed."
+            )
+        )
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:36
+
+from django.db import migrations, models
+
+
+def keep_premium_users_entitled(apps, schema_editor):
+    """
+    Existing premium users keep their access: their status was checked at Stripe on every request until now.
+
+    ! Run 'python manage.py sync_premium_subscriptions' after migrating, it revokes the canceled subscriptions !
+    """
+    PremiumUser = apps.get_model("accounts", "PremiumUser")
+    PremiumUser.objects.exclude(stripe_customer_id__isnull=True).exclude(
+        stripe_customer_id=""
+    ).update(has_active_subscription=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_customuser_address_customuser_phone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='premiumuser',
+            name='has_active_subscription',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.RunPython(keep_premium_users_entitled, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:52
+
+from django.db import migrations, models
+
+
+def copy_premium_customer_ids(apps, schema_editor):
+    """
+    Copies the Stripe Customer IDs of the premium users to their user.
+    """
+    CustomUser = apps.get_model("accounts", "CustomUser")
+    PremiumUser = apps.get_model("accounts", "PremiumUser")
+    customer_ids = dict(
+        PremiumUser.objects.exclude(stripe_customer_id__isnull=True)
+        .exclude(stripe_customer_id="")
+        .values_list("user_id", "stripe_customer_id")
+    )
+    users = CustomUser.objects.filter(pk__in=customer_ids)
+    for user in users:
+        user.stripe_customer_id = customer_ids[user.pk]
+    CustomUser.objects.bulk_update(users, ["stripe_customer_id"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_premiumuser_has_active_subscription'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='stripe_customer_id',
+            field=models.CharField(blank=True, db_index=True, max_length=50, null=True),
+        ),
+        migrations.RunPython(copy_premium_customer_ids, migrations.RunPython.noop),
+    ]
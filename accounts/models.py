@@ -20,6 +20,10 @@ class CustomUser(AbstractUser):
     picture = models.ImageField(upload_to="profile_pictures/", null=True, blank=True)
     address = models.CharField(max_length=1000, null=True, blank=True)
     phone = models.CharField(max_length=20, null=True, blank=True)
+    # * Stripe Customer of the user (shop payments and premium subscription), see accounts/billing.py *
+    stripe_customer_id = models.CharField(
+        max_length=50, db_index=True, null=True, blank=True
+    )
     REQUIRED_FIELDS = [
         "first_name",
         "last_name",
@@ -35,21 +39,29 @@ class CustomUser(AbstractUser):
 
 
 class PremiumUser(models.Model):
+    # Stripe subscription statuses giving premium access ('past_due' -> Stripe's payment retry grace period).
+    ENTITLED_STATUSES = ("active", "trialing", "past_due")
+
     user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE)
     stripe_customer_id = models.CharField(max_length=50, null=True, blank=True)
     stripe_subscription_id = models.CharField(max_length=50, null=True, blank=True)
+    # * Local copy of the Stripe subscription status, kept in sync by the Stripe webhook
+    # * and 'python manage.py sync_premium_subscriptions'. Read through accounts/entitlements.py *
     has_active_subscription = models.BooleanField(default=False)
 
-    def has_active_subscription(self):
+    def check_stripe_subscription(self):
         """
-        This method checks if the user has active subscription or not.
+        This method checks at Stripe if the user has active subscription or not.
+
+        ! Blocking network call to Stripe, do not use on the request path !
+        * Use accounts.entitlements.has_premium_access() instead *
         """
         customer = stripe.Customer.retrieve(
             self.stripe_customer_id, expand=["subscriptions"]
         )
 
         for subscription in customer.subscriptions.data:
-            if subscription.status == "active":
+            if subscription.status in self.ENTITLED_STATUSES:
                 return True
 
         return False
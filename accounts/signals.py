@@ -0,0 +1,13 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import PremiumUser
+from .entitlements import invalidate_premium_access
+
+
+@receiver(post_save, sender=PremiumUser, dispatch_uid="premium_user_saved")
+@receiver(post_delete, sender=PremiumUser, dispatch_uid="premium_user_deleted")
+def invalidate_premium_user_entitlement(sender, instance, **kwargs):
+    """
+    Invalidates the cached premium entitlement of the user whenever its PremiumUser changes.
+    """
+    invalidate_premium_access(instance.user_id)
@@ -1,3 +1,218 @@
-from django.test import TestCase
+from types import SimpleNamespace
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+import stripe
+from .billing import (
+    aget_stripe_customer_id,
+    get_stripe_customer_id,
+    store_stripe_customer_id,
+)
+from .entitlements import has_premium_access
+from .models import CustomUser, PremiumUser
 
-# Create your tests here.
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+def subscription_event(event_type, status, subscription_id="sub_1"):
+    return {
+        "type": event_type,
+        "data": {
+            "object": {"id": subscription_id, "customer": "cus_1", "status": status}
+        },
+    }
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PremiumEntitlementTest(TestCase):
+    """
+    Premium access is read from the cached local subscription status, Stripe is never called per request.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="user@test.com", username="user")
+        self.premium_user = PremiumUser.objects.create(
+            user=self.user,
+            stripe_customer_id="cus_1",
+            stripe_subscription_id="sub_1",
+            has_active_subscription=True,
+        )
+
+    def post_webhook(self, event):
+        with mock.patch.object(stripe.Webhook, "construct_event", return_value=event):
+            return self.client.post(
+                "/premium/webhook/", data="{}", content_type="application/json"
+            )
+
+    @mock.patch.object(stripe.Customer, "retrieve")
+    def test_cached_entitlement(self, retrieve):
+        with self.assertNumQueries(1):
+            self.assertTrue(has_premium_access(self.user))
+        with self.assertNumQueries(0):
+            self.assertTrue(has_premium_access(self.user))
+        retrieve.assert_not_called()
+
+    def test_save_invalidates_entitlement(self):
+        self.assertTrue(has_premium_access(self.user))
+        self.premium_user.has_active_subscription = False
+        self.premium_user.save()
+        self.assertFalse(has_premium_access(self.user))
+
+    def test_webhook_deleted_subscription_revokes_access(self):
+        self.assertTrue(has_premium_access(self.user))
+        response = self.post_webhook(
+            subscription_event("customer.subscription.deleted", "canceled")
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(has_premium_access(self.user))
+
+    def test_webhook_entitled_statuses(self):
+        for status, entitled in (
+            ("trialing", True),
+            ("past_due", True),
+            ("unpaid", False),
+            ("active", True),
+        ):
+            with self.subTest(status=status):
+                self.post_webhook(
+                    subscription_event("customer.subscription.updated", status)
+                )
+                self.assertEqual(has_premium_access(self.user), entitled)
+
+    def test_webhook_old_subscription_keeps_access(self):
+        self.post_webhook(
+            subscription_event("customer.subscription.deleted", "canceled", "sub_0")
+        )
+        self.assertTrue(has_premium_access(self.user))
+
+    def test_webhook_invalid_signature(self):
+        with mock.patch.object(
+            stripe.Webhook,
+            "construct_event",
+            side_effect=stripe.SignatureVerificationError("Invalid", "header"),
+        ):
+            response = self.client.post(
+                "/premium/webhook/", data="{}", content_type="application/json"
+            )
+        self.assertEqual(response.status_code, 400)
+
+    @mock.patch.object(stripe.Customer, "retrieve")
+    def test_sync_command(self, retrieve):
+        retrieve.return_value = SimpleNamespace(
+            subscriptions=SimpleNamespace(data=[SimpleNamespace(status="canceled")])
+        )
+        self.assertTrue(has_premium_access(self.user))
+        call_command("sync_premium_subscriptions", stdout=mock.Mock())
+        self.assertFalse(has_premium_access(self.user))
+
+
+@mock.patch.object(stripe.Customer, "create")
+@mock.patch.object(stripe.Customer, "list")
+class StripeCustomerTest(TestCase):
+    """
+    The Stripe Customer is looked up / created once, afterwards its stored ID is used without calling Stripe.
+    """
+
+    def setUp(self):
+        self.user = CustomUser.objects.create(email="buyer@test.com", username="buyer")
+
+    def mock_stripe(self, list_, create, existing=()):
+        list_.return_value = SimpleNamespace(
+            data=[SimpleNamespace(id=customer_id) for customer_id in existing]
+        )
+        create.return_value = SimpleNamespace(id="cus_new")
+
+    def test_created_once(self, list_, create):
+        self.mock_stripe(list_, create)
+        self.assertEqual(get_stripe_customer_id(self.user, name="Buyer"), "cus_new")
+        self.assertEqual(list_.call_count, 1)
+        self.assertEqual(create.call_count, 1)
+        self.assertEqual(create.call_args.kwargs["name"], "Buyer")
+
+        list_.reset_mock()
+        create.reset_mock()
+        user = CustomUser.objects.get(pk=self.user.pk)
+        for customer_user in (self.user, user):
+            self.assertEqual(get_stripe_customer_id(customer_user), "cus_new")
+        list_.assert_not_called()
+        create.assert_not_called()
+
+    def test_existing_customer_not_created(self, list_, create):
+        self.mock_stripe(list_, create, existing=["cus_old"])
+        self.assertEqual(get_stripe_customer_id(self.user), "cus_old")
+        create.assert_not_called()
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.stripe_customer_id, "cus_old")
+
+    def test_concurrent_store_keeps_first_id(self, list_, create):
+        stale_user = CustomUser.objects.get(pk=self.user.pk)
+        self.assertEqual(store_stripe_customer_id(self.user, "cus_first"), "cus_first")
+        # * A concurrent request created another customer before it saw the stored ID *
+        self.assertEqual(
+            store_stripe_customer_id(stale_user, "cus_second"), "cus_first"
+        )
+        self.assertEqual(stale_user.stripe_customer_id, "cus_first")
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.stripe_customer_id, "cus_first")
+
+    @mock.patch.object(stripe.Customer, "create_async", new_callable=mock.AsyncMock)
+    @mock.patch.object(stripe.Customer, "list_async", new_callable=mock.AsyncMock)
+    async def test_async_created_once(self, list_async, create_async, list_, create):
+        self.mock_stripe(list_async, create_async)
+        self.assertEqual(await aget_stripe_customer_id(self.user), "cus_new")
+        self.assertEqual(list_async.call_count, 1)
+        self.assertEqual(create_async.call_count, 1)
+
+        list_async.reset_mock()
+        create_async.reset_mock()
+        user = await CustomUser.objects.aget(pk=self.user.pk)
+        self.assertEqual(await aget_stripe_customer_id(user), "cus_new")
+        list_async.assert_not_called()
+        create_async.assert_not_called()
+        list_.assert_not_called()
+        create.assert_not_called()
+
+
+class PremiumStatusMigrationTest(TransactionTestCase):
+    """
+    Premium users existing before the local subscription status keep their access after the migration.
+    """
+
+    before = [("accounts", "0006_customuser_address_customuser_phone")]
+    after = [("accounts", "0007_premiumuser_has_active_subscription")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_existing_premium_users_entitled(self):
+        apps = self.migrate(self.before)
+        CustomUser = apps.get_model("accounts", "CustomUser")
+        PremiumUser = apps.get_model("accounts", "PremiumUser")
+        for i, customer_id in enumerate(("cus_1", None)):
+            PremiumUser.objects.create(
+                user=CustomUser.objects.create(
+                    email=f"user{i}@test.com", username=f"user{i}"
+                ),
+                stripe_customer_id=customer_id,
+            )
+
+        apps = self.migrate(self.after)
+        PremiumUser = apps.get_model("accounts", "PremiumUser")
+        self.assertEqual(
+            dict(
+                PremiumUser.objects.values_list(
+                    "stripe_customer_id", "has_active_subscription"
+                )
+            ),
+            {"cus_1": True, None: False},
+        )
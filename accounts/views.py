@@ -1,13 +1,16 @@
 from django.shortcuts import render
-from .models import CustomUser
+from .models import CustomUser, PremiumUser
 from .serializer import CustomUserSerializer
 from rest_framework import generics
 from django.contrib.auth.hashers import make_password
 from rest_framework.pagination import PageNumberPagination
 from django.http import Http404
 from django.core.exceptions import ObjectDoesNotExist
-from rest_framework import status
+from rest_framework import status, views, permissions
 from rest_framework.response import Response
+from django.conf import settings
+from .entitlements import set_subscription_status
+import stripe
 
 
 class AllAccountsListAPI(generics.ListAPIView):
@@ -87,3 +90,47 @@ class DetailAccountByEmail(generics.RetrieveAPIView):
             },
             status=status.HTTP_200_OK,
         )
+
+
+class StripeWebhookAPI(views.APIView):
+    """
+    Receives Stripe webhook events and keeps the local premium subscription status in sync.
+
+    Handled events:
+        - customer.subscription.created
+        - customer.subscription.updated
+        - customer.subscription.deleted
+
+    The request is verified with the 'Stripe-Signature' header and settings.STRIPE_WEBHOOK_SECRET.
+    Configure the endpoint in Stripe Dashboard -> Developers -> Webhooks.
+    """
+
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    subscription_events = (
+        "customer.subscription.created",
+        "customer.subscription.updated",
+        "customer.subscription.deleted",
+    )
+
+    def post(self, request):
+        try:
+            event = stripe.Webhook.construct_event(
+                request.body,
+                request.headers.get("Stripe-Signature", ""),
+                settings.STRIPE_WEBHOOK_SECRET,
+            )
+        except (ValueError, stripe.SignatureVerificationError):
+            return Response(
+                {"error": "Invalid webhook"}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if event["type"] in self.subscription_events:
+            subscription = event["data"]["object"]
+            set_subscription_status(
+                stripe_customer_id=subscription["customer"],
+                stripe_subscription_id=subscription["id"],
+                is_active=subscription["status"] in PremiumUser.ENTITLED_STATUSES,
+            )
+
+        return Response({"received": True}, status=status.HTTP_200_OK)
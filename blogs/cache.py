@@ -0,0 +1,105 @@
+import time
+from urllib.parse import urlencode
+from django.core.cache import cache
+from rest_framework.response import Response
+
+
+def namespace_version_key(namespace):
+    return f"cache:namespace:{namespace}"
+
+
+def _initial_version():
+    # * Time based, so a version key that was evicted can't restart at an old version (stale keys) *
+    return int(time.time() * 1000)
+
+
+def get_namespace_versions(namespaces):
+    """
+    Returns the current version of each namespace, initializing the missing ones.
+
+    Args:
+        namespaces (list): Namespace names.
+
+    Returns:
+        dict: Namespace -> version (int).
+    """
+    keys = {namespace_version_key(namespace): namespace for namespace in namespaces}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, _initial_version(), None)  # Never expires.
+        versions[key] = cache.get(key)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def bump_namespace(*namespaces):
+    """
+    Invalidates every key of the namespaces in O(1) by incrementing their version.
+
+    Old entries are not deleted, they are never read again and expire with their timeout.
+
+    Args:
+        *namespaces (str): Namespace names.
+    """
+    for namespace in namespaces:
+        key = namespace_version_key(namespace)
+        try:
+            cache.incr(key)
+        except ValueError:  # Version key doesn't exist (never used or evicted).
+            cache.add(key, _initial_version(), None)
+
+
+def versioned_key(namespaces, *parts):
+    """
+    Builds a cache key that includes the current version of the namespaces it depends on.
+
+    Args:
+        namespaces (str | list): Namespace(s) the cached data depends on, the key is invalidated when any of them is bumped.
+        *parts: Values identifying the data (view name, kwargs, ...).
+
+    Returns:
+        str: The cache key.
+
+    e.g. versioned_key(["products", "colors"], "product", "shirt") -> "products.1:colors.3:product:shirt"
+    """
+    if isinstance(namespaces, str):
+        namespaces = [namespaces]
+    versions = get_namespace_versions(namespaces)
+    prefix = ":".join(f"{namespace}.{versions[namespace]}" for namespace in namespaces)
+    return ":".join([prefix, *(str(part) for part in parts)])
+
+
+class CachedResponseMixin:
+    """
+    Caches the serialized data of GET responses under namespace versioned keys.
+
+    The key contains the view, its URL kwargs and the sorted query params, so every page / filter is cached separately.
+    Entries are invalidated by bumping one of the 'cache_namespaces' (e.g. from model signals).
+
+    Attributes:
+        cache_namespaces (list): Namespaces the response depends on.
+        cache_timeout (int): Seconds to keep the data.
+    """
+
+    cache_namespaces = []
+    cache_timeout = 60 * 10
+
+    def get_cache_key(self, request):
+        kwargs = urlencode(sorted(self.kwargs.items()))
+        query_params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        return versioned_key(
+            self.cache_namespaces, "view", type(self).__name__, kwargs, query_params
+        )
+
+    def get(self, request, *args, **kwargs):
+        """
+        Overriding GET method to return Cached Data if exists, else create cache.
+        """
+        cache_key = self.get_cache_key(request)
+        data = cache.get(cache_key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(cache_key, response.data, self.cache_timeout)
+        return response
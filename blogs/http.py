@@ -0,0 +1,20 @@
+import json
+
+
+def get_request_data(request):
+    """
+    Parses the body of a request to a plain Django view (JSON or form data), like request.data of DRF views.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        dict | QueryDict | None: The data, or None if the JSON body is invalid.
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
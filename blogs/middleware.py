@@ -0,0 +1,30 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from social_django.middleware import (
+    SocialAuthExceptionMiddleware as BaseSocialAuthExceptionMiddleware,
+)
+
+
+class SocialAuthExceptionMiddleware(BaseSocialAuthExceptionMiddleware):
+    """
+    social_django's SocialAuthExceptionMiddleware, usable by async requests.
+
+    The original middleware is sync only, so Django runs the whole middleware chain (and every async view)
+    in a thread per request. It only has a process_exception() hook, which Django adapts to both modes itself.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
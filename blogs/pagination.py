@@ -0,0 +1,218 @@
+import base64
+import datetime
+import decimal
+import json
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def seek_filter(ordering, values):
+    """
+    Builds the WHERE for rows after 'values' in 'ordering'.
+
+    e.g. ordering ('-posted_at', 'id') -> posted_at < v1 OR (posted_at = v1 AND id > v2)
+
+    Args:
+        ordering (tuple): Ordering fields ('-' for descending), the last one unique.
+        values (list): Values of the ordering fields of the reference row.
+
+    Returns:
+        Q: The filter.
+    """
+    condition = Q()
+    equal = {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip("-")
+        lookup = "lt" if field.startswith("-") else "gt"
+        condition |= Q(**equal, **{f"{name}__{lookup}": value})
+        equal[name] = value
+    return condition
+
+
+class OptionalPageNumberPagination(PageNumberPagination):
+    """
+    Page Number Pagination which is only applied when the client asks for it.
+
+    GET /...?page_size=10&page=2 -> paginated response (count, next, previous, results).
+    GET /... -> un-paginated list, same as pagination_class = None (existing clients keep working).
+    """
+
+    page_size = None
+    page_size_query_param = "page_size"
+    max_page_size = 100
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek / cursor) pagination.
+
+    Pages are fetched with a WHERE on the ordering fields of the last / first row of the
+    current page instead of OFFSET, and no COUNT(*) query is run.
+    Cursors are opaque (base64 encoded ordering values) and support next and previous pages.
+
+    ordering:
+        Tuple of fields ('-' for descending), the last field must be unique (e.g. 'id') to break ties.
+        Can be overridden per view with a 'keyset_ordering' attribute.
+        ! Ordering fields must not be NULL !
+
+    Response:
+        {"next": url | null, "previous": url | null, "results": [...]}
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    ordering = ("-id",)
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = tuple(getattr(view, "keyset_ordering", self.ordering))
+        values, reverse = self.decode_cursor(request)
+
+        # Previous pages are fetched by seeking in the opposite ordering.
+        ordering = (
+            tuple(self._invert(field) for field in self.ordering)
+            if reverse
+            else self.ordering
+        )
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            # * Values of a tampered cursor that don't fit the ordering fields (e.g. a non-date posted_at) *
+            try:
+                queryset = queryset.filter(self._seek_filter(ordering, values))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[: self.page_size]
+        if reverse:
+            results.reverse()
+
+        if reverse:
+            self.has_next = values is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = values is not None
+
+        self.page = results
+        return results
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                page_size = int(request.query_params[self.page_size_query_param])
+                if page_size > 0:
+                    return min(page_size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        values = [
+            self._serialize_value(getattr(obj, field.lstrip("-")))
+            for field in self.ordering
+        ]
+        data = json.dumps({"v": values, "r": int(reverse)}, separators=(",", ":"))
+        cursor = base64.urlsafe_b64encode(data.encode()).decode()
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param, cursor
+        )
+
+    def decode_cursor(self, request):
+        """
+        Returns:
+            tuple: (ordering values of the cursor row or None, True if it is a previous page cursor)
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            values, reverse = data["v"], bool(data["r"])
+        except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return values, reverse
+
+    @staticmethod
+    def _invert(field):
+        return field[1:] if field.startswith("-") else f"-{field}"
+
+    _seek_filter = staticmethod(seek_filter)
+
+    @staticmethod
+    def _serialize_value(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return value.isoformat()
+        if isinstance(value, decimal.Decimal):
+            return str(value)
+        return value
+
+
+class FeedPagination(PageNumberPagination):
+    """
+    Page Number Pagination (default) with an opt-in keyset mode, selectable per request.
+
+    GET /...?page=2 -> Page Number Pagination (count, next, previous, results), existing clients.
+    GET /...?pagination=cursor or ?cursor=<cursor> -> keyset_pagination_class (next, previous, results),
+        no OFFSET scan and no COUNT(*).
+    """
+
+    keyset_pagination_class = KeysetPagination
+    mode_query_param = "pagination"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if (
+            self.keyset_pagination_class.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == "cursor"
+        ):
+            self.keyset = self.keyset_pagination_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
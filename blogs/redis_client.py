@@ -0,0 +1,22 @@
+def get_redis_connection(alias="default"):
+    """
+    Returns the raw Redis client behind a django_redis cache.
+
+    Used for atomic Redis commands (HINCRBY, RENAME, ...) that the Django cache API doesn't offer.
+
+    Args:
+        alias (str): The cache alias from settings.CACHES.
+
+    Returns:
+        Redis client, or None if the cache is not backed by django_redis (e.g. LocMemCache in development),
+        so callers can fall back to an in-process implementation.
+    """
+    try:
+        from django_redis import get_redis_connection as get_django_redis_connection
+    except ImportError:  # django_redis is not installed.
+        return None
+
+    try:
+        return get_django_redis_connection(alias)
+    except NotImplementedError:  # The cache backend is not django_redis.
+        return None
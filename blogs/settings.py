@@ -1,4 +1,5 @@
 from pathlib import Path
+from urllib.parse import urlparse
 from datetime import timedelta
 import os
 from dotenv import load_dotenv
@@ -54,7 +55,7 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
-    "social_django.middleware.SocialAuthExceptionMiddleware",
+    "blogs.middleware.SocialAuthExceptionMiddleware",  # Async capable social_django middleware.
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -95,6 +96,9 @@ DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # * File test database: the in-memory one fails concurrent writers with "table is locked"
+        # * instead of waiting, like the real database does (e.g. ecommerce stock reservation tests) *
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
@@ -213,9 +217,21 @@ EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER", default="")
 EMAIL_HOST_PASSWORD = os.getenv("EMAIL_HOST_PASSWORD", default="")
 EMAIL_USE_TLS = bool(os.getenv("EMAIL_USE_TLS", default=""))
 
+# Newsletter campaigns (newsletter/sender.py)
+NEWSLETTER_FROM_EMAIL = "admin@blog.site"
+NEWSLETTER_BATCH_SIZE = 100  # Emails sent per SMTP send_messages() call.
+NEWSLETTER_WORKERS = 4  # Sender threads, each with its own SMTP connection.
+
 # Stripe Keys
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY", default="")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", default="")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", default="")
+# Stripe HTTP client (accounts/billing.py)
+STRIPE_TIMEOUT = 10  # Seconds per network call.
+STRIPE_MAX_RETRIES = 2  # Retries (by the Stripe library, with backoff) on timeouts / connection / rate limit errors.
+
+# Seconds a user's premium entitlement is cached (accounts/entitlements.py)
+PREMIUM_ENTITLEMENT_CACHE_TTL = 60 * 15
 
 # To allow all origins
 CORS_ALLOW_ALL_ORIGINS = True
@@ -227,12 +243,62 @@ CORS_ALLOW_CREDENTIALS = True
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media/")
 
+# Redis, shared by the Cache (DB 1) and the Channel Layer (DB 2)
+REDIS_URL = os.getenv("REDIS_URL", default="redis://127.0.0.1:6379")
+
+
+def redis_db_url(db):
+    """
+    Returns REDIS_URL on the given database number, replacing any database of the URL
+    (e.g. redis://host:6379/0?ssl_cert_reqs=none -> redis://host:6379/2?ssl_cert_reqs=none).
+    """
+    return urlparse(REDIS_URL)._replace(path=f"/{db}").geturl()
+
+
 # WebSockets / Channel Config
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer",
-    },
-}
+# * CHANNEL_LAYER_BACKEND=memory (default) -> InMemoryChannelLayer, single process only (development).
+# * CHANNEL_LAYER_BACKEND=redis -> RedisChannelLayer, required to run more than one Daphne worker or to
+# * deliver notifications sent from WSGI processes / management commands to the sockets.
+CHANNEL_LAYER_BACKEND = os.getenv("CHANNEL_LAYER_BACKEND", default="memory")
+
+if CHANNEL_LAYER_BACKEND == "redis":
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [redis_db_url(2)],
+                "prefix": "blogs:channels",
+                # Seconds a socket stays in a group without re-joining (reconnect).
+                "group_expiry": int(
+                    os.getenv("CHANNEL_LAYER_GROUP_EXPIRY", default=60 * 60 * 24)
+                ),
+                # Max messages queued per channel before new ones are dropped (slow clients).
+                "capacity": int(os.getenv("CHANNEL_LAYER_CAPACITY", default=100)),
+                # Seconds a message waits in a channel before it is dropped.
+                "expiry": int(os.getenv("CHANNEL_LAYER_MESSAGE_EXPIRY", default=60)),
+            },
+        },
+    }
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer",
+        },
+    }
+
+# Notification sockets (posts/consumers.py)
+# Seconds between two pings of the server, sockets silent for WEBSOCKET_HEARTBEAT_TIMEOUT seconds are closed.
+WEBSOCKET_HEARTBEAT_INTERVAL = 30
+WEBSOCKET_HEARTBEAT_TIMEOUT = 75
+# Messages queued per socket for slow readers, the oldest are dropped.
+WEBSOCKET_SEND_QUEUE_SIZE = 50
+# Inbound messages per second (token bucket) and burst size, clients exceeding it are disconnected.
+WEBSOCKET_RECEIVE_RATE = 1
+WEBSOCKET_RECEIVE_BURST = 10
+# Max size (chars) of an inbound message, bigger messages are ignored.
+WEBSOCKET_MAX_MESSAGE_SIZE = 1024
+# Seconds between two metrics snapshots of a process (posts/socket_metrics.py).
+WEBSOCKET_METRICS_INTERVAL = 15
 
 AUTHENTICATION_BACKENDS = (
     "drf_social_oauth2.backends.DjangoOAuth2",
@@ -314,10 +380,49 @@ SOCIAL_AUTH_UPDATE_USER_DETAILS_ON_LOGIN = (
 )
 
 
+# Buffered Post view counter (posts/counters.py)
+# Interval (seconds) to flush views from the in-process counter, used when the cache is not Redis.
+# With Redis, views are flushed by: python manage.py flush_post_views --loop
+POST_VIEWS_FLUSH_INTERVAL = 30
+
+# Scheduled posts (posts/scheduler.py)
+# Interval (seconds) to publish due posts from the request path, used when the cache is not Redis.
+# With Redis, posts are published by: python manage.py publish_scheduled_posts --loop
+SCHEDULED_POSTS_PUBLISH_INTERVAL = 60
+
+# Seconds a post detail response is cached (posts/detail_cache.py), entries are also invalidated by signals.
+POST_DETAIL_CACHE_TIMEOUT = 60 * 5
+
+# Post edit history (posts/history.py)
+# Store compact text deltas in PostHistory instead of full copies of the post text,
+# with a full copy every POST_HISTORY_KEYFRAME_INTERVAL snapshots.
+POST_HISTORY_TEXT_DELTAS = os.getenv("POST_HISTORY_TEXT_DELTAS", "False") == "True"
+POST_HISTORY_KEYFRAME_INTERVAL = 10
+
+# Notification dispatcher (posts/dispatcher.py)
+# * redis -> events are queued in Redis and sent by: python manage.py dispatch_notifications --loop
+# * local -> events are sent by a background thread of the process that queued them.
+NOTIFICATION_DISPATCHER = os.getenv(
+    "NOTIFICATION_DISPATCHER",
+    default="redis" if CHANNEL_LAYER_BACKEND == "redis" else "local",
+)
+# Max events saved / sent per batch.
+NOTIFICATION_DISPATCH_BATCH_SIZE = 200
+# Likes / comments of the same target are merged into the recipient's unread notification of the last
+# NOTIFICATION_COALESCE_WINDOW seconds ("@alice and 41 others liked your post"), keeping a sample of the latest actors.
+NOTIFICATION_COALESCE_WINDOW = 60 * 60
+NOTIFICATION_SAMPLE_ACTORS = 3
+# Seconds the unread notification counter is cached (posts/inbox.py), it is then recomputed with a COUNT.
+NOTIFICATION_UNREAD_COUNT_TIMEOUT = 60 * 60
+# Read notifications older than NOTIFICATION_RETENTION_DAYS are deleted by: python manage.py prune_notifications
+# in transactions of NOTIFICATION_PRUNE_CHUNK_SIZE primary keys.
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", 90))
+NOTIFICATION_PRUNE_CHUNK_SIZE = 1000
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": "redis://127.0.0.1:6379/1",  # Storing at DB1
+        "LOCATION": redis_db_url(1),  # Storing at DB1
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
         },
@@ -9,6 +9,7 @@ from rest_framework_simplejwt.views import (
     TokenVerifyView,
 )
 from posts.views import CreateSubscriptionView
+from accounts.views import StripeWebhookAPI
 from django.conf import settings
 from django.conf.urls.static import static
 
@@ -41,6 +42,9 @@ urlpatterns = [
     path(
         "premium/", CreateSubscriptionView.as_view(), name="create-premium-account"
     ),  # Get Premium Post Subscription
+    path(
+        "premium/webhook/", StripeWebhookAPI.as_view(), name="stripe-webhook"
+    ),  # Stripe Subscription Events (keeps Premium status in sync)
     path("shop/", include("ecommerce.urls")),  # ECommerce APIs
     # Simple-JWT APIs
     path("api/token/", TokenObtainPairView.as_view(), name="obtain-token"),
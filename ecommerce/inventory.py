@@ -0,0 +1,72 @@
+"""
+Stock reservation for orders.
+
+Stock is reserved with conditional UPDATEs (stock_quantity >= quantity) instead of read -> subtract -> save,
+so concurrent checkouts can't oversell: the UPDATE locks the row, and an attribute without enough stock
+left is simply not updated.
+"""
+
+from django.db import transaction
+from django.db.models import Case, F, PositiveIntegerField, Q, Value, When
+from blogs.cache import bump_namespace
+from .models import Attribute
+
+
+class OutOfStock(Exception):
+    """
+    Raised when one or more attributes don't have enough stock for the requested quantity.
+
+    Attributes:
+        attribute_ids (list): IDs of the attributes that are out of stock.
+    """
+
+    def __init__(self, attribute_ids):
+        self.attribute_ids = list(attribute_ids)
+        super().__init__(
+            "Product is out of stock or requested quantity is greater than available stock."
+        )
+
+
+def reserve_stock(quantities):
+    """
+    Subtracts the requested quantities from the stock of the attributes, all or nothing.
+
+    All attributes are reserved with a single conditional UPDATE:
+        stock_quantity = stock_quantity - CASE id WHEN ... THEN quantity END
+        WHERE (id = ... AND stock_quantity >= quantity) OR ...
+    If fewer rows than attributes were updated, some attribute is short and the UPDATE is rolled back.
+
+    Args:
+        quantities (dict): Attribute ID -> requested quantity.
+
+    Raises:
+        OutOfStock: If any attribute doesn't have enough stock, nothing is reserved.
+    """
+    if not quantities:
+        return
+    in_stock = Q()
+    subtract = []
+    for attribute_id, quantity in quantities.items():
+        in_stock |= Q(pk=attribute_id, stock_quantity__gte=quantity)
+        subtract.append(When(pk=attribute_id, then=Value(quantity)))
+    try:
+        with transaction.atomic():
+            reserved = Attribute.objects.filter(in_stock).update(
+                stock_quantity=F("stock_quantity")
+                - Case(*subtract, output_field=PositiveIntegerField())
+            )
+            if reserved != len(quantities):
+                raise OutOfStock([])  # Rolls back the attributes that were reserved.
+            # * update() doesn't send signals, invalidate the cached stock here *
+            transaction.on_commit(lambda: bump_namespace("product_attributes"))
+    except OutOfStock:
+        stock = dict(
+            Attribute.objects.filter(pk__in=quantities).values_list(
+                "id", "stock_quantity"
+            )
+        )
+        raise OutOfStock(
+            attribute_id
+            for attribute_id, quantity in quantities.items()
+            if stock.get(attribute_id, 0) < quantity
+        )
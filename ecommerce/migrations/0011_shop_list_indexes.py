@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ecommerce', '0010_alter_order_payment_mode_alter_order_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attribute',
+            index=models.Index(fields=['product', 'stock_quantity'], name='attribute_product_stock_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'id'], name='product_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['category', 'price', 'id'], name='product_category_price_idx'),
+        ),
+    ]
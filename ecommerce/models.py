@@ -25,6 +25,15 @@ class Product(models.Model):
     color = models.ForeignKey(Color, on_delete=models.PROTECT)
     slug = models.SlugField(blank=True, unique=True)
 
+    class Meta:
+        indexes = [
+            # Product list sorted by price, with / without the category filter.
+            models.Index(fields=["price", "id"], name="product_price_idx"),
+            models.Index(
+                fields=["category", "price", "id"], name="product_category_price_idx"
+            ),
+        ]
+
     def __str__(self) -> str:
         return self.name
 
@@ -46,6 +55,14 @@ class Attribute(models.Model):
     attribute_value = models.CharField(max_length=255)
     stock_quantity = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # In stock filter of the product list (EXISTS product, stock_quantity > 0).
+            models.Index(
+                fields=["product", "stock_quantity"], name="attribute_product_stock_idx"
+            ),
+        ]
+
     def __str__(self) -> str:
         return f"{self.product} - {self.name} ({self.attribute_value})"
 
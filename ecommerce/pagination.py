@@ -0,0 +1,11 @@
+from blogs.pagination import KeysetPagination
+
+
+class ShopPagination(KeysetPagination):
+    """
+    Keyset Pagination for the shop lists (products, attributes, images, orders).
+
+    Views can set 'keyset_ordering' (e.g. sorted by price), the last field must be 'id'.
+    """
+
+    ordering = ("id",)
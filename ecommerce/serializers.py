@@ -1,5 +1,8 @@
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from .models import Product_Category, Color, Product, Attribute, Image, Order, OrderItem
+from .inventory import OutOfStock, reserve_stock
 
 
 class Product_CategorySerializer(serializers.ModelSerializer):
@@ -32,6 +35,23 @@ class ImageSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class ProductDetailSerializer(serializers.ModelSerializer):
+    """
+    Product page data: product with its category / color names, images and attributes (stock).
+
+    * Expects category and color selected and image_set / attribute_set prefetched, see ProductDetailAPI *
+    """
+
+    category_name = serializers.CharField(source="category.name", read_only=True)
+    color_name = serializers.CharField(source="color.name", read_only=True)
+    images = ImageSerializer(source="image_set", many=True, read_only=True)
+    attributes = AttributeSerializer(source="attribute_set", many=True, read_only=True)
+
+    class Meta:
+        model = Product
+        fields = "__all__"
+
+
 class OrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Order
@@ -39,57 +59,118 @@ class OrderSerializer(serializers.ModelSerializer):
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
+    # Product ID is actually Attribute, take a look at the models.
+    # The product is loaded with it for the price.
+    product = serializers.PrimaryKeyRelatedField(
+        queryset=Attribute.objects.select_related("product")
+    )
+
     class Meta:
         model = OrderItem
         fields = ["id", "order", "product", "quantity"]
 
-    try:
-
-        def create(self, validated_data):
-            """
-            Create a new order item.
-
-            Args:
-                validated_data (dict): Validated data containing the order item details.
-
-            Returns:
-                OrderItem: The created order item.
-
-            Raises:
-                serializers.ValidationError: If the product is out of stock or the requested quantity is greater than the available stock.
-            """
-            attribute_id = validated_data.get(
-                "product"
-            )  # Product ID is actually Attribute, take a look at the models.
-            requested_quantity = validated_data.get("quantity")  # Customer Quantity
-            order_id = validated_data.get("order")  # Order of the Customer
-            attribute = Attribute.objects.get(
-                id=attribute_id.id
-            )  # Attribute Object for Stock Quantity
-            product = Product.objects.get(
-                id=attribute.product.id
-            )  # Product Object for Price
-
-            if attribute.stock_quantity >= requested_quantity:
-                order = Order.objects.get(id=order_id.id)  # Get Order by id
-                attribute.stock_quantity -= (
-                    requested_quantity  # Subtract the requested quantity from Stock
-                )
-                attribute.save()  # save the attribute
-                order.total_amount += (
-                    product.price
-                ) * requested_quantity  # Calculate the total amount
-                order.save()  # Save the order
-
-                order_item = OrderItem.objects.create(
-                    **validated_data
-                )  # Save the Order Item
-
-                return order_item
-            elif attribute.stock_quantity < requested_quantity:
+    def create(self, validated_data):
+        """
+        Create a new order item.
+
+        Stock is reserved with a conditional F() update and the order total is updated with an F() expression,
+        in one transaction, so concurrent orders can't oversell or lose the total.
+
+        Args:
+            validated_data (dict): Validated data containing the order item details.
+
+        Returns:
+            OrderItem: The created order item.
+
+        Raises:
+            serializers.ValidationError: If the product is out of stock or the requested quantity is greater than the available stock.
+        """
+        attribute = validated_data.get("product")  # Attribute for Stock Quantity
+        requested_quantity = validated_data.get("quantity")  # Customer Quantity
+        order = validated_data.get("order")  # Order of the Customer
+
+        with transaction.atomic():
+            try:
+                reserve_stock({attribute.id: requested_quantity})
+            except OutOfStock as e:
+                raise serializers.ValidationError(str(e))
+            Order.objects.filter(id=order.id).update(
+                total_amount=F("total_amount")
+                + attribute.product.price * requested_quantity
+            )  # Add to the order total in the DB.
+            order_item = OrderItem.objects.create(**validated_data)  # Save the Order Item
+
+        return order_item
+
+
+class CheckoutItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()  # Attribute ID, same as OrderItem.product.
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """
+    Places an Order with all its OrderItems in one request.
+
+    * Queries: attributes (1), stock reservation (1 UPDATE), order (1), order items (1 bulk INSERT) *
+    """
+
+    items = CheckoutItemSerializer(many=True, allow_empty=False)
+    payment_mode = serializers.ChoiceField(
+        choices=Order.PAYMENT_CHOICES, default="cod"
+    )
+
+    def validate_items(self, items):
+        """
+        Merges repeated attributes and loads all the attributes (with their product) in one query.
+
+        Raises:
+            serializers.ValidationError: If an attribute doesn't exist.
+        """
+        quantities = {}
+        for item in items:
+            quantities[item["product"]] = (
+                quantities.get(item["product"], 0) + item["quantity"]
+            )
+        attributes = Attribute.objects.select_related("product").in_bulk(quantities)
+        missing = [
+            attribute_id for attribute_id in quantities if attribute_id not in attributes
+        ]
+        if missing:
+            raise serializers.ValidationError(f"Invalid product(s): {missing}")
+        return [(attributes[pk], quantity) for pk, quantity in quantities.items()]
+
+    def create(self, validated_data):
+        """
+        Reserves the stock, creates the Order and bulk creates its OrderItems in one transaction.
+
+        Args:
+            validated_data (dict): Validated items (attribute, quantity), payment mode and customer.
+
+        Returns:
+            Order: The placed order, its created OrderItems are kept in 'self.order_items'.
+
+        Raises:
+            serializers.ValidationError: If any product is out of stock, nothing is created.
+        """
+        items = validated_data["items"]
+        with transaction.atomic():
+            try:
+                reserve_stock({attribute.id: quantity for attribute, quantity in items})
+            except OutOfStock as e:
                 raise serializers.ValidationError(
-                    "Product is out of stock or requested quantity is greater than available stock."
+                    {"items": f"{e} Product(s): {e.attribute_ids}"}
                 )
-
-    except Exception as e:
-        raise serializers.ValidationError(str(e))
+            order = Order.objects.create(
+                customer=validated_data["customer"],
+                payment_mode=validated_data["payment_mode"],
+                total_amount=sum(
+                    attribute.product.price * quantity for attribute, quantity in items
+                ),
+                complete=True,  # All the order items are created with the order.
+            )
+            self.order_items = OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=attribute, quantity=quantity)
+                for attribute, quantity in items
+            )
+        return order
@@ -0,0 +1,35 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from blogs.cache import bump_namespace
+from .models import Product_Category, Color, Product, Attribute, Image
+
+# Cache namespace of each model, views list the namespaces their data depends on (cache_namespaces).
+CACHE_NAMESPACES = {
+    Product_Category: "product_categories",
+    Color: "colors",
+    Product: "products",
+    Image: "product_images",
+    Attribute: "product_attributes",
+}
+
+
+def invalidate_shop_cache(sender, instance, **kwargs):
+    """
+    Invalidates the cached shop responses that depend on the saved / deleted model.
+
+    The namespace is bumped after the transaction commits, so a request can't cache the old data in between.
+    """
+    namespace = CACHE_NAMESPACES.get(sender)
+    if namespace is not None:
+        transaction.on_commit(lambda: bump_namespace(namespace))
+
+
+# Connected to the cached models only, a receiver of every sender makes bulk deletes of any model
+# (e.g. posts/retention.py) fetch and signal each row instead of running a single DELETE.
+for model in CACHE_NAMESPACES:
+    post_save.connect(
+        invalidate_shop_cache, sender=model, dispatch_uid="shop_cache_saved"
+    )
+    post_delete.connect(
+        invalidate_shop_cache, sender=model, dispatch_uid="shop_cache_deleted"
+    )
@@ -1,3 +1,143 @@
-from django.test import TestCase
+import threading
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import CustomUser
+from .inventory import OutOfStock, reserve_stock
+from .models import Attribute, Color, Order, OrderItem, Product, Product_Category
 
-# Create your tests here.
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ReserveStockConcurrencyTest(TransactionTestCase):
+    """
+    Two checkouts racing for the last unit: exactly one gets it, the stock never goes below 0.
+    """
+
+    def setUp(self):
+        product = Product.objects.create(
+            name="Shirt",
+            price=10,
+            category=Product_Category.objects.create(name="Shirts"),
+            details="Details",
+            color=Color.objects.create(name="Red"),
+            slug="shirt",
+        )
+        self.attribute = Attribute.objects.create(
+            product=product, name="Size", attribute_value="M", stock_quantity=1
+        )
+
+    def reserve_concurrently(self, quantities, threads=2):
+        barrier = threading.Barrier(threads)
+        outcomes = []
+
+        def reserve():
+            barrier.wait()
+            try:
+                reserve_stock(quantities)
+                outcomes.append("reserved")
+            except OutOfStock:
+                outcomes.append("out of stock")
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=reserve) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return sorted(outcomes)
+
+    def test_last_unit_reserved_once(self):
+        outcomes = self.reserve_concurrently({self.attribute.pk: 1})
+        self.assertEqual(outcomes, ["out of stock", "reserved"])
+        self.attribute.refresh_from_db()
+        self.assertEqual(self.attribute.stock_quantity, 0)
+
+    def test_out_of_stock_reserves_nothing(self):
+        other = Attribute.objects.create(
+            product=self.attribute.product,
+            name="Size",
+            attribute_value="L",
+            stock_quantity=5,
+        )
+        with self.assertRaises(OutOfStock) as raised:
+            reserve_stock({self.attribute.pk: 2, other.pk: 1})
+        self.assertEqual(raised.exception.attribute_ids, [self.attribute.pk])
+        other.refresh_from_db()
+        self.assertEqual(other.stock_quantity, 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CheckoutTest(TestCase):
+    """
+    The checkout places a whole cart with a fixed number of queries, or nothing if a product is short.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(email="buyer@test.com", username="buyer")
+        category = Product_Category.objects.create(name="Shirts")
+        color = Color.objects.create(name="Red")
+        cls.attributes = []
+        for i in range(5):
+            product = Product.objects.create(
+                name=f"Shirt {i}",
+                price=10 + i,
+                category=category,
+                details="Details",
+                color=color,
+                slug=f"shirt-{i}",
+            )
+            cls.attributes.append(
+                Attribute.objects.create(
+                    product=product, name="Size", attribute_value="M", stock_quantity=3
+                )
+            )
+
+    def checkout(self, quantities):
+        return self.client.post(
+            "/shop/checkout/",
+            {
+                "items": [
+                    {"product": attribute.pk, "quantity": quantity}
+                    for attribute, quantity in quantities
+                ]
+            },
+            content_type="application/json",
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}",
+        )
+
+    def test_constant_queries_per_cart_size(self):
+        query_counts = []
+        for cart in (self.attributes[:1], self.attributes):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.checkout([(attribute, 1) for attribute in cart])
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data["items"]), len(cart))
+            query_counts.append(len(queries))
+        self.assertEqual(query_counts[0], query_counts[1])
+
+    def test_checkout(self):
+        response = self.checkout([(self.attributes[0], 2), (self.attributes[1], 1)])
+        self.assertEqual(response.status_code, 201)
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertEqual(order.total_amount, 10 * 2 + 11)
+        self.assertEqual(
+            sorted(item["id"] for item in response.data["items"]),
+            sorted(order.orderitem_set.values_list("id", flat=True)),
+        )
+        self.attributes[0].refresh_from_db()
+        self.assertEqual(self.attributes[0].stock_quantity, 1)
+
+    def test_out_of_stock_creates_nothing(self):
+        response = self.checkout([(self.attributes[0], 1), (self.attributes[1], 4)])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.attributes[0].refresh_from_db()
+        self.assertEqual(self.attributes[0].stock_quantity, 3)
@@ -40,6 +40,11 @@ urlpatterns = [
         views.ProductUpdateDeletebySlug.as_view(),
         name="update-delete-products-slug",
     ),
+    path(
+        "products-detail/<str:slug>/full/",
+        views.ProductDetailAPI.as_view(),
+        name="products-detail-full",
+    ),
     # Attribute URLs
     path(
         "attribute/",
@@ -94,5 +99,7 @@ urlpatterns = [
         views.OrderItemUpdateDeleteAPI.as_view(),
         name="update-delete-order",
     ),
+    # Checkout URL
+    path("checkout/", views.CheckoutAPI.as_view(), name="checkout"),
     path("payment/", views.create_payment_intent, name="payment-intent"),
 ]
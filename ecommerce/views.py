@@ -4,23 +4,32 @@ from .serializers import (
     Product_CategorySerializer,
     ColorSerializer,
     ProductSerializer,
+    ProductDetailSerializer,
     AttributeSerializer,
     ImageSerializer,
     OrderItemSerializer,
     OrderSerializer,
+    CheckoutSerializer,
 )
-from rest_framework import generics
+from rest_framework import generics, permissions, status
+from rest_framework.exceptions import ValidationError
+from django.db.models import Exists, OuterRef
+from decimal import Decimal, InvalidOperation
 from django.utils.text import slugify
 import uuid
 from django.shortcuts import get_object_or_404
 from django.http import Http404
 from .permissions import OrderPermission, ProductPermissions
-from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
 import stripe
 from django.conf import settings
-from django.core.cache import cache
+from accounts.billing import aget_stripe_customer_id
+from blogs.http import get_request_data
+from blogs.cache import CachedResponseMixin
+from .pagination import ShopPagination
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
@@ -36,38 +45,20 @@ stripe.api_key = settings.STRIPE_SECRET_KEY
 
 
 # Product Category Views #
-class Product_CategoryListCreateAPI(generics.ListCreateAPIView):
+class Product_CategoryListCreateAPI(CachedResponseMixin, generics.ListCreateAPIView):
     """
     List and Create view using Generics.
 
-    GET list of all Product Categories
+    GET list of all Product Categories (cached)
     POST new Product Categories
     """
 
     serializer_class = Product_CategorySerializer
     queryset = Product_Category.objects.all()
     pagination_class = None
+    cache_namespaces = ["product_categories"]
     # permission_classes = [ProductPermissions]
 
-    def get(self, request, *args, **kwargs):
-        """
-        Overriding GET method to return Cached Data if exists, else create cache.
-        """
-        data = cache.get("product_category_list")
-        if data is None:
-            response = super().get(request, *args, **kwargs)
-            data = response
-            cache.set("product_category_list", data, 60 * 10)  # cache for 10 minutes
-        return Response(data)
-
-    def post(self, request, *args, **kwargs):
-        """
-        Overriding POST method to delete cached data, keeps the data updated.
-        """
-        response = super().post(request, *args, **kwargs)
-        cache.delete("product_category_list")
-        return response
-
 
 class Product_CategoryUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -80,35 +71,20 @@ class Product_CategoryUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
     queryset = Product_Category.objects.all()
     # permission_classes = [ProductPermissions]
 
-    def put(self, request, *args, **kwargs):
-        pk = kwargs["pk"]
-        cache_key = f"product_category_{pk}"
-        cache.delete(cache_key)
-        cache_key = "product_category_list"
-        cache.delete(cache_key)
-        return super().put(request, *args, **kwargs)
-
-    def delete(self, request, *args, **kwargs):
-        pk = kwargs["pk"]
-        cache_key = f"product_category_{pk}"
-        cache.delete(cache_key)
-        cache_key = "product_category_list"
-        cache.delete(cache_key)
-        return super().put(request, *args, **kwargs)
-
 
 # Color Views #
-class ColorListCreateAPI(generics.ListCreateAPIView):
+class ColorListCreateAPI(CachedResponseMixin, generics.ListCreateAPIView):
     """
     List and Create view using Generics.
 
-    GET list of all Colors
+    GET list of all Colors (cached)
     POST new Color
     """
 
     serializer_class = ColorSerializer
     queryset = Color.objects.all()
     pagination_class = None
+    cache_namespaces = ["colors"]
     # permission_classes = [ProductPermissions]
 
 
@@ -125,35 +101,90 @@ class ColorUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Product Views #
-class ProductListCreateAPI(generics.ListCreateAPIView):
+class ProductListCreateAPI(CachedResponseMixin, generics.ListCreateAPIView):
     """
 
     List and Create view using Generics.
 
-    GET list of all Products
+    GET list of Products, paginated (cursor) and cached per filter combination
     POST new Products
+
+    Query params (all optional):
+        category: Product Category ID
+        color: Color ID
+        min_price, max_price: Price range
+        in_stock: 'true' for products having at least one attribute in stock
+        sort: 'price', '-price', 'name' or 'newest' (default: 'id')
+        page_size, cursor: Pagination
     """
 
     serializer_class = ProductSerializer
     queryset = Product.objects.all()
-    pagination_class = None
+    pagination_class = ShopPagination
+    cache_namespaces = ["products", "product_attributes"]
     # permission_classes = [ProductPermissions]
 
-    def get(self, request, *args, **kwargs):
+    SORTING = {
+        "id": ("id",),
+        "price": ("price", "id"),
+        "-price": ("-price", "id"),
+        "name": ("name", "id"),
+        "newest": ("-id",),
+    }
+
+    @property
+    def keyset_ordering(self):
         """
-        Overriding GET method to return Cached List of objects if exists, else create one
+        Ordering used by ShopPagination, from the 'sort' query param.
         """
-        data = cache.get("products_list")
+        sort = self.request.query_params.get("sort", "id")
+        if sort not in self.SORTING:
+            raise ValidationError({"sort": f"Must be one of {list(self.SORTING)}."})
+        return self.SORTING[sort]
 
-        if data is None:
-            response = super().get(request, *args, **kwargs)
-            data = response.data
-            cache.set("products_list", data, 60 * 10)
-        return Response(data)
+    def get_queryset(self):
+        """
+        Filters the products using the query params.
+
+        * Backed by the (category, price, id) / (price, id) indexes on Product and (product, stock_quantity) on Attribute *
+        """
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for param in ("category", "color"):
+            if params.get(param):
+                queryset = queryset.filter(**{param: self.get_int_param(param)})
+        if params.get("min_price"):
+            queryset = queryset.filter(price__gte=self.get_decimal_param("min_price"))
+        if params.get("max_price"):
+            queryset = queryset.filter(price__lte=self.get_decimal_param("max_price"))
+        if params.get("in_stock", "").lower() in ("true", "1"):
+            queryset = queryset.filter(
+                Exists(
+                    Attribute.objects.filter(
+                        product=OuterRef("pk"), stock_quantity__gt=0
+                    )
+                )
+            )
+        return queryset
+
+    def get_int_param(self, param):
+        try:
+            return int(self.request.query_params[param])
+        except ValueError:
+            raise ValidationError({param: "Must be an integer."})
+
+    def get_decimal_param(self, param):
+        try:
+            value = Decimal(self.request.query_params[param])
+        except InvalidOperation:
+            value = None
+        if value is None or not value.is_finite():
+            raise ValidationError({param: "Must be a number."})
+        return value
 
     def perform_create(self, serializer):
         """
-        Overriding perform_create() to handle slug and delete cache to keep the data updated.
+        Overriding perform_create() to handle slug.
         """
         product_name = serializer.validated_data.get("name")
         slug = slugify(product_name)
@@ -163,7 +194,6 @@ class ProductListCreateAPI(generics.ListCreateAPIView):
             slug = f"{slug}-{unique_id}"
 
         serializer.save(slug=slug)
-        cache.delete("products_list")
 
 
 class ProductUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
@@ -177,53 +207,50 @@ class ProductUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
     queryset = Product.objects.all()
     # permission_classes = [ProductPermissions]
 
-    def put(self, request, *args, **kwargs):
-        """
-        Overiding PUT method to delete cache.
-        """
-        product_id = kwargs["pk"]
-        product = Product.objects.get(id=product_id)
-        print(f"Product: {product}")
-        product_slug = product.slug
-        cache.delete(f"product_{product_slug}")
-        cache.delete(f"products_list")
-        return super().put(request, *args, **kwargs)
-
-    def delete(self, request, *args, **kwargs):
-        """
-        Overiding DELETE method to delete cache.
-        """
-        product_id = kwargs["pk"]
-        product = Product.objects.get(id=product_id)
-        product_slug = product.slug
-        cache.delete(f"product_{product_slug}")
-        cache.delete(f"products_list")
-        return super().put(request, *args, **kwargs)
-
 
-class ProductUpdateDeletebySlug(generics.RetrieveAPIView):
+class ProductUpdateDeletebySlug(CachedResponseMixin, generics.RetrieveAPIView):
     """
-    Retrieve, Update, Delete view using Generics.
+    Retrieve view using Generics.
 
-    GET, PUT, PATCH, DELETE Product using slug.
+    GET Product using slug (cached).
     """
 
     serializer_class = ProductSerializer
     queryset = Product.objects.all()
+    cache_namespaces = ["products"]
     # permission_classes = [ProductPermissions]
 
     def get_object(self):
         slug = self.kwargs.get("slug")
-        cache_key = f"product_{slug}"
-        product = cache.get(cache_key)
+        try:
+            return self.get_queryset().get(slug=slug)
+        except Product.DoesNotExist:
+            raise Http404("Product does not exist")
+
+
+class ProductDetailAPI(CachedResponseMixin, generics.RetrieveAPIView):
+    """
+    Retrieve view using Generics.
+
+    GET Product page using slug: product, category / color names, images and attributes (stock) in one response.
 
-        if product is None:
-            try:
-                product = Product.objects.get(slug=slug)
-                cache.set(cache_key, product)
-            except Product.DoesNotExist:
-                raise Http404("Product does not exist")
-        return product
+    * Fixed number of queries: product with category and color (1), images (1), attributes (1) *
+    * Cached per slug, invalidated when the product, its images / attributes (stock), color or category change *
+    """
+
+    serializer_class = ProductDetailSerializer
+    queryset = Product.objects.select_related("category", "color").prefetch_related(
+        "image_set", "attribute_set"
+    )
+    lookup_field = "slug"
+    cache_namespaces = [
+        "products",
+        "product_images",
+        "product_attributes",
+        "colors",
+        "product_categories",
+    ]
+    # permission_classes = [ProductPermissions]
 
 
 # Images Views #
@@ -231,26 +258,26 @@ class ImageListCreateAPI(generics.ListCreateAPIView):
     """
     List and Create view using Generics.
 
-    GET list of all Images
+    GET list of Images, paginated (cursor)
     POST new Images
     """
 
     serializer_class = ImageSerializer
     queryset = Image.objects.all()
-    pagination_class = None
+    pagination_class = ShopPagination
     # permission_classes = [ProductPermissions]
 
 
-class ImageListAPIbyProduct(generics.ListAPIView):
+class ImageListAPIbyProduct(CachedResponseMixin, generics.ListAPIView):
     """
     List view using Generics.
 
-    GET list of all Images of a Product using Product ID
-    POST new Images
+    GET list of all Images of a Product using Product ID (cached)
     """
 
     serializer_class = ImageSerializer
     pagination_class = None
+    cache_namespaces = ["products", "product_images"]
     # permission_classes = [ProductPermissions]
 
     def get_queryset(self):
@@ -275,22 +302,32 @@ class ImageUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Attribute Views
-class AttributeListCreateAPI(generics.ListCreateAPIView):
+class AttributeListCreateAPI(CachedResponseMixin, generics.ListCreateAPIView):
     """
     TODO: Prevent addition of Multiple Same Attributes
     TODO: GET Attributes using Post Slug
 
     List and Create view using Generics.
 
-    GET list of all Attributes / Stock
+    GET list of Attributes / Stock, paginated (cursor) and cached, ?product=<id> to filter by Product
     POST new Attributes / Stock
     """
 
     serializer_class = AttributeSerializer
     queryset = Attribute.objects.all()
-    pagination_class = None
+    pagination_class = ShopPagination
+    cache_namespaces = ["product_attributes"]
     # permission_classes = [ProductPermissions]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        product_id = self.request.query_params.get("product")
+        if product_id:
+            if not product_id.isdigit():
+                raise ValidationError({"product": "Must be an integer."})
+            queryset = queryset.filter(product_id=product_id)
+        return queryset
+
 
 class AttributeUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
     """
@@ -315,6 +352,7 @@ class AttributeUpdateDelete(generics.RetrieveUpdateDestroyAPIView):
 # ! Payment Model or workflow not implemented - Stripe is integrated.
 # * 7. When the Order has been successfully placed, a new payment will be created
 # * 8.
+# * Or: POST the whole cart to CheckoutAPI, it creates the Order and all its Order Items in one request / transaction.
 
 # * In detail POST Item:
 # * 1. When POST request is received, check if the Product Quantity >= Order Item Quantity
@@ -325,13 +363,14 @@ class OrderListCreateAPI(generics.ListCreateAPIView):
     """
     List and Create view using Generics.
 
-    GET list of all Orders
+    GET list of Orders, newest first, paginated (cursor)
     POST new Orders
     """
 
     serializer_class = OrderSerializer
     queryset = Order.objects.all()
-    pagination_class = None
+    pagination_class = ShopPagination
+    keyset_ordering = ("-id",)
     # permission_classes = [OrderPermission]
 
 
@@ -391,13 +430,40 @@ class OrderItemUpdateDeleteAPI(generics.RetrieveUpdateDestroyAPIView):
     # permission_classes = [OrderPermission]
 
 
-@api_view(["POST"])
-def create_payment_intent(request):
+class CheckoutAPI(generics.GenericAPIView):
+    """
+    POST the whole cart, places the Order with all its Order Items in one transaction.
+
+    Request:
+        {"items": [{"product": <attribute id>, "quantity": 2}, ...], "payment_mode": "cod" / "online"}
+
+    Returns:
+        The placed Order and its Order Items (201), or 400 if any product is out of stock (nothing is created).
+    """
+
+    serializer_class = CheckoutSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        order = serializer.save(customer=request.user)
+        data = OrderSerializer(order).data
+        data["items"] = OrderItemSerializer(serializer.order_items, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def create_payment_intent(request):
     """
     Create a payment intent for a given order.
 
+    * Async view: Stripe is called with the *_async methods (timeout and retries: accounts/billing.py),
+    * so a slow Stripe doesn't hold a worker thread of the server for the whole round trip *
+
     Args:
-        request (HttpRequest): The HTTP request object.
+        request (HttpRequest): The HTTP request object, having order_id and total_amount.
 
     Returns:
         JsonResponse: A JSON response containing the client secret of the payment intent.
@@ -406,28 +472,27 @@ def create_payment_intent(request):
         Exception: If there is an error creating the payment intent.
 
     """
-    total_amount = request.data.get("total_amount")
-    order_id = request.data.get("order_id")
-    order = Order.objects.get(id=order_id)
+    data = get_request_data(request)
+    if data is None:
+        return JsonResponse({"error": "Invalid JSON."}, status=400)
+    total_amount = data.get("total_amount")
+    order_id = data.get("order_id")
+    try:
+        order = await Order.objects.select_related("customer").aget(id=order_id)
+    except (Order.DoesNotExist, ValueError, TypeError):
+        return JsonResponse({"error": "Order not found."}, status=404)
     customer_name = f"{order.customer.first_name} {order.customer.last_name}"
     customer_email = order.customer.email
 
     try:
-        # check if user with this email already exists at Stripe
-        existing_customer = stripe.Customer.list(email=customer_email, limit=1).data
-        if existing_customer and len(existing_customer) > 0:
-            # Customer already exists, return the existing customer ID
-            customer_id = existing_customer[0].id
-        else:
-            # New Customer -> Create a new customer at Stripe
-            new_customer = stripe.Customer.create(
-                email=customer_email,
-                name=customer_name,
-                description="Customer Created by Django Backend",
-            )
-            customer_id = new_customer.id
+        # Stored Stripe Customer of the user, Stripe is only called the first time.
+        customer_id = await aget_stripe_customer_id(
+            order.customer,
+            name=customer_name,
+            description="Customer Created by Django Backend",
+        )
         # Create new PaymentIntent at Stripe
-        intent = stripe.PaymentIntent.create(
+        intent = await stripe.PaymentIntent.create_async(
             amount=total_amount,
             currency="usd",
             customer=customer_id,
@@ -436,11 +501,16 @@ def create_payment_intent(request):
                 "customer_email": customer_email,  # Customer's email as metadata
                 "order_id": order_id,
             },
+            # Retries / repeated requests for the same order and amount return the same PaymentIntent.
+            idempotency_key=f"payment-intent-order-{order.id}-{total_amount}",
         )
-        order.payment_intent = intent.client_secret
-        order.save()  # Save PaymentIntent in Order
+        await Order.objects.filter(id=order.id).aupdate(
+            payment_intent=intent.client_secret
+        )  # Save PaymentIntent in Order
         return JsonResponse(
             {"client_secret": intent.client_secret}
         )  # returning Payment Intent
+    except stripe.APIConnectionError:  # Timed out (or unreachable) after the retries.
+        return JsonResponse({"error": "Payment provider timed out."}, status=504)
     except Exception as e:
-        return Response({"error": str(e)}, status=400)
+        return JsonResponse({"error": str(e)}, status=400)
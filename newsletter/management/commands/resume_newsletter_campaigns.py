@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from newsletter.models import Campaign
+from newsletter.sender import send_campaign
+
+
+class Command(BaseCommand):
+    """
+    Resumes newsletter campaigns that didn't finish (process restarted / crashed, or the send failed).
+
+    Each campaign continues after its last sent subscriber (Campaign.last_subscriber_id).
+    ! Don't run it while the campaigns are still being sent by the web process, they would be sent twice. !
+
+    Usage:
+        python manage.py resume_newsletter_campaigns  # All unfinished campaigns.
+        python manage.py resume_newsletter_campaigns --campaign 12
+    """
+
+    help = "Resumes unfinished newsletter campaigns."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--campaign",
+            type=int,
+            help="ID of the campaign to resume, defaults to all unfinished campaigns.",
+        )
+        parser.add_argument("--batch-size", type=int, help="Emails per batch.")
+        parser.add_argument("--workers", type=int, help="Sender threads.")
+
+    def handle(self, *args, **options):
+        campaigns = Campaign.objects.exclude(status="sent").order_by("id")
+        if options["campaign"]:
+            campaigns = campaigns.filter(pk=options["campaign"])
+        for campaign_id in campaigns.values_list("id", flat=True):
+            try:
+                campaign = send_campaign(
+                    campaign_id,
+                    batch_size=options["batch_size"],
+                    workers=options["workers"],
+                )
+            except Exception as e:
+                self.stderr.write(f"Campaign {campaign_id} failed: {e}")
+                continue
+            self.stdout.write(
+                f"Campaign {campaign_id} sent to {campaign.sent_count} subscribers."
+            )
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("newsletter", "0002_campaign"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="campaign",
+            name="sent_ranges",
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
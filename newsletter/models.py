@@ -1,4 +1,34 @@
 from django.db import models
 
 class Subscribers(models.Model):
-    email = models.EmailField(unique = True, blank = False)
\ No newline at end of file
+    email = models.EmailField(unique = True, blank = False)
+
+
+class Campaign(models.Model):
+    """
+    A newsletter send, sent to the subscribers in batches by newsletter/sender.py.
+
+    'last_subscriber_id' is the progress of the send: every subscriber with a lower / equal ID has been sent
+    the newsletter, so an interrupted send resumes after it.
+    'sent_ranges' are the [first, last] subscriber ID ranges already sent after 'last_subscriber_id'
+    (by the batches of a failed window), skipped on resume.
+    """
+
+    STATUS_CHOICES = [
+        ("pending", "pending"),
+        ("sending", "sending"),
+        ("sent", "sent"),
+        ("failed", "failed"),
+    ]
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    status = models.CharField(default="pending", max_length=20, choices=STATUS_CHOICES)
+    last_subscriber_id = models.BigIntegerField(default=0)
+    sent_ranges = models.JSONField(default=list, blank=True)
+    sent_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self) -> str:
+        return f"Campaign {self.id}: {self.subject} ({self.status})"
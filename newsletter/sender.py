@@ -0,0 +1,202 @@
+"""
+Newsletter campaign sender.
+
+Subscribers are streamed in ID order and sent in batches (settings.NEWSLETTER_BATCH_SIZE) by a thread pool
+(settings.NEWSLETTER_WORKERS). Each worker thread opens one mail connection and sends all its batches
+over it with send_messages(), instead of one connection per email.
+
+Batches are submitted in windows of NEWSLETTER_WORKERS batches. When a whole window is sent, the ID of
+its last subscriber is saved to Campaign.last_subscriber_id, so a crashed / failed send resumes from there.
+When a window fails, the subscribers its batches did send (emails are sent one by one) are saved to
+Campaign.sent_ranges and skipped on resume, so a failed send never sends an email twice.
+! A process killed in the middle of a window sends that window again on resume !
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Campaign, Subscribers
+
+logger = logging.getLogger(__name__)
+
+
+def start_campaign(campaign):
+    """
+    Sends a campaign in a background thread, once the current transaction commits.
+
+    Args:
+        campaign (Campaign): The campaign to send.
+    """
+    transaction.on_commit(
+        lambda: threading.Thread(
+            target=_run_in_thread,
+            args=(campaign.pk,),
+            name=f"newsletter-campaign-{campaign.pk}",
+            daemon=True,
+        ).start()
+    )
+
+
+def _run_in_thread(campaign_id):
+    try:
+        send_campaign(campaign_id)
+    except Exception:
+        logger.exception("Newsletter campaign %s failed.", campaign_id)
+    finally:
+        close_old_connections()
+
+
+def send_campaign(campaign_id, batch_size=None, workers=None):
+    """
+    Sends a campaign to all subscribers after its 'last_subscriber_id'.
+
+    Args:
+        campaign_id (int): ID of the campaign.
+        batch_size (int): Emails sent per send_messages() call, defaults to settings.NEWSLETTER_BATCH_SIZE.
+        workers (int): Sender threads, defaults to settings.NEWSLETTER_WORKERS.
+
+    Returns:
+        Campaign: The campaign with its final status ('sent' or 'failed').
+    """
+    batch_size = batch_size or settings.NEWSLETTER_BATCH_SIZE
+    workers = workers or settings.NEWSLETTER_WORKERS
+    campaign = Campaign.objects.get(pk=campaign_id)
+    Campaign.objects.filter(pk=campaign.pk).update(status="sending", error="")
+
+    subscribers = (
+        Subscribers.objects.filter(id__gt=campaign.last_subscriber_id)
+        .order_by("id")
+        .values_list("id", "email")
+        .iterator(chunk_size=batch_size)
+    )
+    sender = _BatchSender(campaign, workers)
+    try:
+        window = []
+        batch = []
+        for subscriber in subscribers:
+            if any(
+                first <= subscriber[0] <= last for first, last in campaign.sent_ranges
+            ):
+                continue  # Sent by a failed window.
+            batch.append(subscriber)
+            if len(batch) == batch_size:
+                window.append(batch)
+                batch = []
+                if len(window) == workers:
+                    sender.send_window(window)
+                    window = []
+        if batch:
+            window.append(batch)
+        if window:
+            sender.send_window(window)
+    except Exception as e:
+        Campaign.objects.filter(pk=campaign.pk).update(status="failed", error=str(e))
+        raise
+    finally:
+        sender.close()
+
+    Campaign.objects.filter(pk=campaign.pk).update(
+        status="sent", finished_at=timezone.now()
+    )
+    campaign.refresh_from_db()
+    return campaign
+
+
+class _BatchSender:
+    """
+    Thread pool sending batches of a campaign, with one mail connection per worker thread.
+    """
+
+    def __init__(self, campaign, workers):
+        self.campaign = campaign
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="newsletter-sender"
+        )
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+
+    def get_connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = get_connection(fail_silently=False)
+            connection.open()
+            self.local.connection = connection
+            with self.lock:
+                self.connections.append(connection)
+        return connection
+
+    def send_batch(self, batch):
+        """
+        Sends a batch over the connection of the worker thread, one email at a time.
+
+        Returns:
+            tuple: (subscribers processed, emails sent, exception that stopped the batch or None)
+        """
+        processed = sent = 0
+        try:
+            # * Inside the try: a connection that fails to open fails this batch only,
+            # * the progress of the other batches of the window is still saved *
+            connection = self.get_connection()
+            for _, email in batch:
+                message = EmailMessage(
+                    self.campaign.subject,
+                    self.campaign.message,
+                    settings.NEWSLETTER_FROM_EMAIL,
+                    [email],
+                    connection=connection,
+                )
+                sent += connection.send_messages([message]) or 0
+                processed += 1
+        except Exception as e:
+            return processed, sent, e
+        return processed, sent, None
+
+    def send_window(self, window):
+        """
+        Sends a window of batches concurrently and saves the progress once all of them are done.
+
+        Raises:
+            Exception: The first failure of the window, after the sent subscribers were saved to 'sent_ranges'.
+        """
+        results = list(self.executor.map(self.send_batch, window))
+        sent = sum(batch_sent for _, batch_sent, _ in results)
+        errors = [error for _, _, error in results if error is not None]
+        campaign = self.campaign
+
+        if errors:
+            campaign.sent_ranges = campaign.sent_ranges + [
+                [batch[0][0], batch[processed - 1][0]]
+                for batch, (processed, _, _) in zip(window, results)
+                if processed
+            ]
+            Campaign.objects.filter(pk=campaign.pk).update(
+                sent_ranges=campaign.sent_ranges,
+                sent_count=F("sent_count") + sent,
+            )
+            raise errors[0]
+
+        campaign.last_subscriber_id = window[-1][-1][0]
+        campaign.sent_ranges = [
+            sent_range
+            for sent_range in campaign.sent_ranges
+            if sent_range[1] > campaign.last_subscriber_id
+        ]
+        Campaign.objects.filter(pk=campaign.pk).update(
+            last_subscriber_id=campaign.last_subscriber_id,
+            sent_ranges=campaign.sent_ranges,
+            sent_count=F("sent_count") + sent,
+        )
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for connection in self.connections:
+            try:
+                connection.close()
+            except Exception:
+                logger.exception("Failed to close the newsletter mail connection.")
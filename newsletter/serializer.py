@@ -1,7 +1,12 @@
 from rest_framework import serializers
-from .models import Subscribers
+from .models import Subscribers, Campaign
 
 class NewsletterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Subscribers
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+class CampaignSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Campaign
+        fields = '__all__'
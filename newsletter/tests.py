@@ -1,3 +1,101 @@
-from django.test import TestCase
+import threading
+from collections import Counter
+from io import StringIO
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from .models import Campaign, Subscribers
+from .sender import send_campaign
 
-# Create your tests here.
+
+class FlakyEmailBackend(EmailBackend):
+    """
+    locmem backend whose 'fail_at'-th email (counted over all connections) raises once, like a dropped SMTP connection,
+    and whose 'fail_open_at'-th connection fails to open, like an unreachable SMTP server.
+    """
+
+    fail_at = None
+    attempts = 0
+    fail_open_at = None
+    opened = 0
+    lock = threading.Lock()
+
+    def open(self):
+        with FlakyEmailBackend.lock:
+            FlakyEmailBackend.opened += 1
+            if FlakyEmailBackend.opened == FlakyEmailBackend.fail_open_at:
+                raise ConnectionRefusedError("SMTP server unreachable")
+        return super().open()
+
+    def send_messages(self, messages):
+        with FlakyEmailBackend.lock:
+            FlakyEmailBackend.attempts += 1
+            if FlakyEmailBackend.attempts == FlakyEmailBackend.fail_at:
+                raise ConnectionError("SMTP connection lost")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND="newsletter.tests.FlakyEmailBackend")
+class ResumableCampaignTest(TestCase):
+    """
+    A campaign interrupted in the middle of a batch resumes without sending any email twice.
+    """
+
+    def setUp(self):
+        FlakyEmailBackend.attempts = 0
+        FlakyEmailBackend.fail_at = None
+        FlakyEmailBackend.opened = 0
+        FlakyEmailBackend.fail_open_at = None
+        Subscribers.objects.bulk_create(
+            Subscribers(email=f"subscriber{i}@test.com") for i in range(25)
+        )
+        self.campaign = Campaign.objects.create(subject="News", message="Hello")
+
+    def assertSentOnce(self):
+        recipients = Counter(message.to[0] for message in mail.outbox)
+        self.assertEqual(len(recipients), 25)
+        self.assertEqual(max(recipients.values()), 1)
+
+    def test_resume_after_failed_batch(self):
+        FlakyEmailBackend.fail_at = 11  # 3rd batch of the 2nd window.
+        with self.assertRaises(ConnectionError):
+            send_campaign(self.campaign.pk, batch_size=4, workers=2)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "failed")
+        self.assertLess(len(mail.outbox), 25)
+        self.assertTrue(self.campaign.sent_ranges)  # Batches of the failed window.
+
+        call_command(
+            "resume_newsletter_campaigns", batch_size=4, workers=2, stdout=StringIO()
+        )
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sent")
+        self.assertEqual(self.campaign.sent_count, 25)
+        self.assertEqual(self.campaign.sent_ranges, [])
+        self.assertSentOnce()
+
+    def test_resume_after_connection_failed_to_open(self):
+        FlakyEmailBackend.fail_open_at = 1  # A worker of the 1st window.
+        with self.assertRaises(ConnectionRefusedError):
+            send_campaign(self.campaign.pk, batch_size=4, workers=2)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "failed")
+        self.assertEqual(len(mail.outbox), 4)  # The batch of the other worker.
+        self.assertEqual(self.campaign.sent_count, 4)
+        self.assertTrue(self.campaign.sent_ranges)
+
+        call_command(
+            "resume_newsletter_campaigns", batch_size=4, workers=2, stdout=StringIO()
+        )
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sent")
+        self.assertEqual(self.campaign.sent_count, 25)
+        self.assertSentOnce()
+
+    def test_send_without_failure(self):
+        send_campaign(self.campaign.pk, batch_size=4, workers=2)
+        self.campaign.refresh_from_db()
+        self.assertEqual(self.campaign.status, "sent")
+        self.assertEqual(self.campaign.sent_count, 25)
+        self.assertSentOnce()
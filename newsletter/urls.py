@@ -4,5 +4,6 @@ from . import views
 urlpatterns = [
     path('subscribe/', views.AddSubscriberAPI.as_view(), name = 'subscribe-newsletter'),
     path('send/', views.SendNewsLetterAPI.as_view(), name = 'send-newsletter'),
+    path('campaigns/<int:pk>/', views.CampaignStatusAPI.as_view(), name = 'newsletter-campaign'),
     path('unsubscribe/<str:email>/', views.UnsubscribeAPI.as_view(), name = 'unsubscribe-newsletter'),
 ]
@@ -1,8 +1,8 @@
 from rest_framework import views, generics, status
 from rest_framework.response import Response 
-from .models import Subscribers
-from .serializer import NewsletterSerializer
-from django.core.mail import send_mail
+from .models import Subscribers, Campaign
+from .serializer import NewsletterSerializer, CampaignSerializer
+from .sender import start_campaign
 from django.http import Http404
 
 
@@ -19,26 +19,30 @@ class SendNewsLetterAPI(views.APIView):
     This POST method accepts data having subject and message.
 
     Returns:
-    Newsletter to all the subscribers in the list.
+    ID of the newsletter campaign, sent to all the subscribers in the list in the background.
+    Progress can be checked at newsletter/campaigns/<id>/.
     
     """
     def post(self, request):
         subject = request.data.get('subject')
         message = request.data.get('message')
         if subject and message:
-            subscribers = Subscribers.objects.all()
-            for subscriber in subscribers:
-                send_mail(
-                    subject,
-                    message,
-                    'admin@blog.site',
-                    [subscriber.email],
-                    fail_silently=False,
-                )
-            return Response({'message':"Newsletter sent successfully."})
+            campaign = Campaign.objects.create(subject=subject, message=message)
+            start_campaign(campaign)  # Sent by a background thread, not in the request.
+            return Response(
+                {'message': "Newsletter is being sent.", 'campaign_id': campaign.id},
+                status=status.HTTP_202_ACCEPTED,
+            )
         else:
             return Response({'message':'Invalid inputs'}, status=status.HTTP_400_BAD_REQUEST)
 
+class CampaignStatusAPI(generics.RetrieveAPIView):
+    """
+    This view returns the status / progress of a newsletter campaign.
+    """
+    queryset = Campaign.objects.all()
+    serializer_class = CampaignSerializer
+
 class UnsubscribeAPI(generics.DestroyAPIView):
     queryset = Subscribers.objects.all()
     serializer_class = NewsletterSerializer
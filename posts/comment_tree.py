@@ -0,0 +1,64 @@
+from collections import defaultdict
+from .models import Comment, Like
+
+
+class CommentTree:
+    """
+    In-memory tree of all the comments of a post.
+
+    Loads comments (with authors) and comment likes of a post in a fixed number of queries,
+    then CommentSerializer reads replies / likes from the tree instead of querying per comment.
+
+    * Queries: comments + authors (1), comment likes (1) regardless of the number of comments *
+
+    Usage:
+        tree = CommentTree.for_post(post)
+        CommentSerializer(tree.roots, many=True, context={"comment_tree": tree}).data
+    """
+
+    def __init__(self, comments, likes):
+        """
+        Args:
+            comments (list): Comment objects of the post (ordered).
+            likes (iterable): (comment_id, liked_by_id) pairs.
+        """
+        self.comments = comments
+        self.roots = []
+        self.replies = defaultdict(list)  # comment_id -> [Comment]
+        self.likes = defaultdict(list)  # comment_id -> [user_id]
+
+        for comment in comments:
+            if comment.parent_comment_id is None:
+                self.roots.append(comment)
+            else:
+                self.replies[comment.parent_comment_id].append(comment)
+
+        for comment_id, user_id in likes:
+            self.likes[comment_id].append(user_id)
+
+    @classmethod
+    def for_post(cls, post):
+        """
+        Loads the comment tree of a post.
+
+        Args:
+            post (Post | int): The Post or its ID.
+
+        Returns:
+            CommentTree
+        """
+        comments = list(
+            Comment.objects.filter(post=post).select_related("author").order_by("id")
+        )
+        likes = (
+            Like.objects.filter(comment__post=post)
+            .order_by("id")
+            .values_list("comment_id", "liked_by_id")
+        )
+        return cls(comments, likes)
+
+    def get_replies(self, comment):
+        return self.replies.get(comment.pk, [])
+
+    def get_likes(self, comment):
+        return self.likes.get(comment.pk, [])
@@ -1,28 +1,232 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from accounts.auth import get_user_id_from_token
+from . import socket_metrics
+import asyncio
+import itertools
 import json
+import time
+
+NEWPOST_GROUP = "newposts"  # Opt-in topic for new post broadcasts.
+TOPIC_GROUPS = {"newposts": NEWPOST_GROUP}
+
+
+def user_group_name(user_id):
+    """
+    Returns the channel group of a user, notifications are only sent to their recipient's group.
+    """
+    return f"user_{user_id}"
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
+    """
+    WebSocket consumer for real-time notifications.
+
+    Connect:
+        ws/notifications/?token=<JWT access token>&topics=newposts
+
+        - token: SimpleJWT access token (or 'Authorization: Bearer <token>' header).
+          The socket joins the user's own group and only receives the user's notifications.
+        - topics (optional): comma separated opt-in topics, 'newposts' -> new post broadcasts.
+
+    Connections without a valid token or any topic are rejected.
+
+    Heartbeat:
+        The server sends {"type": "ping"} every WEBSOCKET_HEARTBEAT_INTERVAL seconds, the client answers
+        {"type": "pong"} (any message counts). Connections are closed (4408) as soon as they have been silent
+        for WEBSOCKET_HEARTBEAT_TIMEOUT seconds. Clients may send {"type": "ping"} too, the server answers
+        {"type": "pong"}.
+
+    Outbound queue:
+        Channel layer events are only queued by their handlers and sent by a writer task, so the channel
+        layer is always drained and a slow reader only holds WEBSOCKET_SEND_QUEUE_SIZE messages:
+        * A coalesced notification (with 'actor_count') replaces its pending previous version.
+        * When the queue is full the oldest message is dropped.
+        ! Daphne's send() doesn't wait for the client, servers with backpressure (e.g. uvicorn) fill the queue !
+
+    Inbound messages:
+        Token bucket of WEBSOCKET_RECEIVE_RATE messages per second (bursts of WEBSOCKET_RECEIVE_BURST),
+        clients exceeding it are closed (4429). Messages other than ping / pong are ignored.
+
+    Connection count and queue depths: posts/socket_metrics.py.
+    """
+
     async def connect(self):
-        # Add user to the notification group
-        await self.channel_layer.group_add("notifications", self.channel_name)
+        params = parse_qs(self.scope.get("query_string", b"").decode())
+        token = params.get("token", [None])[0] or self.get_header_token()
+        user_id = get_user_id_from_token(token)
+        topics = {
+            topic.strip()
+            for value in params.get("topics", [])
+            for topic in value.split(",")
+        }
+
+        self.user_id = user_id
+        self.notification_groups = [
+            TOPIC_GROUPS[topic] for topic in topics if topic in TOPIC_GROUPS
+        ]
+        if user_id is not None:
+            self.notification_groups.append(user_group_name(user_id))
+
+        if not self.notification_groups:  # Unauthenticated and no topic.
+            await self.close(code=4401)
+            return
+
+        now = time.monotonic()
+        self.last_seen = now
+        self.tokens = settings.WEBSOCKET_RECEIVE_BURST
+        self.tokens_at = now
+        self.closing = False
+        self.outbox = OrderedDict()  # key -> text, oldest first.
+        # Keys of the messages which are not coalesced.
+        self.outbox_keys = itertools.count()
+        self.outbox_ready = asyncio.Event()
+
+        # Add the connection to the user's group and the opted-in topic groups.
+        for group in self.notification_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
         await self.accept()
 
+        self.tasks = [
+            asyncio.create_task(self.write_outbox()),
+            asyncio.create_task(self.heartbeat()),
+        ]
+        socket_metrics.CONNECTIONS.add(self)
+        socket_metrics.incr("connections_opened")
+
     async def disconnect(self, close_code):
-        # Remove user from the notification group
-        await self.channel_layer.group_discard("notifications", self.channel_name)
+        self.closing = True
+        for task in getattr(self, "tasks", []):
+            task.cancel()
+        socket_metrics.CONNECTIONS.discard(self)
+        # Remove the connection from its notification groups
+        for group in getattr(self, "notification_groups", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    def get_header_token(self):
+        """
+        Gets the JWT access token from the 'Authorization: Bearer <token>' header, if any.
+        """
+        for name, value in self.scope.get("headers", []):
+            if name == b"authorization":
+                auth_type, _, token = value.decode().partition(" ")
+                if auth_type in jwt_settings.AUTH_HEADER_TYPES:
+                    return token.strip()
+        return None
+
+    async def receive(self, text_data=None, bytes_data=None):
+        """
+        Handles the heartbeat messages of the client, within the inbound rate limit.
+        """
+        if self.closing:
+            return
+        self.last_seen = time.monotonic()
+        if not self.take_token():
+            socket_metrics.incr("rate_limited")
+            await self.stop(code=4429)
+            return
+        if not text_data or len(text_data) > settings.WEBSOCKET_MAX_MESSAGE_SIZE:
+            return
+        try:
+            message = json.loads(text_data)
+        except ValueError:
+            return
+        if isinstance(message, dict) and message.get("type") == "ping":
+            self.enqueue(json.dumps({"type": "pong"}), key="pong")
+
+    def take_token(self):
+        """
+        Takes a token from the inbound bucket, refilled at WEBSOCKET_RECEIVE_RATE tokens per second.
+
+        Returns:
+            bool: False if the bucket is empty (rate limit exceeded).
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            settings.WEBSOCKET_RECEIVE_BURST,
+            self.tokens + (now - self.tokens_at) * settings.WEBSOCKET_RECEIVE_RATE,
+        )
+        self.tokens_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def enqueue(self, text, key=None):
+        """
+        Queues a message for the writer task.
+
+        Args:
+            text (str): The message.
+            key (hashable): Coalescing key, replaces the pending message with the same key (None -> never replaced).
+        """
+        if self.closing:
+            return
+        if key is None:
+            key = next(self.outbox_keys)
+        elif key in self.outbox:
+            socket_metrics.incr("messages_coalesced")
+        self.outbox[key] = text
+        while len(self.outbox) > settings.WEBSOCKET_SEND_QUEUE_SIZE:
+            self.outbox.popitem(last=False)
+            socket_metrics.incr("messages_dropped")
+        self.outbox_ready.set()
 
-    async def receive(self, text_data):
-        # Handle incoming messages from frontend
-        message = json.loads(text_data)
-        message_text = message.get("message", "")
-        print(message_text)
-        response = f"Received message: {message_text}"
-        await self.send(text_data=response)
+    def queue_depth(self):
+        return len(self.outbox)
+
+    async def write_outbox(self):
+        """
+        Writer task, sends the queued messages in order.
+        """
+        while not self.closing:
+            await self.outbox_ready.wait()
+            self.outbox_ready.clear()
+            while self.outbox and not self.closing:
+                _, text = self.outbox.popitem(last=False)
+                await self.send(text_data=text)
+                socket_metrics.incr("messages_sent")
+
+    async def heartbeat(self):
+        """
+        Heartbeat task, pings the client and closes the connection once it is silent for too long.
+        Also publishes the metrics of the process (throttled).
+
+        * Wakes up at the next ping or at the silence deadline, whichever comes first,
+        * so a dead peer is closed WEBSOCKET_HEARTBEAT_TIMEOUT seconds after its last message (not up to an interval later) *
+        """
+        next_ping = time.monotonic() + settings.WEBSOCKET_HEARTBEAT_INTERVAL
+        while not self.closing:
+            deadline = self.last_seen + settings.WEBSOCKET_HEARTBEAT_TIMEOUT
+            await asyncio.sleep(max(0, min(next_ping, deadline) - time.monotonic()))
+            now = time.monotonic()
+            if now - self.last_seen >= settings.WEBSOCKET_HEARTBEAT_TIMEOUT:
+                socket_metrics.incr("heartbeat_timeouts")
+                await self.stop(code=4408)
+                return
+            if now >= next_ping:
+                next_ping = now + settings.WEBSOCKET_HEARTBEAT_INTERVAL
+                self.enqueue(json.dumps({"type": "ping"}), key="ping")
+                await sync_to_async(socket_metrics.publish_snapshot)()
+
+    async def stop(self, code):
+        """
+        Closes the connection, the queued messages are discarded.
+        """
+        if self.closing:
+            return
+        self.closing = True
+        self.outbox.clear()
+        self.outbox_ready.set()
+        await self.close(code=code)
 
     async def send_notification(self, event):
         # Send notification to the client
-        await self.send(text_data=event["text"])
+        self.enqueue(event["text"])
 
     async def like_notification(self, event):
         """
@@ -36,6 +240,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 - liker_username (str): The username of the user who liked the post or comment.
                 - recipient (str): The ID of the recipient of the notification.
                 - notification_type (str): The type of notification being sent.
+                - actor_count (int): Number of likers of the coalesced notification (optional).
+                - actors (list): Latest likers, {"id", "username"} (optional).
 
         Returns:
             None
@@ -59,6 +265,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 "recipient": recipient,
                 "message": message,
                 "notification_type": notification_type,
+                "actor_count": event.get("actor_count", 1),
+                "actors": event.get("actors", []),
             }
         else:
             message = f"User {liker_username} liked comment {comment_id}. Recipient ID: {recipient}"
@@ -70,11 +278,14 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 "recipient": recipient,
                 "message": message,
                 "notification_type": notification_type,
+                "actor_count": event.get("actor_count", 1),
+                "actors": event.get("actors", []),
             }
 
         json_data = json.dumps(data)
-
-        await self.send(text_data=json_data)
+        # A coalesced notification supersedes its pending previous version.
+        key = ("like", post_id, comment_id) if "actor_count" in event else None
+        self.enqueue(json_data, key=key)
 
     async def newpost_notification(self, event):
         """
@@ -101,7 +312,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         }
 
         json_data = json.dumps(data)
-        await self.send(text_data=json_data)
+        self.enqueue(json_data)
 
     async def newcomment_notification(self, event):
         """
@@ -116,6 +327,7 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 - recipient (str): The recipient of the notification.
                 - notification_type (str): The type of notification ('newcomment' or 'newreply').
                 - reply_to (int, optional): The ID of the comment being replied to (only for 'newreply' type).
+                - actor_count / actors (optional): Commenters of the coalesced notification (only for 'newcomment' type).
 
         Returns:
             None
@@ -140,6 +352,8 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 "post_title": post_title,
                 "recipient": recipient,
                 "notification_type": notification_type,
+                "actor_count": event.get("actor_count", 1),
+                "actors": event.get("actors", []),
             }
         elif notification_type == "newreply":
             data = {
@@ -153,4 +367,5 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             }
 
         json_data = json.dumps(data)
-        await self.send(text_data=json_data)
+        coalesced = notification_type == "newcomment" and "actor_count" in event
+        self.enqueue(json_data, key=("newcomment", post_id) if coalesced else None)
@@ -0,0 +1,195 @@
+"""
+Buffered view counter for Posts.
+
+Instead of an UPDATE per detailed post read, views are accumulated in an atomic counter
+and applied to the database in bulk by flush_post_views().
+
+* Redis (django_redis cache) -> HINCRBY on a hash, shared by all processes. *
+* Any other cache backend -> in-process counter, flushed from the request path every POST_VIEWS_FLUSH_INTERVAL seconds. *
+
+Usage:
+    - record_post_view(post_id) -> on every detailed post read.
+    - get_pending_views(post_ids) -> merge not yet flushed views into the response.
+    - flush_post_views() -> periodically, see 'python manage.py flush_post_views'.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from redis.exceptions import LockError, ResponseError
+from blogs.redis_client import get_redis_connection
+from .detail_cache import invalidate_post_detail
+from .feed_index import rescore_posts
+from .models import Post
+
+PENDING_VIEWS_KEY = "posts:views:pending"  # Hash of post_id -> views not yet flushed.
+FLUSHING_VIEWS_KEY = "posts:views:flushing"  # Hash being applied to the DB by a flush.
+FLUSH_LOCK_KEY = "posts:views:flush-lock"  # Held by the running flush.
+FLUSH_LOCK_TIMEOUT = 5 * 60  # Seconds, released by Redis if the flushing process dies.
+FLUSH_CHUNK_SIZE = 500  # Max number of post ids per UPDATE.
+
+# In-process fallback.
+_local_views = Counter()
+_local_lock = threading.Lock()
+_local_last_flush = time.monotonic()
+
+
+def record_post_view(post_id):
+    """
+    Records one view of a post.
+
+    Args:
+        post_id (int): The ID of the viewed Post.
+
+    Returns:
+        int: The number of views of the post which are not flushed to the database yet (including this one).
+    """
+    redis = get_redis_connection()
+
+    if redis is None:  # In-process fallback.
+        global _local_last_flush
+        with _local_lock:
+            _local_views[post_id] += 1
+            pending = _local_views[post_id]
+            flush_due = (
+                time.monotonic() - _local_last_flush
+                >= settings.POST_VIEWS_FLUSH_INTERVAL
+            )
+        if flush_due:
+            flush_post_views()
+            return 0
+        return pending
+
+    pipe = redis.pipeline()
+    pipe.hincrby(PENDING_VIEWS_KEY, post_id, 1)
+    pipe.hget(FLUSHING_VIEWS_KEY, post_id)
+    pending, flushing = pipe.execute()
+    return pending + int(flushing or 0)
+
+
+def get_pending_views(post_ids):
+    """
+    Gets the views which are not flushed to the database yet.
+
+    Args:
+        post_ids (list): IDs of the Posts.
+
+    Returns:
+        dict: post_id -> pending views (only for posts having pending views).
+    """
+    post_ids = list(post_ids)
+    if not post_ids:
+        return {}
+
+    redis = get_redis_connection()
+
+    if redis is None:  # In-process fallback.
+        with _local_lock:
+            return {
+                post_id: _local_views[post_id]
+                for post_id in post_ids
+                if _local_views.get(post_id)
+            }
+
+    pipe = redis.pipeline()
+    pipe.hmget(PENDING_VIEWS_KEY, post_ids)
+    pipe.hmget(FLUSHING_VIEWS_KEY, post_ids)
+    pending, flushing = pipe.execute()
+
+    pending_views = {}
+    for post_id, views, flushing_views in zip(post_ids, pending, flushing):
+        total = int(views or 0) + int(flushing_views or 0)
+        if total:
+            pending_views[post_id] = total
+    return pending_views
+
+
+def apply_views(pending_views):
+    """
+    Applies views to the database with bulk F() updates.
+
+    Posts are grouped by their number of pending views, so every distinct count costs
+    one UPDATE (chunked) instead of one UPDATE per post.
+
+    Args:
+        pending_views (dict): post_id -> views to add.
+
+    Returns:
+        int: Number of posts updated.
+    """
+    posts_by_views = defaultdict(list)
+    for post_id, views in pending_views.items():
+        if views:
+            posts_by_views[views].append(post_id)
+
+    updated = 0
+    with transaction.atomic():
+        for views, post_ids in posts_by_views.items():
+            for i in range(0, len(post_ids), FLUSH_CHUNK_SIZE):
+                updated += Post.objects.filter(
+                    pk__in=post_ids[i : i + FLUSH_CHUNK_SIZE]
+                ).update(
+                    views=F("views") + views,
+                    eng_score=F("eng_score") + views * Post.VIEW_WEIGHT,
+                )
+    # Cached post details hold the flushed (DB) views, rebuild them once committed.
+    trending_scores = {
+        post_id: views * Post.VIEW_WEIGHT for post_id, views in pending_views.items()
+    }
+    transaction.on_commit(lambda: invalidate_post_detail(*pending_views))
+    transaction.on_commit(lambda: rescore_posts("trending", trending_scores))
+    return updated
+
+
+def flush_post_views():
+    """
+    Moves all pending views from the counter to the database.
+
+    Redis: flushes are serialized by a lock. The pending hash is moved with RENAMENX, so views
+    recorded during the flush go to a new hash and are never lost, and a hash which is still
+    being applied is never overwritten. If a previous flush crashed, its hash is applied first.
+    The hash is deleted inside the transaction applying it: a crash before the delete rolls the
+    UPDATEs back, so a hash is never applied twice.
+    ! A failing COMMIT after the delete loses the views of the hash (at-most-once) !
+
+    Returns:
+        int: Number of posts updated.
+    """
+    redis = get_redis_connection()
+
+    if redis is None:  # In-process fallback.
+        global _local_last_flush
+        with _local_lock:
+            pending_views = dict(_local_views)
+            _local_views.clear()
+            _local_last_flush = time.monotonic()
+        return apply_views(pending_views)
+
+    lock = redis.lock(FLUSH_LOCK_KEY, timeout=FLUSH_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):  # Another flush is running.
+        return 0
+    try:
+        try:
+            # False -> the hash of a crashed flush is still there, it is applied first.
+            redis.renamenx(PENDING_VIEWS_KEY, FLUSHING_VIEWS_KEY)
+        except ResponseError:  # No such key -> only a crashed flush to finish, if any.
+            pass
+
+        pending_views = {
+            int(post_id): int(views)
+            for post_id, views in redis.hgetall(FLUSHING_VIEWS_KEY).items()
+        }
+        if not pending_views:
+            return 0
+        with transaction.atomic():
+            updated = apply_views(pending_views)
+            redis.delete(FLUSHING_VIEWS_KEY)
+        return updated
+    finally:
+        try:
+            lock.release()
+        except LockError:  # Expired (flush slower than FLUSH_LOCK_TIMEOUT).
+            pass
@@ -0,0 +1,64 @@
+"""
+Response cache of the post detail page (SlugPostAPI).
+
+Entries are stored per (slug, entitlement tier, feed type) under the versioned "posts" namespace (blogs/cache.py),
+with the serialized post and the next / previous post slugs.
+
+Invalidation:
+    - Post saved / deleted -> "posts" namespace bumped, every entry is invalidated (neighbors may have changed).
+    - Like / Comment of a post, views flushed -> the post's own namespace ("post:<id>") is bumped,
+      entries store the version they were built with and are rebuilt when it changed.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from blogs.cache import bump_namespace, get_namespace_versions, versioned_key
+
+POSTS_NAMESPACE = "posts"
+
+
+def post_namespace(post_id):
+    return f"post:{post_id}"
+
+
+def get_post_version(post_id):
+    namespace = post_namespace(post_id)
+    return get_namespace_versions([namespace])[namespace]
+
+
+def detail_cache_key(slug, tier, post_type):
+    return versioned_key(POSTS_NAMESPACE, "post_detail", slug, tier, post_type)
+
+
+def get_cached_detail(slug, tier, post_type):
+    """
+    Returns the cached detail entry, or None if it is missing or its post changed since it was cached.
+
+    Returns:
+        dict | None: {"post_id", "post_version", "data"}
+    """
+    entry = cache.get(detail_cache_key(slug, tier, post_type))
+    if entry is None or get_post_version(entry["post_id"]) != entry["post_version"]:
+        return None
+    return entry
+
+
+def set_cached_detail(slug, tier, post_type, post_id, post_version, data):
+    """
+    Caches a detail entry.
+
+    ! post_version must be read BEFORE the data is built, so a change made in between invalidates the entry !
+    """
+    cache.set(
+        detail_cache_key(slug, tier, post_type),
+        {"post_id": post_id, "post_version": post_version, "data": data},
+        settings.POST_DETAIL_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_post_details():
+    bump_namespace(POSTS_NAMESPACE)
+
+
+def invalidate_post_detail(*post_ids):
+    bump_namespace(*(post_namespace(post_id) for post_id in post_ids))
@@ -0,0 +1,509 @@
+"""
+Notification dispatcher (outbox).
+
+Signal handlers don't create Notifications or push WebSocket messages on the request path anymore.
+They enqueue a compact event (kind + IDs) after the transaction commits, and a worker drains the
+queue in batches: related objects are loaded with a few bulk queries, Notifications are written
+with one bulk_create and the channel messages of the batch are sent together.
+
+Likes and comments are coalesced per (recipient, type, target), see coalesce().
+
+Transports (settings.NOTIFICATION_DISPATCHER):
+    - "redis" -> Redis list shared by all processes, drained by 'python manage.py dispatch_notifications --loop'.
+      Use with the Redis channel layer, so the worker reaches sockets held by other processes.
+    - "local" -> in-process queue drained by a background thread (works with the InMemoryChannelLayer).
+      Also used when the cache is not Redis.
+
+! Delivery is at-most-once: a batch popped by a worker that crashes before writing it is lost. !
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import queue
+import threading
+from collections import Counter
+from asgiref.sync import SyncToAsync, async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+from accounts.models import CustomUser
+from blogs.redis_client import get_redis_connection
+from .consumers import user_group_name, NEWPOST_GROUP
+from .inbox import add_unread_counts
+from .models import Comment, Notifications, Post
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_KEY = "posts:notifications:outbox"
+
+# In-process transport.
+_local_outbox = queue.Queue()
+_local_worker = None
+_local_worker_lock = threading.Lock()
+# Event loop of the ASGI server, the InMemoryChannelLayer only delivers messages sent on it.
+_local_loop = None
+
+
+def enqueue_notification(kind, **ids):
+    """
+    Enqueues a notification event once the current transaction commits.
+
+    Args:
+        kind (str): The notification type ('add-post-like', 'add-comment-like', 'newcomment', 'newreply', 'newpost').
+        **ids: IDs the notification is built from (post_id, comment_id, actor_id).
+    """
+    event = {"kind": kind, **ids}
+    transaction.on_commit(lambda: push_event(event))
+
+
+def push_event(event):
+    """
+    Queues an event on the configured transport (Redis outbox or in-process queue).
+    """
+    global _local_loop
+    redis = (
+        get_redis_connection() if settings.NOTIFICATION_DISPATCHER == "redis" else None
+    )
+    if redis is None:
+        # * Set when the request runs in a sync_to_async thread of the ASGI server *
+        _local_loop = (
+            getattr(SyncToAsync.threadlocal, "main_event_loop", None) or _local_loop
+        )
+        _local_outbox.put(event)
+        _start_local_worker()
+        return
+    redis.rpush(OUTBOX_KEY, json.dumps(event))
+
+
+def pop_events(batch_size):
+    """
+    Pops up to 'batch_size' events from the Redis outbox.
+
+    Returns:
+        list: Events (dict), empty if the outbox is empty or Redis is not available.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return []
+    events = redis.lpop(OUTBOX_KEY, batch_size) or []
+    return [json.loads(event) for event in events]
+
+
+def _start_local_worker():
+    global _local_worker
+    with _local_worker_lock:
+        if _local_worker is None or not _local_worker.is_alive():
+            _local_worker = threading.Thread(
+                target=_run_local_worker, name="notification-dispatcher", daemon=True
+            )
+            _local_worker.start()
+
+
+def _run_local_worker():
+    """
+    Background thread of the in-process transport, dispatches queued events in batches.
+    """
+    while True:
+        events = [_local_outbox.get()]  # Blocks until there is an event.
+        while len(events) < settings.NOTIFICATION_DISPATCH_BATCH_SIZE:
+            try:
+                events.append(_local_outbox.get_nowait())
+            except queue.Empty:
+                break
+        try:
+            dispatch_events(events, loop=_local_loop)
+        finally:
+            close_old_connections()
+
+
+def dispatch_events(events, loop=None):
+    """
+    Dispatches a batch of events, without raising.
+
+    If the batch fails, its events are dispatched one by one, so a bad event only loses itself
+    (logged) instead of the whole batch. Failed batches don't write anything (dispatch_batch is atomic).
+
+    Returns:
+        int: Number of Notifications saved.
+    """
+    try:
+        return dispatch_batch(events, loop=loop)
+    except Exception:
+        if len(events) == 1:
+            logger.exception("Failed to dispatch notification event %s", events[0])
+            return 0
+        logger.exception(
+            "Failed to dispatch %s notification events, retrying one by one.",
+            len(events),
+        )
+    return sum(dispatch_events([event], loop=loop) for event in events)
+
+
+def dispatch_batch(events, loop=None):
+    """
+    Builds, saves and sends the notifications of a batch of events.
+
+    * Queries: posts (1), comments (1), actors (1), bulk_create (1) regardless of the batch size *
+    * Unread counters of the inboxes are incremented (posts/inbox.py) *
+
+    Args:
+        events (list): Events queued by enqueue_notification().
+        loop: Event loop to send the channel messages on, None to use a new one.
+
+    Returns:
+        int: Number of Notifications saved.
+    """
+    post_ids = {event["post_id"] for event in events if event.get("post_id")}
+    comment_ids = {event["comment_id"] for event in events if event.get("comment_id")}
+    actor_ids = {event["actor_id"] for event in events if event.get("actor_id")}
+
+    posts = Post.objects.select_related("author").in_bulk(post_ids)
+    comments = Comment.objects.select_related(
+        "author", "post", "parent_comment__author"
+    ).in_bulk(comment_ids)
+    actors = CustomUser.objects.only("id", "username").in_bulk(actor_ids)
+
+    results = []  # (notification or None, group, message)
+    for event in events:
+        builder = EVENT_BUILDERS.get(event["kind"])
+        if builder is None:
+            logger.warning("Unknown notification event %s", event)
+            continue
+        result = builder(event, posts, comments, actors)
+        if result is None:  # Object was deleted before the event was dispatched.
+            continue
+        results.append(result)
+
+    results, updated = coalesce(results)
+    created = [
+        notification
+        for notification, _, _ in results
+        if notification is not None and notification.pk is None
+    ]
+    messages = [(group, message) for _, group, message in results]
+
+    with transaction.atomic():
+        Notifications.objects.bulk_create(created)
+        Notifications.objects.bulk_update(
+            updated, ["message", "comment", "actor_count", "actors", "created_at"]
+        )
+    add_unread_counts(Counter(notification.user_id for notification in created))
+    try:
+        send_channel_messages(messages, loop=loop)
+    except Exception:  # Saved, the live push is best-effort (clients read the inbox).
+        logger.exception("Failed to send %s channel messages.", len(messages))
+    return len(created) + len(updated)
+
+
+# Coalescing #
+# Likes / comments of the same target are merged per (recipient, type, target) into one notification,
+# within the batch and with the recipient's unread notification of the last NOTIFICATION_COALESCE_WINDOW seconds.
+# -> 1 row written and 1 channel message per target and batch, instead of one per event.
+
+# Notification type -> field of the target.
+COALESCED_TYPES = {
+    "add-post-like": "post_id",
+    "add-comment-like": "comment_id",
+    "newcomment": "post_id",
+}
+
+
+def coalesce_key(notification):
+    if notification is None or notification.notification_type not in COALESCED_TYPES:
+        return None
+    target_field = COALESCED_TYPES[notification.notification_type]
+    return (
+        notification.user_id,
+        notification.notification_type,
+        getattr(notification, target_field),
+    )
+
+
+def merge_actors(latest, older):
+    """
+    Folds the actors of an older notification into the latest one (same key), latest actors first.
+
+    ! actor_count is approximate: a repeated actor is only detected while it is in the sample !
+    """
+    latest_ids = {actor["id"] for actor in latest.actors}
+    repeated = sum(1 for actor in older.actors if actor["id"] in latest_ids)
+    latest.actors = (
+        latest.actors
+        + [actor for actor in older.actors if actor["id"] not in latest_ids]
+    )[: settings.NOTIFICATION_SAMPLE_ACTORS]
+    latest.actor_count += older.actor_count - repeated
+
+
+def get_recent_notifications(keys, now):
+    """
+    Loads the unread notifications of the coalescing window matching the keys, one query.
+
+    Returns:
+        dict: key -> latest matching Notification.
+    """
+    keys = set(keys)
+    if not keys:
+        return {}
+    recent = (
+        Notifications.objects.filter(
+            user_id__in={user_id for user_id, _, _ in keys},
+            notification_type__in={kind for _, kind, _ in keys},
+            is_read=False,
+            created_at__gte=now
+            - datetime.timedelta(seconds=settings.NOTIFICATION_COALESCE_WINDOW),
+        )
+        .filter(
+            Q(post_id__in={target for _, _, target in keys})
+            | Q(comment_id__in={target for _, _, target in keys})
+        )
+        .only(
+            "id",
+            "user_id",
+            "notification_type",
+            "post_id",
+            "comment_id",
+            "actor_count",
+            "actors",
+        )
+        .order_by("created_at", "id")
+    )
+    # Later rows overwrite earlier ones -> latest notification per key.
+    return {
+        coalesce_key(notification): notification
+        for notification in recent
+        if coalesce_key(notification) in keys
+    }
+
+
+def coalesce(results):
+    """
+    Merges the coalescable notifications of a batch (see COALESCED_TYPES).
+
+    Merged notifications are named after their latest actor, e.g. '@alice and 41 others liked your post "T".',
+    and the channel message of the latest event is sent once, with 'actor_count' and 'actors' added.
+
+    Args:
+        results (list): (notification or None, group, message) built from the events, in event order.
+
+    Returns:
+        tuple: (results with one entry per key, existing notifications to update)
+    """
+    # key -> latest result of the key, at the position of its first event.
+    # Results which are not coalesced are keyed by their index.
+    merged = {}
+    for index, result in enumerate(results):
+        key = coalesce_key(result[0])
+        if key is None:
+            merged[index] = result
+            continue
+        if key in merged:
+            merge_actors(result[0], merged[key][0])
+        merged[key] = result
+
+    now = timezone.now()
+    keys = [key for key in merged if isinstance(key, tuple)]
+    existing = get_recent_notifications(keys, now)
+    updated = []
+    for key in keys:
+        notification, _, message = merged[key]
+        previous = existing.get(key)
+        if previous is not None:
+            merge_actors(notification, previous)
+            notification.pk = previous.pk
+            notification.created_at = now  # Moves it to the top of the inbox.
+            updated.append(notification)
+        notification.message = MESSAGE_RENDERERS[notification.notification_type](
+            notification
+        )
+        message["actor_count"] = notification.actor_count
+        message["actors"] = notification.actors
+
+    return list(merged.values()), updated
+
+
+def send_channel_messages(messages, loop=None):
+    """
+    Sends the channel messages of a batch concurrently.
+
+    Args:
+        messages (list): (group, message) pairs.
+        loop: Event loop to send the messages on, None to use a new one.
+    """
+    if not messages:
+        return
+    channel_layer = get_channel_layer()
+    if loop is not None and loop.is_running():
+        asyncio.run_coroutine_threadsafe(
+            _group_send_all(channel_layer, messages), loop
+        ).result(timeout=30)
+    else:
+        async_to_sync(_group_send_all)(channel_layer, messages)
+
+
+async def _group_send_all(channel_layer, messages):
+    await asyncio.gather(
+        *(channel_layer.group_send(group, message) for group, message in messages)
+    )
+
+
+# Event Builders #
+# Each builder returns (Notification or None, group, channel message), or None to skip the event.
+# Messages of the coalesced types are rendered by coalesce() (MESSAGE_RENDERERS).
+
+
+def actor_data(user):
+    return {"id": user.id, "username": user.username}
+
+
+def actors_text(notification):
+    """
+    e.g. 'alice', 'alice and 1 other', 'alice and 41 others' (latest actor first).
+    """
+    name = notification.actors[0]["username"]
+    others = notification.actor_count - 1
+    if others <= 0:
+        return name
+    return f"{name} and {others} {'other' if others == 1 else 'others'}"
+
+
+# Same texts as before coalescing for a single actor.
+MESSAGE_RENDERERS = {
+    "add-post-like": lambda notification: (
+        f'@{actors_text(notification)} liked your post "{notification.post.post_title}".'
+    ),
+    "add-comment-like": lambda notification: (
+        f"{actors_text(notification)} liked your comment. "
+        f'"{notification.comment.comment_text[:10]}."'
+    ),
+    "newcomment": lambda notification: (
+        f'{actors_text(notification)} commented on your post "{notification.post.post_title}".'
+    ),
+}
+
+
+def build_post_like(event, posts, comments, actors):
+    post = posts.get(event["post_id"])
+    liker = actors.get(event["actor_id"])
+    if post is None or liker is None:
+        return None
+    notification = Notifications(
+        user=post.author,
+        notification_type="add-post-like",
+        post=post,
+        comment=None,
+        actors=[actor_data(liker)],
+    )
+    message = {
+        "type": "like_notification",
+        "post_id": post.id,
+        "comment_id": None,
+        "liker_id": liker.id,
+        "liker_username": liker.username,
+        "recipient": post.author_id,
+        "notification_type": "add-post-like",
+    }
+    return notification, user_group_name(post.author_id), message
+
+
+def build_comment_like(event, posts, comments, actors):
+    comment = comments.get(event["comment_id"])
+    liker = actors.get(event["actor_id"])
+    if comment is None or liker is None:
+        return None
+    notification = Notifications(
+        user=comment.author,
+        notification_type="add-comment-like",
+        post=None,
+        comment=comment,
+        actors=[actor_data(liker)],
+    )
+    message = {
+        "type": "like_notification",
+        "post_id": None,
+        "comment_id": comment.id,
+        "liker_id": liker.id,
+        "liker_username": liker.username,
+        "recipient": comment.author_id,
+        "notification_type": "add-comment-like",
+    }
+    return notification, user_group_name(comment.author_id), message
+
+
+def build_new_comment(event, posts, comments, actors):
+    comment = comments.get(event["comment_id"])
+    if comment is None or comment.post is None:
+        return None
+    post = comment.post
+    notification = Notifications(
+        user_id=post.author_id,
+        notification_type="newcomment",
+        post=post,
+        comment=comment,
+        actors=[actor_data(comment.author)],
+    )
+    message = {
+        "type": "newcomment_notification",
+        "author_id": comment.author_id,
+        "author_username": comment.author.username,
+        "post_id": post.id,
+        "post_title": post.post_title,
+        "recipient": post.author_id,
+        "reply_to": None,
+        "notification_type": "newcomment",
+    }
+    return notification, user_group_name(post.author_id), message
+
+
+def build_new_reply(event, posts, comments, actors):
+    comment = comments.get(event["comment_id"])
+    if comment is None or comment.post is None or comment.parent_comment is None:
+        return None
+    post = comment.post
+    parent_comment = comment.parent_comment
+    notification = Notifications(
+        user=parent_comment.author,
+        notification_type="newreply",
+        post=post,
+        comment=comment,
+        message=f'{comment.author.username} replied to your comment "{parent_comment.comment_text}".',
+    )
+    message = {
+        "type": "newcomment_notification",
+        "author_id": comment.author_id,
+        "author_username": comment.author.username,
+        "post_id": post.id,
+        "post_title": post.post_title,
+        "recipient": parent_comment.author_id,
+        "reply_to": parent_comment.comment_text,
+        "notification_type": "newreply",
+    }
+    return notification, user_group_name(parent_comment.author_id), message
+
+
+def build_new_post(event, posts, comments, actors):
+    # * Broadcast to the opt-in topic only, no Notification row (one per user would be a fan-out write) *
+    post = posts.get(event["post_id"])
+    if post is None:
+        return None
+    message = {
+        "type": "newpost_notification",
+        "post_id": post.id,
+        "author_username": post.author.username,
+        "author_id": post.author_id,
+        "post_title": post.post_title,
+        "notification_type": "newpost",
+    }
+    return None, NEWPOST_GROUP, message
+
+
+EVENT_BUILDERS = {
+    "add-post-like": build_post_like,
+    "add-comment-like": build_comment_like,
+    "newcomment": build_new_comment,
+    "newreply": build_new_reply,
+    "newpost": build_new_post,
+}
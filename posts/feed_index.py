@@ -0,0 +1,295 @@
+"""
+Neighbor index of the post feeds (next / previous post of the detail page).
+
+Every feed (all, featured, top, popular, trending) and entitlement tier (free, premium) is a Redis sorted set
+of the published posts, in the same order as the feed's list view:
+    - score -> the feed's sort value, negated (feeds are sorted descending, sorted sets ascending).
+    - member -> zero-padded post id, so members with the same score are ordered by id like the 'id' tiebreak.
+The slugs are stored once, in a hash of post id -> slug.
+
+A neighbor lookup is a ZRANK + ZRANGE of 3 members (O(log n)) instead of two ordered queries.
+
+Updates:
+    - Post saved / published / deleted -> index_posts() / remove_posts() (posts/signals.py, posts/scheduler.py).
+    - Like / Comment added or removed, views flushed -> rescore_posts(), ZADD XX INCR on the popular / trending feeds.
+    - Engagement Scores refreshed -> set_scores().
+    - Full rebuild -> python manage.py rebuild_feed_index (required once, until then lookups fall back to the DB).
+
+Without Redis (e.g. LocMemCache in development) every function is a no-op and get_neighbors() returns None.
+"""
+
+import datetime
+from blogs.redis_client import get_redis_connection
+from .models import Post
+
+FEED_KEY = "posts:feed:{feed}:{tier}"  # Sorted set of post ids.
+SLUGS_KEY = "posts:feed:slugs"  # Hash of post id -> post_slug.
+# Set by rebuild_feed_index(), lookups fall back to the DB until then.
+READY_KEY = "posts:feed:ready"
+
+TIERS = ("free", "premium")
+
+# Ordering of every feed, same as its list view. Last field is the unique tiebreak.
+FEED_ORDERINGS = {
+    "all": ("-posted_at", "id"),
+    "featured": ("-posted_at", "id"),
+    "top": ("-posted_at", "id"),
+    "popular": ("-total_likes", "-total_comments", "id"),
+    "trending": ("-eng_score", "id"),
+}
+FEED_FILTERS = {
+    "featured": {"is_featured": True},
+    "top": {"is_top_post": True},
+}
+
+# Popular score = likes * POPULAR_LIKE_FACTOR + comments, exact in a float up to ~900M likes.
+POPULAR_LIKE_FACTOR = 10**7
+_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def feed_key(feed, tier):
+    return FEED_KEY.format(feed=feed, tier=tier)
+
+
+def feed_keys():
+    return [feed_key(feed, tier) for feed in FEED_ORDERINGS for tier in TIERS]
+
+
+def post_member(post_id):
+    return f"{post_id:012d}"
+
+
+def feed_score(feed, post):
+    """
+    Returns the sorted set score of a post in a feed.
+
+    Args:
+        feed (str): Feed name.
+        post (Post): Post annotated with 'total_likes' and 'total_comments' (Post.objects.with_engagement()).
+
+    Returns:
+        float: The negated sort value.
+    """
+    if feed == "popular":
+        return -(post.total_likes * POPULAR_LIKE_FACTOR + post.total_comments)
+    if feed == "trending":
+        return -post.eng_score
+    # Microseconds since epoch, exact in a float (< 2 ** 53).
+    return -((post.posted_at - _EPOCH) // datetime.timedelta(microseconds=1))
+
+
+def post_feeds(post):
+    """
+    Returns the (feed, tier) pairs a post is listed in.
+    """
+    if not post.is_published:  # Scheduled.
+        return set()
+    tiers = TIERS if not post.is_premium_post else ("premium",)
+    return {
+        (feed, tier)
+        for feed in FEED_ORDERINGS
+        if all(
+            getattr(post, field) == value
+            for field, value in FEED_FILTERS.get(feed, {}).items()
+        )
+        for tier in tiers
+    }
+
+
+def indexed_posts():
+    return Post.objects.with_engagement().only(
+        "id",
+        "post_slug",
+        "posted_at",
+        "is_featured",
+        "is_top_post",
+        "is_premium_post",
+        "is_published",
+        "eng_score",
+    )
+
+
+def index_posts(post_ids):
+    """
+    Adds / moves / removes posts in every feed according to their current state in the database.
+
+    Args:
+        post_ids (list): IDs of the created / updated Posts.
+    """
+    redis = get_redis_connection()
+    post_ids = list(post_ids)
+    if redis is None or not post_ids:
+        return
+
+    posts = {post.pk: post for post in indexed_posts().filter(pk__in=post_ids)}
+    pipe = redis.pipeline()
+    for post_id in post_ids:
+        post = posts.get(post_id)
+        member = post_member(post_id)
+        feeds = post_feeds(post) if post is not None else set()
+        for feed in FEED_ORDERINGS:
+            for tier in TIERS:
+                if (feed, tier) in feeds:
+                    pipe.zadd(feed_key(feed, tier), {member: feed_score(feed, post)})
+                else:
+                    pipe.zrem(feed_key(feed, tier), member)
+        if post is not None:
+            pipe.hset(SLUGS_KEY, post_id, post.post_slug)
+        else:
+            pipe.hdel(SLUGS_KEY, post_id)
+    pipe.execute()
+
+
+def remove_posts(post_ids):
+    """
+    Removes deleted posts from every feed.
+    """
+    redis = get_redis_connection()
+    post_ids = list(post_ids)
+    if redis is None or not post_ids:
+        return
+
+    members = [post_member(post_id) for post_id in post_ids]
+    pipe = redis.pipeline()
+    for key in feed_keys():
+        pipe.zrem(key, *members)
+    pipe.hdel(SLUGS_KEY, *post_ids)
+    pipe.execute()
+
+
+def rescore_posts(feed, deltas):
+    """
+    Increments the sort value of posts in a feed (ZADD XX INCR), posts which are not indexed are skipped.
+
+    Args:
+        feed (str): "popular" or "trending".
+        deltas (dict): post_id -> increment of the sort value (e.g. +Post.LIKE_WEIGHT on trending).
+    """
+    redis = get_redis_connection()
+    if redis is None or not deltas:
+        return
+
+    pipe = redis.pipeline()
+    for post_id, delta in deltas.items():
+        if delta:
+            for tier in TIERS:
+                pipe.zadd(
+                    feed_key(feed, tier),
+                    {post_member(post_id): -delta},
+                    xx=True,
+                    incr=True,
+                )
+    pipe.execute()
+
+
+def set_scores(feed, values):
+    """
+    Sets the sort value of indexed posts in a feed (ZADD XX), e.g. after the Engagement Scores were recomputed.
+
+    Args:
+        feed (str): "popular" or "trending".
+        values (dict): post_id -> sort value.
+    """
+    redis = get_redis_connection()
+    if redis is None or not values:
+        return
+
+    scores = {post_member(post_id): -value for post_id, value in values.items()}
+    pipe = redis.pipeline()
+    for tier in TIERS:
+        pipe.zadd(feed_key(feed, tier), scores, xx=True)
+    pipe.execute()
+
+
+def get_neighbors(post_id, feed, tier):
+    """
+    Looks up the next and previous post of a post in a feed.
+
+    Args:
+        post_id (int): The ID of the Post.
+        feed (str): Feed name (key of FEED_ORDERINGS).
+        tier (str): "free" or "premium".
+
+    Returns:
+        tuple | None: (next_post_slug, previous_post_slug), a slug is None at the end of the feed.
+            None if the index can't answer (no Redis, not built, post not indexed) -> use the database.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return None
+
+    key = feed_key(feed, tier)
+    member = post_member(post_id)
+    pipe = redis.pipeline()
+    pipe.exists(READY_KEY)
+    pipe.zrank(key, member)
+    ready, rank = pipe.execute()
+    if not ready or rank is None:
+        return None
+
+    members = [m.decode() for m in redis.zrange(key, max(rank - 1, 0), rank + 1)]
+    position = members.index(member)
+    previous_id = int(members[position - 1]) if position > 0 else None
+    next_id = int(members[position + 1]) if position + 1 < len(members) else None
+    neighbor_ids = [i for i in (next_id, previous_id) if i is not None]
+    slugs = (
+        dict(zip(neighbor_ids, redis.hmget(SLUGS_KEY, neighbor_ids)))
+        if neighbor_ids
+        else {}
+    )
+    next_slug, previous_slug = (
+        slugs[i].decode() if slugs.get(i) is not None else None
+        for i in (next_id, previous_id)
+    )
+    return next_slug, previous_slug
+
+
+def rebuild_feed_index(batch_size=1000):
+    """
+    Rebuilds every feed from the database.
+
+    Feeds are written to temporary keys and swapped in with RENAME in one transaction,
+    so lookups never see a half built index.
+
+    ! Incremental updates made while the rebuild runs may be lost, until the post is updated again !
+
+    Args:
+        batch_size (int): Posts loaded and written per round trip.
+
+    Returns:
+        int: Number of indexed posts, None without Redis.
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        return None
+
+    keys = feed_keys() + [SLUGS_KEY]
+    temp_keys = {key: f"{key}:rebuild" for key in keys}
+    redis.delete(*temp_keys.values())
+
+    written = set()
+    indexed = 0
+    posts = indexed_posts().filter(is_published=True).order_by("id")
+    pipe = redis.pipeline(transaction=False)
+    for post in posts.iterator(chunk_size=batch_size):
+        member = post_member(post.pk)
+        for feed, tier in post_feeds(post):
+            key = temp_keys[feed_key(feed, tier)]
+            pipe.zadd(key, {member: feed_score(feed, post)})
+            written.add(key)
+        pipe.hset(temp_keys[SLUGS_KEY], post.pk, post.post_slug)
+        written.add(temp_keys[SLUGS_KEY])
+        indexed += 1
+        if indexed % batch_size == 0:
+            pipe.execute()
+    pipe.execute()
+
+    pipe = redis.pipeline()  # MULTI / EXEC
+    for key, temp_key in temp_keys.items():
+        if temp_key in written:
+            pipe.rename(temp_key, key)
+        else:  # Empty feed.
+            pipe.delete(key)
+    pipe.set(READY_KEY, 1)
+    pipe.execute()
+    return indexed
@@ -0,0 +1,168 @@
+"""
+Edit history (PostHistory snapshots) of Posts.
+
+A snapshot is written on every update of a versioned field, saves limited to other fields
+(e.g. save(update_fields=["views"])) don't create one.
+
+Text deltas (settings.POST_HISTORY_TEXT_DELTAS):
+    Instead of a full copy of 'post_text' (up to 3000 chars), a snapshot stores a compact delta
+    against the previous snapshot in 'post_text_delta' (and an empty 'post_text').
+    Every POST_HISTORY_KEYFRAME_INTERVAL snapshots (and when the delta isn't smaller) the full text
+    is stored again, so rebuilding a text never applies more than that many deltas.
+
+    Delta format (JSON list): int > 0 -> copy n chars, int < 0 -> skip n chars, str -> insert the string.
+
+    ! Deleting single snapshots of a post breaks the texts of the following delta snapshots !
+"""
+
+import difflib
+import json
+from django.conf import settings
+from django.db import transaction
+from .models import PostHistory
+
+# Fields copied to the snapshot, saves not touching any of them are not versioned.
+VERSIONED_FIELDS = {
+    "author",
+    "category",
+    "post_title",
+    "post_slug",
+    "post_text",
+    "is_featured",
+    "is_top_post",
+    "posted_at",
+}
+
+
+def make_delta(old, new):
+    """
+    Returns the compact delta turning 'old' into 'new'.
+    """
+    delta = []
+    matcher = difflib.SequenceMatcher(None, old, new, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            delta.append(i2 - i1)
+            continue
+        if i2 > i1:  # delete / replace
+            delta.append(i1 - i2)
+        if j2 > j1:  # insert / replace
+            delta.append(new[j1:j2])
+    return delta
+
+
+def apply_delta(old, delta):
+    """
+    Returns the text produced by applying 'delta' (see make_delta()) to 'old'.
+    """
+    parts = []
+    position = 0
+    for op in delta:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.append(old[position : position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(parts)
+
+
+def get_text_delta(post, text):
+    """
+    Returns the delta of 'text' against the latest snapshot of the post,
+    or None if the full text has to be stored (no snapshot, keyframe due, delta not smaller).
+    """
+    interval = settings.POST_HISTORY_KEYFRAME_INTERVAL
+    # Latest snapshots first, up to the latest keyframe (full text).
+    recent = list(
+        PostHistory.objects.filter(post=post)
+        .order_by("-id")
+        .values_list("post_text", "post_text_delta")[:interval]
+    )
+    keyframe = next((i for i, (_, delta) in enumerate(recent) if delta is None), None)
+    if keyframe is None or keyframe + 1 >= interval:
+        return None
+
+    previous_text = recent[keyframe][0]
+    for _, delta in reversed(recent[:keyframe]):
+        previous_text = apply_delta(previous_text, delta)
+
+    delta = make_delta(previous_text, text)
+    if len(json.dumps(delta, separators=(",", ":"))) >= len(text):
+        return None
+    return delta
+
+
+def create_post_snapshot(post):
+    """
+    Writes a snapshot of the post, with its tags in one bulk insert.
+
+    Returns:
+        PostHistory: The created snapshot.
+    """
+    post_text, post_text_delta = post.post_text, None
+    if settings.POST_HISTORY_TEXT_DELTAS:
+        post_text_delta = get_text_delta(post, post.post_text)
+        if post_text_delta is not None:
+            post_text = ""
+
+    with transaction.atomic():
+        history = PostHistory.objects.create(
+            post=post,
+            author_id=post.author_id,
+            category_id=post.category_id,
+            post_title=post.post_title,
+            post_slug=post.post_slug,
+            post_text=post_text,
+            post_text_delta=post_text_delta,
+            is_featured=post.is_featured,
+            is_top_post=post.is_top_post,
+            views=post.views,
+            posted_at=post.posted_at,
+        )
+        PostTags = PostHistory.tags.through
+        PostTags.objects.bulk_create(
+            PostTags(posthistory_id=history.pk, tag_id=tag_id)
+            for tag_id in post.tags.values_list("id", flat=True)
+        )
+    return history
+
+
+def resolve_post_texts(snapshots):
+    """
+    Rebuilds 'post_text' of delta snapshots in place, with one query for all the snapshots.
+    Rebuilt snapshots are flagged ('text_resolved') and skipped by later calls.
+
+    Args:
+        snapshots (list): PostHistory objects.
+    """
+    pending = [
+        snapshot
+        for snapshot in snapshots
+        if snapshot.post_text_delta is not None
+        and not getattr(snapshot, "text_resolved", False)
+    ]
+    if not pending:
+        return
+
+    texts = {}
+    current = {}  # post_id -> text of the latest snapshot walked.
+    rows = (
+        PostHistory.objects.filter(
+            post_id__in={snapshot.post_id for snapshot in pending},
+            id__lte=max(snapshot.pk for snapshot in pending),
+        )
+        .order_by("post_id", "id")
+        .values_list("id", "post_id", "post_text", "post_text_delta")
+    )
+    for history_id, post_id, post_text, delta in rows.iterator():
+        if delta is None:
+            current[post_id] = post_text
+        else:
+            current[post_id] = apply_delta(current.get(post_id, ""), delta)
+        texts[history_id] = current[post_id]
+
+    for snapshot in pending:
+        snapshot.post_text = texts.get(snapshot.pk, "")
+        snapshot.text_resolved = True
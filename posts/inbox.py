@@ -0,0 +1,94 @@
+"""
+Unread notification counter of the inbox.
+
+The counter of a user is kept in the cache and updated by the notification writers
+(posts/dispatcher.py) and by mark_read(), so reading it is O(1) instead of a COUNT per request.
+
+Writers only change the counter with the atomic cache.incr() (no read-modify-write). A missing
+counter (never read, evicted or expired) is recomputed from the database with an indexed COUNT on
+(user, is_read) and stored with cache.add(). A writer that finds no counter, or that drops it, bumps
+the generation of the user instead: the counters are keyed by generation, so a COUNT that was
+running meanwhile stores its (stale) result under the previous generation, which is never read again.
+Counters expire after NOTIFICATION_UNREAD_COUNT_TIMEOUT seconds, so drifts (e.g. notifications
+removed by a cascade delete) are corrected periodically.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+from .models import Notifications
+
+
+def unread_generation_key(user_id):
+    return f"notifications:unread:{user_id}:generation"
+
+
+def unread_count_key(user_id, generation=0):
+    return f"notifications:unread:{user_id}:{generation}"
+
+
+def get_unread_count(user_id):
+    """
+    Returns the number of unread notifications of a user.
+    """
+    key = unread_count_key(user_id, cache.get(unread_generation_key(user_id), 0))
+    count = cache.get(key)
+    if count is None:
+        count = Notifications.objects.filter(user_id=user_id, is_read=False).count()
+        cache.add(key, count, settings.NOTIFICATION_UNREAD_COUNT_TIMEOUT)
+    return count
+
+
+def add_unread_counts(counts):
+    """
+    Adds new unread notifications to the counters of their users.
+
+    Args:
+        counts (dict): user_id -> number of new (unread) notifications, negative to subtract.
+    """
+    counts = {user_id: count for user_id, count in counts.items() if count}
+    generations = cache.get_many([unread_generation_key(user_id) for user_id in counts])
+    for user_id, count in counts.items():
+        generation = generations.get(unread_generation_key(user_id), 0)
+        try:
+            if cache.incr(unread_count_key(user_id, generation), count) >= 0:
+                continue
+        except ValueError:  # Not cached, a COUNT may be running.
+            pass
+        reset_unread_count(user_id)
+
+
+def reset_unread_count(user_id):
+    """
+    Drops the counter of a user, e.g. after a notification was updated one by one.
+
+    The next read recomputes it, counts running meanwhile are discarded.
+    """
+    key = unread_generation_key(user_id)
+    if cache.add(key, 1, None):
+        return
+    try:
+        cache.incr(key)
+    except ValueError:  # Evicted meanwhile.
+        cache.add(key, 1, None)
+
+
+def mark_read(user_id, notification_ids=None):
+    """
+    Marks notifications of a user as read with one UPDATE.
+
+    Args:
+        user_id (int): The ID of the user.
+        notification_ids (list): IDs of the notifications, None to mark all of them.
+
+    Returns:
+        int: Number of notifications marked as read.
+    """
+    notifications = Notifications.objects.filter(user_id=user_id, is_read=False)
+    if notification_ids is not None:
+        notifications = notifications.filter(pk__in=notification_ids)
+    updated = notifications.update(is_read=True)
+    if notification_ids is None:
+        reset_unread_count(user_id)  # Notifications may have been added meanwhile.
+    else:
+        add_unread_counts({user_id: -updated})
+    return updated
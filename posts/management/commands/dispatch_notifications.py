@@ -0,0 +1,48 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from posts.dispatcher import dispatch_events, pop_events
+
+
+class Command(BaseCommand):
+    """
+    Saves and sends the notifications queued in the Redis outbox (posts/dispatcher.py).
+
+    Usage:
+        python manage.py dispatch_notifications  # Drain the outbox once (e.g. from cron).
+        python manage.py dispatch_notifications --loop --interval 1  # Run as a background worker.
+    """
+
+    help = "Dispatches queued notification events in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep polling the outbox every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1,
+            help="Seconds to wait when the outbox is empty while running with --loop.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=settings.NOTIFICATION_DISPATCH_BATCH_SIZE,
+            help="Max events saved / sent per batch.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            events = pop_events(options["batch_size"])
+            if events:
+                saved = dispatch_events(events)  # Logs failed events, never raises.
+                self.stdout.write(
+                    f"Dispatched {len(events)} events ({saved} notifications saved)."
+                )
+                continue  # Outbox may have more events.
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
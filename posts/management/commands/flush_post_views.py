@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from posts.counters import flush_post_views
+
+
+class Command(BaseCommand):
+    """
+    Applies the buffered Post views (posts/counters.py) to the database.
+
+    Usage:
+        python manage.py flush_post_views  # Flush once (e.g. from cron).
+        python manage.py flush_post_views --loop --interval 30  # Run as a background worker.
+    """
+
+    help = "Flushes buffered post views to the database with bulk F() updates."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep flushing every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=30,
+            help="Seconds between two flushes when running with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated = flush_post_views()
+            self.stdout.write(f"Flushed views of {updated} posts.")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
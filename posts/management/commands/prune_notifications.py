@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from posts.retention import prune_notifications
+
+
+class Command(BaseCommand):
+    """
+    Deletes (or archives) read notifications older than the retention age (posts/retention.py).
+
+    Should run periodically (e.g. daily via cron).
+
+    Usage:
+        python manage.py prune_notifications  # settings.NOTIFICATION_RETENTION_DAYS
+        python manage.py prune_notifications --days 30 --archive notifications.jsonl
+        python manage.py prune_notifications --dry-run
+    """
+
+    help = "Deletes read notifications older than the retention age in short primary key range chunks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Retention age in days, defaults to settings.NOTIFICATION_RETENTION_DAYS.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Primary key range deleted per transaction, defaults to settings.NOTIFICATION_PRUNE_CHUNK_SIZE.",
+        )
+        parser.add_argument(
+            "--archive",
+            help="Append the deleted notifications to this JSON Lines file before deleting them.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the notifications that would be deleted.",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to sleep between two chunks.",
+        )
+
+    def handle(self, *args, **options):
+        kwargs = {
+            "days": options["days"],
+            "chunk_size": options["chunk_size"],
+            "dry_run": options["dry_run"],
+            "pause": options["pause"],
+        }
+        if options["archive"] and not options["dry_run"]:
+            with open(options["archive"], "a", encoding="utf-8") as archive:
+                metrics = prune_notifications(archive=archive, **kwargs)
+        else:
+            metrics = prune_notifications(**kwargs)
+
+        if options["dry_run"]:
+            self.stdout.write(
+                f"{metrics['deleted']} read notifications created before {metrics['cutoff']} would be deleted."
+            )
+            return
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Deleted {metrics['deleted']} read notifications created before {metrics['cutoff']} "
+                f"({metrics['archived']} archived) in {metrics['chunks']} chunks, {metrics['seconds']}s."
+            )
+        )
@@ -0,0 +1,36 @@
+import time
+from django.core.management.base import BaseCommand
+from posts.scheduler import publish_due_posts
+
+
+class Command(BaseCommand):
+    """
+    Publishes the scheduled posts whose 'posted_at' has passed (posts/scheduler.py).
+
+    Usage:
+        python manage.py publish_scheduled_posts  # Publish once (e.g. from cron).
+        python manage.py publish_scheduled_posts --loop --interval 15  # Run as a background worker.
+    """
+
+    help = "Publishes due scheduled posts, invalidates the feed caches and sends the new post notifications."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep publishing every --interval seconds.",
+        )
+        parser.add_argument(
+            "--interval",
+            type=int,
+            default=15,
+            help="Seconds between two runs when running with --loop.",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            published = publish_due_posts()
+            self.stdout.write(f"Published {len(published)} posts.")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from posts.feed_index import rebuild_feed_index
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the feed neighbor index (posts/feed_index.py) from the database.
+
+    Required once after deploying (next / previous posts are read from the database until then),
+    and after Redis lost its data. Signals keep the index up to date in between.
+
+    Usage:
+        python manage.py rebuild_feed_index
+        python manage.py rebuild_feed_index --batch-size 5000
+    """
+
+    help = "Rebuilds the Redis sorted sets used for the next / previous post of every feed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of posts loaded and written to Redis per round trip.",
+        )
+
+    def handle(self, *args, **options):
+        indexed = rebuild_feed_index(batch_size=options["batch_size"])
+        if indexed is None:
+            self.stdout.write(
+                self.style.WARNING("The cache is not Redis, there is no index to build.")
+            )
+            return
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} posts."))
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db.models import (
+    Case,
+    ExpressionWrapper,
+    F,
+    FloatField,
+    OuterRef,
+    Value,
+    When,
+)
+from posts.feed_index import set_scores
+from posts.models import Comment, Like, Post, count_subquery
+
+
+class Command(BaseCommand):
+    """
+    Recomputes the stored Engagement Score of every post.
+
+    Likes, comments and views keep 'eng_score' up to date incrementally, but the
+    time-decay term (date_weight / days since posted) changes every day, so this
+    command should be run periodically (e.g. hourly via cron).
+
+    * The score is recomputed by the UPDATE itself (views, like / comment counts of the rows it writes),
+    * so a like, comment or view flush incrementing 'eng_score' meanwhile is never overwritten.
+    * Only the time-decay term is computed in Python, from 'posted_at' *
+
+    Usage:
+        python manage.py refresh_eng_scores
+        python manage.py refresh_eng_scores --batch-size 1000
+    """
+
+    help = "Recomputes the stored Engagement Score (including the time-decay term) of all posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of posts updated per bulk UPDATE.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        posts = Post.objects.only("id", "posted_at").order_by("id")
+
+        batch = []
+        updated = 0
+        for post in posts.iterator(chunk_size=batch_size):
+            batch.append(post)
+            if len(batch) >= batch_size:
+                updated += self.save_batch(batch)
+                batch = []
+
+        if batch:
+            updated += self.save_batch(batch)
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Refreshed Engagement Score of {updated} posts.")
+        )
+
+    def save_batch(self, batch):
+        date_score = Case(
+            *(
+                When(pk=post.pk, then=Value(float(post.get_date_score())))
+                for post in batch
+            ),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+        total_likes = count_subquery(Like.objects.filter(post=OuterRef("pk")))
+        total_comments = count_subquery(Comment.objects.filter(post=OuterRef("pk")))
+        eng_score = ExpressionWrapper(
+            F("views") * Post.VIEW_WEIGHT
+            + total_likes * Post.LIKE_WEIGHT
+            + total_comments * Post.COMMENT_WEIGHT
+            + date_score,
+            output_field=FloatField(),
+        )
+        posts = Post.objects.filter(pk__in=[post.pk for post in batch])
+        updated = posts.update(eng_score=eng_score)
+        # Re-sorts the trending feed of the neighbor index (posts/feed_index.py).
+        set_scores("trending", dict(posts.values_list("id", "eng_score")))
+        return updated
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:34
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.utils import timezone
+
+
+def populate_eng_score(apps, schema_editor):
+    """
+    Fills the new 'eng_score' column using the same formula as Post.get_eng_score().
+    """
+    Post = apps.get_model("posts", "Post")
+    now = timezone.now()
+    posts = Post.objects.annotate(
+        total_likes=Count("likes", distinct=True),
+        total_comments=Count("comments", distinct=True),
+    )
+    batch = []
+    for post in posts.iterator(chunk_size=500):
+        days_difference = (now - post.posted_at).days if post.posted_at else 0
+        post.eng_score = (
+            (post.views or 0) * 3
+            + post.total_likes * 1
+            + post.total_comments * 2
+            + (4 / days_difference if days_difference else 0)
+        )
+        batch.append(post)
+    Post.objects.bulk_update(batch, ["eng_score"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_alter_category_title'),
+        ('posts', '0018_alter_post_views'),
+        ('tag', '0002_alter_tag_title'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='eng_score',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-eng_score', 'id'], name='post_eng_score_idx'),
+        ),
+        migrations.RunPython(populate_eng_score, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_alter_category_title'),
+        ('posts', '0019_post_eng_score'),
+        ('tag', '0002_alter_tag_title'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-posted_at', 'id'], name='post_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_featured', '-posted_at', 'id'], name='post_featured_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_top_post', '-posted_at', 'id'], name='post_top_feed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_premium_post', '-posted_at', 'id'], name='post_premium_feed_idx'),
+        ),
+    ]
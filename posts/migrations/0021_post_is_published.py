@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:04
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_is_published(apps, schema_editor):
+    """
+    Publishes the posts whose 'posted_at' has passed, the scheduler publishes the others.
+    """
+    Post = apps.get_model("posts", "Post")
+    Post.objects.filter(posted_at__lte=timezone.now()).update(is_published=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('category', '0002_alter_category_title'),
+        ('posts', '0020_post_feed_indexes'),
+        ('tag', '0002_alter_tag_title'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='is_published',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['is_published', '-posted_at', 'id'], name='post_published_feed_idx'),
+        ),
+        migrations.RunPython(populate_is_published, migrations.RunPython.noop),
+    ]
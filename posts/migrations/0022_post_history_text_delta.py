@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0021_post_is_published'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='posthistory',
+            name='post_text_delta',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='posthistory',
+            name='post_text',
+            field=models.CharField(blank=True, max_length=3000),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notifications',
+            name='actor_count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='notifications',
+            name='actors',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
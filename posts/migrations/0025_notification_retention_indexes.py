@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0024_notification_actors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notifications',
+            index=models.Index(fields=['is_read', 'created_at'], name='notification_retention_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notifications',
+            index=models.Index(fields=['created_at'], name='notification_created_idx'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from accounts.views import CustomUser
 from category.models import Category
 from tag.models import Tag
@@ -25,7 +27,52 @@ class Like(models.Model):
         return f"Like by {self.liked_by} on post {self.post}"
 
 
+def count_subquery(queryset):
+    """
+    Returns the number of rows of a queryset correlated to the outer post (OuterRef), 0 if none.
+    """
+    counts = queryset.order_by().values("post").annotate(count=Count("*")).values("count")
+    return Coalesce(Subquery(counts), 0)
+
+
+class PostQuerySet(models.QuerySet):
+    def with_engagement(self):
+        """
+        Annotates 'total_likes' and 'total_comments' on every post.
+
+        * One correlated COUNT subquery per relation: JOINing both would produce likes x comments rows per post *
+        """
+        return self.annotate(
+            total_likes=count_subquery(Like.objects.filter(post=OuterRef("pk"))),
+            total_comments=count_subquery(
+                Comment.objects.filter(post=OuterRef("pk"))
+            ),
+        )
+
+    def for_listing(self):
+        """
+        Shared queryset builder for every Post list / detail view.
+
+        Loads the author and category with a JOIN, prefetches the tags and annotates
+        'total_likes' and 'total_comments', so PostSerializer does not have to run
+        any extra query per post.
+
+        * One page of posts = fixed number of queries (posts + tags) regardless of the page size *
+        """
+        return (
+            self.select_related("author", "category")
+            .prefetch_related("tags")
+            .with_engagement()
+        )
+
+
 class Post(models.Model):
+    # Engagement Score Weights (Dummy for now).
+    VIEW_WEIGHT = 3
+    LIKE_WEIGHT = 1
+    COMMENT_WEIGHT = 2
+    DATE_WEIGHT = 4
+
     author = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
     post_title = models.CharField(max_length=200)
@@ -37,7 +84,38 @@ class Post(models.Model):
     is_premium_post = models.BooleanField(default=False)
     views = models.PositiveBigIntegerField(default=0)
     posted_at = models.DateTimeField(blank=True, null=True)
+    # * Flipped to True when 'posted_at' passes, by Post.save() or the scheduler (posts/scheduler.py).
+    # * Feeds filter on it instead of posted_at <= now(), so their queries don't depend on the time *
+    is_published = models.BooleanField(default=False)
     post_image = models.ImageField(upload_to="posts/", null=True, blank=True)
+    # * Materialized Engagement Score, kept up to date by posts/signals.py, view increments
+    # * and the 'refresh_eng_scores' management command (time-decay term). *
+    eng_score = models.FloatField(default=0)
+
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-eng_score", "id"], name="post_eng_score_idx"),
+            # Keyset Pagination of the feeds, ordered by (posted_at, id).
+            models.Index(fields=["-posted_at", "id"], name="post_feed_idx"),
+            # Published feeds, and due scheduled posts (is_published = False AND posted_at <= now).
+            models.Index(
+                fields=["is_published", "-posted_at", "id"],
+                name="post_published_feed_idx",
+            ),
+            models.Index(
+                fields=["is_featured", "-posted_at", "id"],
+                name="post_featured_feed_idx",
+            ),
+            models.Index(
+                fields=["is_top_post", "-posted_at", "id"], name="post_top_feed_idx"
+            ),
+            models.Index(
+                fields=["is_premium_post", "-posted_at", "id"],
+                name="post_premium_feed_idx",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.post_title} by {self.author}"
@@ -50,16 +128,32 @@ class Post(models.Model):
         Formula: (total_views * view_weight) + (total_likes * like_weight) + (total_comments * comment_weight) + (date_weight/(current_date - post_date))
 
         Returns = Engagement Score (float)
+
+        * Used to (re)compute the stored 'eng_score' column, reads are served from the column. *
         """
-        # Weights
-        view_weight = 3
-        like_weight = 1
-        comment_weight = 2
-        date_weight = 4
         # Gettings all Posts Metrics.
-        total_likes = Like.objects.filter(post=self).count()
-        total_comments = Comment.objects.filter(post=self).count()
+        # * Uses the values annotated by Post.objects.with_engagement() when available *
+        total_likes = getattr(self, "total_likes", None)
+        if total_likes is None:
+            total_likes = Like.objects.filter(post=self).count()
+        total_comments = getattr(self, "total_comments", None)
+        if total_comments is None:
+            total_comments = Comment.objects.filter(post=self).count()
         total_views = self.views if self.views is not None else 0
+        eng_score = (
+            (total_views * self.VIEW_WEIGHT)
+            + (total_likes * self.LIKE_WEIGHT)
+            + (total_comments * self.COMMENT_WEIGHT)
+            + self.get_date_score()
+        )
+        return eng_score
+
+    def get_date_score(self):
+        """
+        Time-decay term of the Engagement Score: date_weight / days since the post date.
+
+        Returns = Date Score (float)
+        """
         post_date = self.posted_at
         current_date = timezone.now()
 
@@ -67,17 +161,24 @@ class Post(models.Model):
             current_date - post_date
         ).days  # Preventing division by 0 ahead.
         # If Days Difference is 0, it will automatically return 0, so ZeroDivisionError is not raise.
-        eng_score = (
-            (total_views * view_weight)
-            + (total_likes * like_weight)
-            + (total_comments * comment_weight)
-            + (date_weight / days_difference if days_difference else 0)
-        )
-        return eng_score
+        return self.DATE_WEIGHT / days_difference if days_difference else 0
 
     def save(self, *args, **kwargs):
         if not self.posted_at:
             self.posted_at = timezone.now()
+
+        # * Publishes / un-schedules the post when 'posted_at' is saved.
+        # * 'just_published' is read by the post_save signals (new post notification) *
+        update_fields = kwargs.get("update_fields")
+        self.just_published = False
+        if update_fields is None or "posted_at" in update_fields:
+            is_published = self.posted_at <= timezone.now()
+            self.just_published = is_published and (
+                self._state.adding or not self.is_published
+            )
+            self.is_published = is_published
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "is_published"}
         super().save(*args, **kwargs)
 
 
@@ -105,7 +206,9 @@ class PostHistory(models.Model):
     category = models.ForeignKey(Category, on_delete=models.PROTECT)
     post_title = models.CharField(max_length=50)
     post_slug = models.SlugField(blank=True)
-    post_text = models.CharField(max_length=3000)
+    post_text = models.CharField(max_length=3000, blank=True)
+    # Compact delta against the previous snapshot, instead of 'post_text' (posts/history.py).
+    post_text_delta = models.JSONField(null=True, blank=True)
     tags = models.ManyToManyField(Tag)
     is_featured = models.BooleanField(default=False)
     is_top_post = models.BooleanField(default=False)
@@ -117,6 +220,29 @@ class PostHistory(models.Model):
         return f"Post: {self.post.pk} by {self.author} edited at {self.updated_at}"
 
 
+class NotificationsQuerySet(models.QuerySet):
+    def for_inbox(self):
+        """
+        Loads the post / comment slugs shown by NotificationsSerializier with JOINs,
+        instead of up to 3 queries per notification.
+        """
+        return self.select_related("post", "comment__post").only(
+            "id",
+            "user_id",
+            "message",
+            "notification_type",
+            "is_read",
+            "created_at",
+            "actor_count",
+            "actors",
+            "post__id",
+            "post__post_slug",
+            "comment__id",
+            "comment__post__id",
+            "comment__post__post_slug",
+        )
+
+
 class Notifications(models.Model):
     user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
     message = models.CharField(max_length=255)
@@ -127,3 +253,24 @@ class Notifications(models.Model):
     comment = models.ForeignKey(
         Comment, on_delete=models.CASCADE, null=True, blank=True
     )
+    # * Coalesced likes / comments (posts/dispatcher.py): number of actors and a sample of the latest ones,
+    # * e.g. '@alice and 41 others liked your post' -> actor_count = 42 *
+    actor_count = models.PositiveIntegerField(default=1)
+    actors = models.JSONField(default=list, blank=True)  # [{"id": ..., "username": ...}]
+
+    objects = NotificationsQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset Pagination of the inbox, ordered by (created_at, id).
+            models.Index(
+                fields=["user", "-created_at", "-id"], name="notification_inbox_idx"
+            ),
+            # Unread counter (posts/inbox.py).
+            models.Index(fields=["user", "is_read"], name="notification_unread_idx"),
+            # Retention (posts/retention.py).
+            models.Index(
+                fields=["is_read", "created_at"], name="notification_retention_idx"
+            ),
+            models.Index(fields=["created_at"], name="notification_created_idx"),
+        ]
@@ -0,0 +1,29 @@
+from blogs.pagination import FeedPagination, KeysetPagination
+
+
+class PostKeysetPagination(KeysetPagination):
+    """
+    Keyset Pagination for post feeds.
+
+    Uses the same (posted_at, id) tiebreak ordering as next / previous posts in SlugPostAPI,
+    backed by the (posted_at, id) indexes on Post.
+    """
+
+    ordering = ("-posted_at", "id")
+
+
+class PostFeedPagination(FeedPagination):
+    """
+    Page Number Pagination for post feeds, ?pagination=cursor switches to PostKeysetPagination.
+    """
+
+    keyset_pagination_class = PostKeysetPagination
+
+
+class InboxPagination(KeysetPagination):
+    """
+    Keyset Pagination of the notification inbox, latest first.
+    Backed by the (user, created_at, id) index on Notifications.
+    """
+
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,118 @@
+"""
+Retention of Notifications.
+
+Read notifications older than the retention age are deleted (optionally archived to a JSON Lines file first)
+in primary key range chunks: every chunk is one short transaction, so the job never holds the database
+(e.g. the single SQLite writer lock) for long, and can be stopped / resumed at any time.
+Each chunk starts at the next expired notification, so gaps in the primary keys cost no empty DELETEs.
+
+Unread notifications are kept, so the unread counters (posts/inbox.py) stay correct.
+
+Usage: python manage.py prune_notifications, see the command for the options.
+"""
+
+import json
+import logging
+import time
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from .models import Notifications
+
+logger = logging.getLogger(__name__)
+
+ARCHIVED_FIELDS = (
+    "id",
+    "user_id",
+    "message",
+    "notification_type",
+    "is_read",
+    "created_at",
+    "post_id",
+    "comment_id",
+    "actor_count",
+    "actors",
+)
+
+
+def prune_notifications(
+    days=None, chunk_size=None, archive=None, dry_run=False, pause=0
+):
+    """
+    Deletes the read notifications older than 'days' days, chunk by chunk.
+
+    Args:
+        days (int): Retention age, defaults to settings.NOTIFICATION_RETENTION_DAYS.
+        chunk_size (int): Width of the primary key range of a chunk, defaults to settings.NOTIFICATION_PRUNE_CHUNK_SIZE.
+        archive (file): Text file the deleted rows are written to (one JSON object per line) before they are deleted.
+            ! Archiving is at-least-once: a chunk archived but not deleted (crash) is archived again by the next run !
+        dry_run (bool): Only count the notifications that would be deleted.
+        pause (float): Seconds to sleep between chunks, lets other writers in.
+
+    Returns:
+        dict: Metrics -> deleted, archived, chunks, seconds, cutoff.
+    """
+    days = settings.NOTIFICATION_RETENTION_DAYS if days is None else days
+    chunk_size = chunk_size or settings.NOTIFICATION_PRUNE_CHUNK_SIZE
+    cutoff = timezone.now() - timezone.timedelta(days=days)
+    started = time.monotonic()
+    metrics = {"deleted": 0, "archived": 0, "chunks": 0, "cutoff": cutoff.isoformat()}
+
+    expired = Notifications.objects.filter(is_read=True, created_at__lt=cutoff)
+    if dry_run:
+        metrics["deleted"] = expired.count()
+        metrics["seconds"] = round(time.monotonic() - started, 3)
+        return metrics
+
+    start = next_expired_id(expired, 0)
+    while start is not None:
+        deleted, archived = prune_chunk(
+            expired.filter(id__gte=start, id__lt=start + chunk_size), archive
+        )
+        metrics["deleted"] += deleted
+        metrics["archived"] += archived
+        metrics["chunks"] += 1
+        if pause:
+            time.sleep(pause)
+        start = next_expired_id(expired, start + chunk_size)
+
+    metrics["seconds"] = round(time.monotonic() - started, 3)
+    logger.info("Pruned notifications: %s", metrics)
+    return metrics
+
+
+def next_expired_id(expired, start):
+    """
+    Returns the first expired notification ID >= 'start' (seek on the primary key), or None when there is none left.
+    """
+    return (
+        expired.filter(id__gte=start)
+        .order_by("id")
+        .values_list("id", flat=True)
+        .first()
+    )
+
+
+def prune_chunk(chunk, archive=None):
+    """
+    Archives (optional) and deletes one chunk of notifications in its own transaction.
+
+    Returns:
+        tuple: (deleted, archived)
+    """
+    with transaction.atomic():
+        if archive is None:
+            deleted, _ = chunk.delete()
+            return deleted, 0
+
+        rows = list(chunk.values(*ARCHIVED_FIELDS))
+        if not rows:
+            return 0, 0
+        for row in rows:
+            archive.write(json.dumps(row, cls=DjangoJSONEncoder) + "\n")
+        archive.flush()  # Archived before the rows are gone.
+        deleted, _ = Notifications.objects.filter(
+            pk__in=[row["id"] for row in rows]
+        ).delete()
+        return deleted, len(rows)
@@ -13,5 +13,8 @@ The `websocket_urlpatterns` list contains the URL patterns for WebSocket connect
 In this case, there is a single URL pattern defined using the `re_path` function.
 The pattern matches the path "ws/notifications/" and associates it with the `NotificationConsumer` consumer.
 
+Clients connect with a JWT access token (ws/notifications/?token=<access token>) to receive their own
+notifications, and can opt-in to new post broadcasts with '&topics=newposts' (see NotificationConsumer).
+
 Note: This module is used by the Channels framework to handle WebSocket connections.
 """
@@ -0,0 +1,93 @@
+"""
+Publisher of scheduled posts.
+
+A post saved with a future 'posted_at' is stored with is_published = False, and publish_due_posts()
+flips it once 'posted_at' has passed. Feeds only filter on 'is_published', so their results only change
+when a post is saved or published, and can be cached under a fixed key.
+
+On publish:
+    - the post detail / feed caches are invalidated ("posts" namespace, posts/detail_cache.py),
+    - the post is added to the feed neighbor index (posts/feed_index.py),
+    - the new post notification is sent (posts/dispatcher.py), at publish time instead of creation time.
+
+* Redis (django_redis cache) -> run 'python manage.py publish_scheduled_posts --loop'. *
+* Any other cache backend -> published from the request path every SCHEDULED_POSTS_PUBLISH_INTERVAL seconds. *
+"""
+
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from blogs.redis_client import get_redis_connection
+from .detail_cache import invalidate_post_details
+from .dispatcher import enqueue_notification
+from .feed_index import index_posts
+from .models import Post
+
+PUBLISH_BATCH_SIZE = 500  # Max number of posts published per transaction.
+
+# In-process fallback.
+_local_lock = threading.Lock()
+_local_last_publish = None
+
+
+def publish_due_posts(now=None):
+    """
+    Publishes every scheduled post whose 'posted_at' has passed.
+
+    Each post is flipped with a conditional UPDATE (is_published = False), so concurrent
+    publishers never publish (and notify) the same post twice.
+
+    Args:
+        now (datetime): Publish posts scheduled up to this time, defaults to now.
+
+    Returns:
+        list: IDs of the published posts.
+    """
+    now = now or timezone.now()
+    published = []
+    while True:
+        due_ids = list(
+            Post.objects.filter(is_published=False, posted_at__lte=now)
+            .order_by("posted_at", "id")
+            .values_list("id", flat=True)[:PUBLISH_BATCH_SIZE]
+        )
+        if not due_ids:
+            break
+
+        with transaction.atomic():
+            for post_id in due_ids:
+                if Post.objects.filter(pk=post_id, is_published=False).update(
+                    is_published=True
+                ):
+                    published.append(post_id)
+                    enqueue_notification("newpost", post_id=post_id)  # On commit.
+
+        if len(due_ids) < PUBLISH_BATCH_SIZE:
+            break
+
+    if published:
+        invalidate_post_details()
+        index_posts(published)
+    return published
+
+
+def maybe_publish_due_posts():
+    """
+    In-process fallback, publishes due posts from the request path when there is no Redis (no worker).
+    Runs at most once every SCHEDULED_POSTS_PUBLISH_INTERVAL seconds per process.
+    """
+    global _local_last_publish
+    if get_redis_connection() is not None:  # Published by the worker.
+        return
+
+    with _local_lock:
+        if (
+            _local_last_publish is not None
+            and time.monotonic() - _local_last_publish
+            < settings.SCHEDULED_POSTS_PUBLISH_INTERVAL
+        ):
+            return
+        _local_last_publish = time.monotonic()
+    publish_due_posts()
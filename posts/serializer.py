@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from django.db import models
+from .counters import get_pending_views
+from .history import resolve_post_texts
 from .models import Like, Comment, Post, PostHistory, Category, Tag, Notifications
 from accounts.models import CustomUser
 from django.utils import timezone
@@ -39,7 +42,7 @@ class LikeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Can't like both.")
 
         elif post:  # checking if it is a like for a post.
-            if timezone.is_aware(post.posted_at) and post.posted_at > timezone.now():
+            if not post.is_published:
                 raise ValidationError("Post has not been published yet.")
 
         return data  # Returning data if above conditions are not met.
@@ -52,6 +55,11 @@ class CommentSerializer(serializers.ModelSerializer):
     Attributes:
         total_likes (int): The total number of likes for the comment.
         total_replies (int): The total number of replies for the comment.
+
+    Context:
+        comment_tree (CommentTree, optional): Pre-loaded comments / likes of the post (posts/comment_tree.py).
+            If provided, replies and likes are read from it instead of querying per comment.
+        max_depth (int, optional): Max depth of nested replies (top level comments = 0).
     """
 
     total_likes = serializers.SerializerMethodField()
@@ -85,6 +93,9 @@ class CommentSerializer(serializers.ModelSerializer):
         Returns:
             int: The total number of likes for the comment.
         """
+        comment_tree = self.context.get("comment_tree")
+        if comment_tree is not None:
+            return len(comment_tree.get_likes(obj))
         return Like.objects.filter(comment=obj).count()
 
     def get_total_replies(self, obj):
@@ -97,16 +108,33 @@ class CommentSerializer(serializers.ModelSerializer):
         Returns:
             int: The total number of replies for the comment.
         """
+        comment_tree = self.context.get("comment_tree")
+        if comment_tree is not None:
+            return len(comment_tree.get_replies(obj))
         return Comment.objects.filter(parent_comment=obj).count()
 
     def get_likes(self, obj):
+        comment_tree = self.context.get("comment_tree")
+        if comment_tree is not None:
+            return comment_tree.get_likes(obj)
         likes = Like.objects.filter(comment=obj)
         # print(like)
         return [l.liked_by.id for l in likes]
 
     def get_replies(self, obj):
-        replies = Comment.objects.filter(parent_comment=obj)
-        return CommentSerializer(replies, many=True).data
+        depth = self.context.get("depth", 0)
+        max_depth = self.context.get("max_depth")
+        if max_depth is not None and depth >= max_depth:
+            return []  # Depth cap reached, 'total_replies' still shows the number of replies.
+
+        comment_tree = self.context.get("comment_tree")
+        if comment_tree is not None:
+            replies = comment_tree.get_replies(obj)
+        else:
+            replies = Comment.objects.filter(parent_comment=obj)
+        return CommentSerializer(
+            replies, many=True, context={**self.context, "depth": depth + 1}
+        ).data
 
     def validate(self, data):
         """
@@ -127,8 +155,8 @@ class CommentSerializer(serializers.ModelSerializer):
         if not post:
             raise ValidationError("Post is required.")
 
-        # Check if post.posted_at is timezone-aware and if the post has been published
-        if timezone.is_aware(post.posted_at) and post.posted_at > timezone.now():
+        # Check if the post has been published
+        if not post.is_published:
             raise ValidationError("Post has not been published yet.")
 
         return data
@@ -164,6 +192,41 @@ class CommentSerializer(serializers.ModelSerializer):
         return representation
 
 
+def merge_pending_views(representation, pending_views):
+    """
+    Adds the pending (buffered, not yet flushed) views of a post to its serialized data.
+
+    Args:
+        representation (dict): Serialized post (PostSerializer data).
+        pending_views (int): Views still in the buffered view counter (posts/counters.py).
+
+    Returns:
+        dict: The representation, with updated 'views' and 'eng_score'.
+    """
+    if pending_views:
+        representation["views"] = (representation["views"] or 0) + pending_views
+        representation["eng_score"] = (
+            representation["eng_score"] or 0.0
+        ) + pending_views * Post.VIEW_WEIGHT
+    return representation
+
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    List Serializer for the Post model.
+
+    Loads the pending (buffered, not yet flushed) views of all posts in the list with
+    one counter lookup instead of one per post.
+    """
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        pending_views = get_pending_views(post.pk for post in posts)
+        for post in posts:
+            post.pending_views = pending_views.get(post.pk, 0)
+        return super().to_representation(posts)
+
+
 class PostSerializer(serializers.ModelSerializer):
     """
     Serializer class for the Post model.
@@ -171,11 +234,12 @@ class PostSerializer(serializers.ModelSerializer):
     Attributes:
         total_likes (int): The total number of likes for the post.
         total_comments (int): The total number of comments for the post.
+        eng_score (float): The stored Engagement Score of the post (read only).
     """
 
     total_likes = serializers.SerializerMethodField()
     total_comments = serializers.SerializerMethodField()
-    eng_score = serializers.SerializerMethodField()
+    eng_score = serializers.FloatField(read_only=True)
     author = serializers.PrimaryKeyRelatedField(queryset=CustomUser.objects.all())
     category = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all())
 
@@ -199,6 +263,7 @@ class PostSerializer(serializers.ModelSerializer):
             "eng_score",
             "is_premium_post",
         ]
+        list_serializer_class = PostListSerializer
 
     def to_representation(self, instance):
         """
@@ -214,7 +279,11 @@ class PostSerializer(serializers.ModelSerializer):
         }
         representation["category"] = instance.category.title
         representation["tags"] = [tag.title for tag in instance.tags.all()]
-        return representation
+
+        # Merging views which are still in the buffered view counter (posts/counters.py).
+        return merge_pending_views(
+            representation, getattr(instance, "pending_views", 0)
+        )
 
     def get_total_likes(self, obj):
         """
@@ -225,8 +294,13 @@ class PostSerializer(serializers.ModelSerializer):
 
         Returns:
             int: The total number of likes for the post.
+
+        * Reads the 'total_likes' annotation of Post.objects.for_listing(), falls back to a COUNT query *
         """
-        return Like.objects.filter(post=obj).count()
+        total_likes = getattr(obj, "total_likes", None)
+        if total_likes is None:
+            total_likes = Like.objects.filter(post=obj).count()
+        return total_likes
 
     def get_total_comments(self, obj):
         """
@@ -237,49 +311,26 @@ class PostSerializer(serializers.ModelSerializer):
 
         Returns:
             int: The total number of comments for the post.
-        """
-        return Comment.objects.filter(post=obj).count()
 
-    def get_eng_score(self, obj):
+        * Reads the 'total_comments' annotation of Post.objects.for_listing(), falls back to a COUNT query *
         """
-        Calculates Engagement Score, used for browsing Trending Posts.
-        Weights = Dummy for now.
+        total_comments = getattr(obj, "total_comments", None)
+        if total_comments is None:
+            total_comments = Comment.objects.filter(post=obj).count()
+        return total_comments
 
-        Formula: (total_views * view_weight) + (total_likes * like_weight) + (total_comments * comment_weight) + (date_weight/(current_date - post_date))
 
-        Returns = Engagement Score (float)
-        """
-        # Weights
-        view_weight = 3
-        like_weight = 1
-        comment_weight = 2
-        date_weight = 4
-        # Gettings all Posts Metrics.
-        total_likes = Like.objects.filter(post=obj).count()
-        total_comments = Comment.objects.filter(post=obj).count()
-        total_views = (
-            obj.views if obj.views is not None else 0
-        )  # provide a default value of 0
-        post_date = obj.posted_at
-        current_date = timezone.now()
-
-        total_likes = total_likes if total_likes is not None else 0
-        total_comments = total_comments if total_comments is not None else 0
-
-        if post_date is not None:
-            days_difference = (
-                current_date - post_date
-            ).days  # Preventing division by 0 ahead.
-        else:
-            days_difference = 0
-        # If Days Difference is 0, it will automatically return 0, so ZeroDivisionError is not raise.
-        eng_score = (
-            (total_views * view_weight)
-            + (total_likes * like_weight)
-            + (total_comments * comment_weight)
-            + (date_weight / days_difference if days_difference else 0)
+class PostHistoryListSerializer(serializers.ListSerializer):
+    """
+    List Serializer for PostHistory, rebuilds the text of delta snapshots with one query (posts/history.py).
+    """
+
+    def to_representation(self, data):
+        snapshots = list(
+            data.all() if isinstance(data, models.manager.BaseManager) else data
         )
-        return eng_score
+        resolve_post_texts(snapshots)
+        return super().to_representation(snapshots)
 
 
 class PostHistorySerializer(serializers.ModelSerializer):
@@ -289,7 +340,12 @@ class PostHistorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PostHistory
-        fields = "__all__"
+        exclude = ["post_text_delta"]
+        list_serializer_class = PostHistoryListSerializer
+
+    def to_representation(self, instance):
+        resolve_post_texts([instance])  # No-op for full / already rebuilt snapshots.
+        return super().to_representation(instance)
 
 
 class NotificationsSerializier(serializers.ModelSerializer):
@@ -311,7 +367,10 @@ class NotificationsSerializier(serializers.ModelSerializer):
             "created_at",
             "post",
             "comment",
+            "actor_count",
+            "actors",
         ]
+        read_only_fields = ["actor_count", "actors"]
 
     def to_representation(self, instance):
         """
@@ -1,9 +1,13 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models import F
 from django.dispatch import receiver
-from .models import Post, PostHistory
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from .models import Notifications, Like, Comment
+from .models import Post
+from .models import Like, Comment
+from .dispatcher import enqueue_notification
+from .detail_cache import invalidate_post_detail, invalidate_post_details
+from . import feed_index
+from .history import VERSIONED_FIELDS, create_post_snapshot
 
 @receiver(post_save, sender=Post, dispatch_uid="create_post_history")
 def create_post_history(sender, instance, created, **kwargs):
@@ -21,41 +25,149 @@ def create_post_history(sender, instance, created, **kwargs):
 
     dispatch_uid is used to differentiate b/w save request.
     ! Removing dispatch_uid will create multiple (2) records in PostHistory ! 
+    ! Saves which only update non versioned fields (e.g. update_fields=["views"]) are skipped !
+    * Snapshot + its tags = 2 INSERTs, see posts/history.py *
     """
-    if not created:  # This ensures the signal is only triggered on update, not on creation
-        PostHistory.objects.create(
-            post=instance,
-            author=instance.author,
-            category=instance.category,
-            post_title=instance.post_title,
-            post_slug=instance.post_slug,
-            post_text=instance.post_text,
-            is_featured=instance.is_featured,
-            is_top_post=instance.is_top_post,
-            views=instance.views,
-            posted_at=instance.posted_at,
+    if created:  # This ensures the signal is only triggered on update, not on creation
+        return
+    update_fields = kwargs.get("update_fields")
+    if update_fields is not None and not VERSIONED_FIELDS & set(update_fields):
+        return
+    create_post_snapshot(instance)
+
+
+def update_eng_score(post_id, delta):
+    """
+    Incrementally updates the stored Engagement Score of a post.
+
+    Uses an F() expression so concurrent likes / comments don't overwrite each other.
+    """
+    if post_id is not None:
+        Post.objects.filter(pk=post_id).update(eng_score=F("eng_score") + delta)
+
+
+@receiver(post_save, sender=Like, dispatch_uid="like_eng_score_add")
+def add_like_eng_score(sender, instance, created, **kwargs):
+    """
+    Adds the like weight to the post's Engagement Score when a post is liked.
+    """
+    if created:
+        update_eng_score(instance.post_id, Post.LIKE_WEIGHT)
+
+
+@receiver(post_delete, sender=Like, dispatch_uid="like_eng_score_remove")
+def remove_like_eng_score(sender, instance, **kwargs):
+    """
+    Subtracts the like weight from the post's Engagement Score when a post is unliked.
+    """
+    update_eng_score(instance.post_id, -Post.LIKE_WEIGHT)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid="comment_eng_score_add")
+def add_comment_eng_score(sender, instance, created, **kwargs):
+    """
+    Adds the comment weight to the post's Engagement Score when a comment / reply is added.
+    """
+    if created:
+        update_eng_score(instance.post_id, Post.COMMENT_WEIGHT)
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid="comment_eng_score_remove")
+def remove_comment_eng_score(sender, instance, **kwargs):
+    """
+    Subtracts the comment weight from the post's Engagement Score when a comment / reply is deleted.
+    """
+    update_eng_score(instance.post_id, -Post.COMMENT_WEIGHT)
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_detail_cache_saved")
+@receiver(post_delete, sender=Post, dispatch_uid="post_detail_cache_deleted")
+def invalidate_post_detail_cache(sender, instance, **kwargs):
+    """
+    Invalidates every cached post detail when a post is created / updated / deleted (next / previous posts may change).
+    """
+    transaction.on_commit(invalidate_post_details)
+
+
+@receiver(post_save, sender=Like, dispatch_uid="like_detail_cache_saved")
+@receiver(post_delete, sender=Like, dispatch_uid="like_detail_cache_deleted")
+@receiver(post_save, sender=Comment, dispatch_uid="comment_detail_cache_saved")
+@receiver(post_delete, sender=Comment, dispatch_uid="comment_detail_cache_deleted")
+def invalidate_liked_commented_post_cache(sender, instance, **kwargs):
+    """
+    Invalidates the cached detail of the post when it is liked / commented (total_likes, total_comments).
+    """
+    post_id = instance.post_id
+    if post_id is not None:
+        transaction.on_commit(lambda: invalidate_post_detail(post_id))
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_feed_index_saved")
+def index_saved_post(sender, instance, **kwargs):
+    """
+    Adds / moves the post in the feed neighbor index (posts/feed_index.py) when it is created / updated.
+    """
+    post_id = instance.pk
+    transaction.on_commit(lambda: feed_index.index_posts([post_id]))
+
+
+@receiver(post_delete, sender=Post, dispatch_uid="post_feed_index_deleted")
+def unindex_deleted_post(sender, instance, **kwargs):
+    """
+    Removes the deleted post from the feed neighbor index.
+    """
+    post_id = instance.pk
+    transaction.on_commit(lambda: feed_index.remove_posts([post_id]))
+
+
+def rescore_feed_index(post_id, likes, comments):
+    """
+    Moves the post in the popular / trending feeds of the neighbor index after the transaction commits.
+    """
+    if post_id is None:  # Like of a comment.
+        return
+
+    def rescore():
+        feed_index.rescore_posts(
+            "popular", {post_id: likes * feed_index.POPULAR_LIKE_FACTOR + comments}
+        )
+        feed_index.rescore_posts(
+            "trending",
+            {post_id: likes * Post.LIKE_WEIGHT + comments * Post.COMMENT_WEIGHT},
         )
-        # Add the tags to the PostHistory object
-        for tag in instance.tags.all():
-            PostHistory.objects.last().tags.add(tag)
-
-
-def create_notification(user, message):
-    # Create notification
-    notification = Notifications.objects.create(user=user, message=message)
-    
-    # Send notification to WebSocket consumer
-    channel_layer = get_channel_layer()
-    async_to_sync(channel_layer.group_send)(
-        'notifications',
-        {'type': 'send_notification', 'text': 'New notification!'}
-    )
+
+    transaction.on_commit(rescore)
+
+
+@receiver(post_save, sender=Like, dispatch_uid="like_feed_index_add")
+def rescore_liked_post(sender, instance, created, **kwargs):
+    if created:
+        rescore_feed_index(instance.post_id, 1, 0)
+
+
+@receiver(post_delete, sender=Like, dispatch_uid="like_feed_index_remove")
+def rescore_unliked_post(sender, instance, **kwargs):
+    rescore_feed_index(instance.post_id, -1, 0)
+
+
+@receiver(post_save, sender=Comment, dispatch_uid="comment_feed_index_add")
+def rescore_commented_post(sender, instance, created, **kwargs):
+    if created:
+        rescore_feed_index(instance.post_id, 0, 1)
+
+
+@receiver(post_delete, sender=Comment, dispatch_uid="comment_feed_index_remove")
+def rescore_uncommented_post(sender, instance, **kwargs):
+    rescore_feed_index(instance.post_id, 0, -1)
+
 
 @receiver(post_save, sender=Like)
 def send_like_notification(sender, instance, created, **kwargs):
     """
     Sends a notification when a Like instance is created.
 
+    The notification is queued after the transaction commits and saved / pushed by the dispatcher.
+
     Args:
         sender: The sender of the signal.
         instance: The instance of the Like model that was created.
@@ -66,106 +178,30 @@ def send_like_notification(sender, instance, created, **kwargs):
         None
     """
     if created:
-        channel_layer = get_channel_layer()
-        if instance.post is not None:
+        if instance.post_id is not None:
             # If it is a Like on the post, send it to the post author.
-            Notifications.objects.create(
-                user = instance.post.author,
-                notification_type = 'add-post-like',
-                post = instance.post,
-                comment  = None,
-                message = f'@{instance.liked_by.username} liked your post "{instance.post.post_title}".'
-            ) # Save the notification to the DB.
-            async_to_sync(channel_layer.group_send)(
-                'notifications', {
-                    'type': 'like_notification',
-                    'post_id': instance.post.id,
-                    'comment_id': None,
-                    'liker_id': instance.liked_by.id,
-                    'liker_username': instance.liked_by.username,
-                    'recipient': instance.post.author.id,
-                    'notification_type': 'add-post-like'
-                }
-            ) # Send the notification.
-        elif instance.post is None and instance.comment is not None:
+            enqueue_notification(
+                "add-post-like", post_id=instance.post_id, actor_id=instance.liked_by_id
+            )
+        elif instance.comment_id is not None:
             # If its is a Like on the Comment, send it to the comment author.
-            Notifications.objects.create(
-                user = instance.comment.author,
-                notification_type = 'add-comment-like',
-                post = instance.post,
-                comment  = instance.comment,
-                message = f'{instance.liked_by.username} liked your comment. "{instance.comment.comment_text[:10]}."'
-            ) # Save it to the DB.
-            async_to_sync(channel_layer.group_send)(
-                'notifications', {
-                    'type': 'like_notification',
-                    'post_id': None,
-                    'comment_id': instance.comment.id,
-                    'liker_id': instance.liked_by.id,
-                    'liker_username': instance.liked_by.username,
-                    'recipient': instance.comment.author.id,
-                    'notification_type': 'add-comment-like'
-                }
-            ) # Send the notification
+            enqueue_notification(
+                "add-comment-like",
+                comment_id=instance.comment_id,
+                actor_id=instance.liked_by_id,
+            )
 
 @receiver(post_save, sender=Post)
 def send_newpost_notification(sender, instance, created, **kwargs):
-    # TODO: Have to implement new record creation to the DB.
-    if created:
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            'notifications' , {
-                'type' : 'newpost_notification',
-                'post_id' : instance.id,
-                'author_username' :instance.author.username,
-                'author_id' :instance.author.id,
-                'post_title' : instance.post_title,
-                'notification_type' : 'newpost'
-            }
-        ) # Send the notification.
+    # * Sent when the post goes live, scheduled posts are notified by the scheduler (posts/scheduler.py) *
+    if getattr(instance, "just_published", False):
+        enqueue_notification("newpost", post_id=instance.id)
 
 @receiver(post_save, sender=Comment)
 def send_newcomment_notification(sender, instance, created, **kwargs):
     if created:
-        channel_layer = get_channel_layer()
-        if instance.parent_comment is None: 
+        if instance.parent_comment_id is None:
             # If it is a comment to the post.
-            Notifications.objects.create(
-                user = instance.post.author,
-                notification_type = 'newcomment',
-                post = instance.post,
-                comment = instance,
-                message = f'{instance.author.username} commented on your post "{instance.post.post_title}".'
-            )  # Save to the DB.
-            async_to_sync(channel_layer.group_send)(
-            'notifications',{
-                'type' : 'newcomment_notification',
-                'author_id' : instance.author.id,
-                'author_username' : instance.author.username,
-                'post_id' : instance.post.id,
-                'post_title' : instance.post.post_title,
-                'recipient' : instance.post.author.id,
-                'reply_to' : None,
-                'notification_type' : 'newcomment'
-            } 
-        ) # Send the notification.            
-        elif instance.parent_comment is not None:
-            Notifications.objects.create(
-            user = instance.parent_comment.author,
-            notification_type = 'newreply',
-            post = instance.post,
-            comment = instance,
-            message = f'{instance.author.username} replied to your comment "{instance.parent_comment.comment_text}".'
-            )
-            async_to_sync(channel_layer.group_send)(
-            'notifications',{
-                'type' : 'newcomment_notification',
-                'author_id' : instance.author.id,
-                'author_username' : instance.author.username,
-                'post_id' : instance.post.id,
-                'post_title' : instance.post.post_title,
-                'recipient' : instance.parent_comment.author.id,
-                'reply_to' : instance.parent_comment.comment_text,
-                'notification_type' : 'newreply'
-            } 
-        ) # Send the notification.
\ No newline at end of file
+            enqueue_notification("newcomment", comment_id=instance.id)
+        else:
+            enqueue_notification("newreply", comment_id=instance.id)
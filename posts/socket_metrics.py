@@ -0,0 +1,100 @@
+"""
+Metrics of the notification WebSockets (posts/consumers.py).
+
+Every server process tracks its open connections and their outbound queues. The consumers publish
+a snapshot of their process to the Redis hash 'websocket:metrics' (one field per process) at most every
+WEBSOCKET_METRICS_INTERVAL seconds, so get_metrics() can sum up every Daphne worker.
+Snapshots older than 3 intervals belong to stopped (or idle) processes and are dropped.
+
+Without Redis (single process development setup) the metrics of the current process are returned.
+"""
+
+import json
+import os
+import socket
+import time
+import weakref
+from django.conf import settings
+from blogs.redis_client import get_redis_connection
+
+METRICS_KEY = "websocket:metrics"
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Open connections of this process.
+CONNECTIONS = weakref.WeakSet()
+# Counters of this process since it started.
+COUNTERS = {
+    "connections_opened": 0,
+    "messages_sent": 0,
+    "messages_dropped": 0,
+    "messages_coalesced": 0,
+    "rate_limited": 0,
+    "heartbeat_timeouts": 0,
+}
+_last_published = 0.0
+
+
+def incr(name, amount=1):
+    COUNTERS[name] += amount
+
+
+def local_snapshot():
+    """
+    Returns the metrics of this process.
+    """
+    depths = [consumer.queue_depth() for consumer in list(CONNECTIONS)]
+    return {
+        "process": PROCESS_ID,
+        "connections": len(depths),
+        "queued_messages": sum(depths),
+        "max_queue_depth": max(depths, default=0),
+        **COUNTERS,
+        "updated_at": time.time(),
+    }
+
+
+def publish_snapshot(force=False):
+    """
+    Writes the snapshot of this process to Redis, at most every WEBSOCKET_METRICS_INTERVAL seconds.
+    """
+    global _last_published
+
+    now = time.monotonic()
+    if not force and now - _last_published < settings.WEBSOCKET_METRICS_INTERVAL:
+        return
+    _last_published = now
+    redis = get_redis_connection()
+    if redis is not None:
+        redis.hset(METRICS_KEY, PROCESS_ID, json.dumps(local_snapshot()))
+
+
+def get_metrics():
+    """
+    Returns the metrics of every live server process, and their totals.
+
+    Returns:
+        dict: {"processes": [snapshot, ...], "totals": {"connections": ..., "queued_messages": ..., ...}}
+    """
+    redis = get_redis_connection()
+    if redis is None:
+        processes = [local_snapshot()]
+    else:
+        stale_before = time.time() - 3 * settings.WEBSOCKET_METRICS_INTERVAL
+        processes, stale = [], []
+        for field, value in redis.hgetall(METRICS_KEY).items():
+            snapshot = json.loads(value)
+            if snapshot["updated_at"] < stale_before:
+                stale.append(field)
+            else:
+                processes.append(snapshot)
+        if stale:
+            redis.hdel(METRICS_KEY, *stale)
+
+    totals = {
+        name: sum(snapshot[name] for snapshot in processes)
+        for name in ("connections", "queued_messages", *COUNTERS)
+    }
+    totals["max_queue_depth"] = max(
+        (snapshot["max_queue_depth"] for snapshot in processes), default=0
+    )
+    return {"processes": processes, "totals": totals}
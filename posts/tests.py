@@ -1,3 +1,608 @@
-from django.test import TestCase
+import asyncio
+import base64
+import itertools
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import urlencode, urlparse
+import stripe
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from oauth2_provider.models import AccessToken as OAuth2AccessToken, Application
+from rest_framework_simplejwt.tokens import AccessToken
+from accounts.models import CustomUser, PremiumUser
+from category.models import Category
+from tag.models import Tag
+from . import socket_metrics
+from .consumers import NEWPOST_GROUP, NotificationConsumer, user_group_name
+from .inbox import add_unread_counts, get_unread_count, mark_read
+from .models import Comment, Like, Notifications, Post
+from .retention import prune_notifications
 
-# Create your tests here.
+try:
+    import fakeredis
+    from fakeredis.aioredis import FakeConnection
+except ImportError:  # Optional, only used by the tests.
+    fakeredis = None
+
+LOCMEM_CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PostListQueriesTest(TestCase):
+    """
+    The post list runs a fixed number of queries (posts + tags) whatever the page size.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = CustomUser.objects.create(email="author@test.com", username="author")
+        readers = [
+            CustomUser.objects.create(
+                email=f"reader{i}@test.com", username=f"reader{i}"
+            )
+            for i in range(3)
+        ]
+        category = Category.objects.create(title="Category")
+        tags = [Tag.objects.create(title=f"tag{i}") for i in range(2)]
+        posted_at = timezone.now() - timezone.timedelta(days=1)
+        for i in range(12):
+            post = Post.objects.create(
+                author=author,
+                category=category,
+                post_title=f"Post {i}",
+                post_slug=f"post-{i}",
+                post_text="Text",
+                posted_at=posted_at - timezone.timedelta(minutes=i),
+            )
+            post.tags.set(tags)
+            for reader in readers:
+                Like.objects.create(liked_by=reader, post=post)
+                Comment.objects.create(author=reader, post=post, comment_text="Hi")
+
+    def get_posts(self, page_size):
+        # * Keyset pagination, the page number pagination has a fixed page size *
+        return self.client.get(
+            "/posts/all/", {"pagination": "cursor", "page_size": page_size}
+        )
+
+    def test_constant_queries_per_page_size(self):
+        self.get_posts(1)  # Runs the scheduled posts publishing (throttled).
+        for page_size in (2, 10):
+            with self.assertNumQueries(2):
+                response = self.get_posts(page_size)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["results"]), page_size)
+
+    def test_tampered_cursor(self):
+        for values in (["not a date", 1], ["2024-01-01T00:00:00+00:00", "x"], [{}, []]):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps({"v": values, "r": 0}).encode()
+                ).decode()
+                response = self.client.get("/posts/all/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.data["detail"], "Invalid cursor")
+
+    def test_engagement_counts(self):
+        post = self.get_posts(1).data["results"][0]
+        self.assertEqual(post["total_likes"], 3)
+        self.assertEqual(post["total_comments"], 3)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RefreshEngScoresTest(TestCase):
+    """
+    The refresh recomputes the Engagement Score in the UPDATE, increments landing meanwhile are kept.
+    """
+
+    def setUp(self):
+        self.author = CustomUser.objects.create(
+            email="author@test.com", username="author"
+        )
+        self.readers = [
+            CustomUser.objects.create(
+                email=f"reader{i}@test.com", username=f"reader{i}"
+            )
+            for i in range(3)
+        ]
+        self.post = Post.objects.create(
+            author=self.author,
+            category=Category.objects.create(title="Category"),
+            post_title="Post",
+            post_slug="post",
+            post_text="Text",
+            views=5,
+            posted_at=timezone.now() - timezone.timedelta(days=2),
+        )
+        Like.objects.create(liked_by=self.readers[0], post=self.post)
+        Comment.objects.create(
+            author=self.readers[0], post=self.post, comment_text="Hi"
+        )
+
+    def refresh(self):
+        call_command("refresh_eng_scores", stdout=StringIO())
+        self.post.refresh_from_db()
+        return self.post.eng_score
+
+    def test_refresh(self):
+        Post.objects.filter(pk=self.post.pk).update(eng_score=0)
+        # 5 views * 3 + 1 like * 1 + 1 comment * 2 + 4 / 2 days.
+        self.assertEqual(self.refresh(), 20)
+
+    def test_concurrent_like_kept(self):
+        get_date_score = Post.get_date_score
+
+        def like_meanwhile(post):
+            # * A like (eng_score = eng_score + 1) committed while the refresh runs *
+            if not Like.objects.filter(liked_by=self.readers[1]).exists():
+                Like.objects.create(liked_by=self.readers[1], post=self.post)
+            return get_date_score(post)
+
+        with mock.patch.object(Post, "get_date_score", like_meanwhile):
+            self.assertEqual(self.refresh(), 21)
+
+
+class PruneNotificationsTest(TestCase):
+    """
+    Read notifications past the retention age are deleted, the chunks skip the gaps in the primary keys.
+    """
+
+    def setUp(self):
+        user = CustomUser.objects.create(email="reader@test.com", username="reader")
+        old = timezone.now() - timezone.timedelta(days=100)
+        Notifications.objects.bulk_create(
+            Notifications(
+                id=id_, user=user, message="Hi", notification_type="like", **fields
+            )
+            for id_, fields in (
+                (1, {"is_read": True, "created_at": old}),
+                (2, {"is_read": True, "created_at": old}),
+                (5000, {"is_read": True, "created_at": old}),
+                (5001, {"is_read": False, "created_at": old}),  # Unread.
+                (9000, {"is_read": True}),  # Recent.
+            )
+        )
+
+    def test_prune_sparse_ids(self):
+        metrics = prune_notifications(days=90, chunk_size=10)
+        self.assertEqual(metrics["deleted"], 3)
+        self.assertEqual(metrics["chunks"], 2)
+        self.assertEqual(
+            sorted(Notifications.objects.values_list("id", flat=True)), [5001, 9000]
+        )
+
+    def test_dry_run(self):
+        stdout = StringIO()
+        call_command("prune_notifications", days=90, dry_run=True, stdout=stdout)
+        self.assertIn("3 read notifications created before", stdout.getvalue())
+        self.assertEqual(Notifications.objects.count(), 5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UnreadCountTest(TestCase):
+    """
+    The cached unread counter follows the writers, also while it is being recomputed.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create(
+            email="reader@test.com", username="reader"
+        )
+        self.first = self.notify()
+
+    def notify(self):
+        notification = Notifications.objects.create(
+            user=self.user, message="Hi", notification_type="like"
+        )
+        add_unread_counts({self.user.id: 1})
+        return notification
+
+    def test_writers(self):
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        second = self.notify()
+        self.notify()
+        self.assertEqual(get_unread_count(self.user.id), 3)
+        self.assertEqual(mark_read(self.user.id, [self.first.pk, second.pk]), 2)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertEqual(mark_read(self.user.id), 1)
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def test_notification_during_recount(self):
+        add = cache.add
+
+        def notify_meanwhile(key, *args, **kwargs):
+            # * A notification saved between the COUNT and the caching of its result *
+            if not key.endswith(":generation"):
+                self.notify()
+            return add(key, *args, **kwargs)
+
+        with mock.patch.object(cache, "add", notify_meanwhile):
+            self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertEqual(get_unread_count(self.user.id), 2)
+
+
+def access_token(user_id):
+    token = AccessToken()
+    token["user_id"] = user_id
+    return str(token)
+
+
+def newpost_event(post_id):
+    return {
+        "type": "newpost_notification",
+        "post_id": post_id,
+        "author_id": 2,
+        "author_username": "author",
+        "post_title": "Title",
+        "notification_type": "newpost",
+    }
+
+
+class OtherProcessConsumer(NotificationConsumer):
+    # * Second RedisChannelLayer instance, stands for a consumer held by another Daphne process *
+    channel_layer_alias = "other"
+
+
+@unittest.skipUnless(fakeredis, "fakeredis is not installed")
+class RedisChannelLayerTest(SimpleTestCase):
+    """
+    Notifications sent through one RedisChannelLayer reach sockets held by another one.
+    """
+
+    def setUp(self):
+        server = fakeredis.FakeServer()
+        layer = {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": [
+                    {
+                        "address": "redis://localhost:6379/2",
+                        "connection_class": FakeConnection,
+                        "server": server,
+                    }
+                ],
+                "prefix": "blogs:channels",
+            },
+        }
+        settings = override_settings(
+            CACHES=LOCMEM_CACHES, CHANNEL_LAYERS={"default": layer, "other": layer}
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    async def connect(self, consumer, query):
+        communicator = WebsocketCommunicator(
+            consumer.as_asgi(), f"/ws/notifications/?{query}"
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_cross_process_delivery(self):
+        first = await self.connect(NotificationConsumer, "topics=newposts")
+        second = await self.connect(OtherProcessConsumer, f"token={access_token(7)}")
+        layer, other_layer = get_channel_layer(), get_channel_layer("other")
+        self.assertIsNot(layer, other_layer)
+
+        await other_layer.group_send(NEWPOST_GROUP, newpost_event(1))
+        self.assertEqual((await first.receive_json_from(2))["post_id"], 1)
+        self.assertTrue(await second.receive_nothing(0.2))  # Not subscribed.
+
+        await layer.group_send(user_group_name(7), newpost_event(3))
+        self.assertEqual((await second.receive_json_from(2))["post_id"], 3)
+        self.assertTrue(await first.receive_nothing(0.2))
+
+        await first.disconnect()
+        await second.disconnect()
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES,
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}},
+    WEBSOCKET_HEARTBEAT_INTERVAL=10,
+    WEBSOCKET_HEARTBEAT_TIMEOUT=30,
+    WEBSOCKET_SEND_QUEUE_SIZE=10,
+    WEBSOCKET_RECEIVE_RATE=1,
+    WEBSOCKET_RECEIVE_BURST=5,
+)
+class NotificationConsumerTest(SimpleTestCase):
+    """
+    Heartbeat, bounded send queue and inbound rate limit of the notification sockets.
+    """
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(),
+            f"/ws/notifications/?token={access_token(7)}",
+        )
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def assertClosed(self, communicator, code, timeout=1):
+        output = await communicator.receive_output(timeout)
+        self.assertEqual(output, {"type": "websocket.close", "code": code})
+
+    async def test_rejects_unauthenticated(self):
+        communicator = WebsocketCommunicator(
+            NotificationConsumer.as_asgi(), "/ws/notifications/?token=invalid"
+        )
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4401)
+
+    async def test_ping_pong(self):
+        communicator = await self.connect()
+        await communicator.send_json_to({"type": "ping"})
+        self.assertEqual(await communicator.receive_json_from(), {"type": "pong"})
+        await communicator.send_to(text_data="not json")
+        self.assertTrue(await communicator.receive_nothing(0.1))
+        await communicator.disconnect()
+
+    @override_settings(WEBSOCKET_HEARTBEAT_INTERVAL=0.1)
+    async def test_heartbeat_ping(self):
+        communicator = await self.connect()
+        self.assertEqual(await communicator.receive_json_from(1), {"type": "ping"})
+        await communicator.send_json_to({"type": "pong"})
+        self.assertEqual(await communicator.receive_json_from(1), {"type": "ping"})
+        await communicator.disconnect()
+
+    @override_settings(WEBSOCKET_HEARTBEAT_TIMEOUT=0.2)
+    async def test_heartbeat_timeout(self):
+        # * Closed at the silence deadline, not at the next ping (10s) *
+        communicator = await self.connect()
+        started = time.monotonic()
+        await self.assertClosed(communicator, 4408, timeout=2)
+        self.assertLess(time.monotonic() - started, 1)
+        await communicator.disconnect()
+
+    async def test_rate_limit(self):
+        communicator = await self.connect()
+        for _ in range(6):  # Burst of 5.
+            await communicator.send_json_to({"type": "pong"})
+        await self.assertClosed(communicator, 4429)
+        await communicator.disconnect()
+
+    async def test_slow_reader_bounded_queue(self):
+        send = NotificationConsumer.send
+
+        async def slow_send(consumer, *args, **kwargs):
+            await asyncio.sleep(0.05)
+            return await send(consumer, *args, **kwargs)
+
+        communicator = await self.connect()
+        layer = get_channel_layer()
+        dropped = socket_metrics.COUNTERS["messages_dropped"]
+        with mock.patch.object(NotificationConsumer, "send", slow_send):
+            for post_id in range(50):
+                await layer.group_send(user_group_name(7), newpost_event(post_id))
+            await asyncio.sleep(0.1)
+            (consumer,) = socket_metrics.CONNECTIONS
+            self.assertLessEqual(consumer.queue_depth(), 10)
+
+        received = []
+        while not await communicator.receive_nothing(0.2):
+            received.append((await communicator.receive_json_from())["post_id"])
+        # Oldest messages dropped, the latest ones delivered in order.
+        self.assertLess(len(received), 50)
+        self.assertEqual(
+            socket_metrics.COUNTERS["messages_dropped"] - dropped, 50 - len(received)
+        )
+        self.assertEqual(received, sorted(received))
+        self.assertEqual(received[-10:], list(range(40, 50)))
+        await communicator.disconnect()
+
+    async def test_coalesced_notifications(self):
+        communicator = await self.connect()
+        (consumer,) = socket_metrics.CONNECTIONS
+        # * Queued back to back, the writer task only runs once the test yields *
+        for actor_count in range(1, 4):
+            consumer.enqueue(
+                json.dumps({"actor_count": actor_count}), key=("like", 1, None)
+            )
+        self.assertEqual(consumer.queue_depth(), 1)
+        self.assertEqual(await communicator.receive_json_from(), {"actor_count": 3})
+        self.assertTrue(await communicator.receive_nothing(0.1))
+        await communicator.disconnect()
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    OBJECTS = {
+        "/v1/customers": ("customer", "cus"),
+        "/v1/subscriptions": ("subscription", "sub"),
+    }
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.calls += 1
+        time.sleep(self.server.latency)
+        # * Customer lookup by email: no customer was created before the ID was stored *
+        self.respond(
+            {"object": "list", "url": "/v1/customers", "has_more": False, "data": []}
+        )
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        with self.server.lock:
+            self.server.calls += 1
+        time.sleep(self.server.latency)
+        path = urlparse(self.path).path
+        key = self.headers.get("Idempotency-Key")
+        with self.server.lock:
+            response = self.server.responses.get(key)
+            if response is None:
+                object_name, prefix = self.OBJECTS[path]
+                response = {
+                    "id": f"{prefix}_{next(self.server.ids)}",
+                    "object": object_name,
+                    "status": "active",
+                }
+                self.server.responses[key] = response
+                self.server.created[object_name] += 1
+        self.respond(response)
+
+    def respond(self, body):
+        content = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeStripeServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the Stripe API: answers the customer / subscription calls after 'latency' seconds,
+    and returns the first response again for a repeated idempotency key, like Stripe.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency):
+        super().__init__(("127.0.0.1", 0), FakeStripeHandler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.responses = {}
+        self.created = {"customer": 0, "subscription": 0}
+        self.calls = 0
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def handle_error(self, request, client_address):
+        pass  # Broken pipe: the client timed out and closed the connection.
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CreateSubscriptionLoadTest(TestCase):
+    """
+    Concurrent subscriptions against a slow (fake) Stripe: the Stripe calls overlap instead of
+    holding the server for every round trip, and a repeated request creates nothing twice.
+    """
+
+    LATENCY = 0.2  # Seconds per Stripe call.
+
+    def setUp(self):
+        cache.clear()  # Cached entitlements of the users (IDs) of previous tests.
+        self.stripe = FakeStripeServer(self.LATENCY)
+        threading.Thread(target=self.stripe.serve_forever, daemon=True).start()
+        self.addCleanup(self.stripe.server_close)
+        self.addCleanup(self.stripe.shutdown)
+        patcher = mock.patch.multiple(
+            stripe, api_key="sk_test_fake", api_base=self.stripe.url
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def subscribe(self, user=None, idempotency_key=None, **params):
+        headers = {}
+        if user is not None:
+            headers["Authorization"] = f"Bearer {AccessToken.for_user(user)}"
+        if idempotency_key is not None:
+            headers["Idempotency-Key"] = idempotency_key
+        return AsyncClient().post(
+            f"/premium/?{urlencode(params)}",
+            {},
+            content_type="application/json",
+            headers=headers,
+        )
+
+    async def create_users(self, count):
+        return [
+            await CustomUser.objects.acreate(
+                email=f"premium{i}@test.com", username=f"premium{i}"
+            )
+            for i in range(count)
+        ]
+
+    async def test_concurrent_subscriptions(self):
+        users = await self.create_users(20)
+        started = time.monotonic()
+        responses = await asyncio.gather(*(self.subscribe(user) for user in users))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual([response.status_code for response in responses], [201] * 20)
+        self.assertEqual(await PremiumUser.objects.acount(), 20)
+        self.assertEqual(self.stripe.created, {"customer": 20, "subscription": 20})
+        # 3 Stripe calls per subscription, one after the other they would take 20 * 3 * LATENCY = 12s.
+        self.assertLess(elapsed, 20 * 3 * self.LATENCY / 3)
+
+    async def test_repeated_request_subscribes_once(self):
+        (user,) = await self.create_users(1)
+        responses = await asyncio.gather(
+            self.subscribe(user, idempotency_key="request-1"),
+            self.subscribe(user, idempotency_key="request-1"),
+        )
+        self.assertEqual([response.status_code for response in responses], [201, 201])
+        self.assertEqual(self.stripe.created, {"customer": 1, "subscription": 1})
+        premium_user = await PremiumUser.objects.aget(user=user)
+        self.assertEqual(premium_user.stripe_subscription_id, "sub_2")
+
+        response = await self.subscribe(user)
+        self.assertEqual(response.status_code, 400)  # Already subscribed.
+
+    async def test_subscribe_again_after_cancel(self):
+        (user,) = await self.create_users(1)
+        self.assertEqual((await self.subscribe(user)).status_code, 201)
+        premium_user = await PremiumUser.objects.aget(user=user)
+        premium_user.has_active_subscription = False  # Canceled (webhook).
+        await premium_user.asave()
+
+        self.assertEqual((await self.subscribe(user)).status_code, 201)
+        self.assertEqual(self.stripe.created["subscription"], 2)
+        await premium_user.arefresh_from_db()
+        self.assertTrue(premium_user.has_active_subscription)
+        self.assertEqual(premium_user.stripe_subscription_id, "sub_3")
+
+    async def test_stripe_timeout(self):
+        # * The timeout is enforced on the HTTP call itself, then the Stripe library retries it *
+        (user,) = await self.create_users(1)
+        with mock.patch.multiple(
+            stripe,
+            default_http_client=stripe.HTTPXClient(timeout=0.05),
+            max_network_retries=1,
+        ):
+            started = time.monotonic()
+            response = await self.subscribe(user)
+        self.assertEqual(response.status_code, 504)
+        self.assertLess(time.monotonic() - started, 3)
+        self.assertFalse(await PremiumUser.objects.aexists())
+        self.assertEqual(self.stripe.calls, 2)  # Customer lookup, retried once.
+
+    async def test_authentication_classes(self):
+        (user,) = await self.create_users(1)
+        self.assertEqual((await self.subscribe()).status_code, 401)
+
+        # * OAuth2 (django-oauth-toolkit) token, accepted by the API views as well *
+        application = await Application.objects.acreate(
+            name="App",
+            client_type=Application.CLIENT_CONFIDENTIAL,
+            authorization_grant_type=Application.GRANT_PASSWORD,
+        )
+        token = await OAuth2AccessToken.objects.acreate(
+            user=user,
+            application=application,
+            token="oauth2-token",
+            expires=timezone.now() + timezone.timedelta(hours=1),
+            scope="read write",
+        )
+        response = await self.subscribe(access_token=token.token)
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(await PremiumUser.objects.filter(user=user).aexists())
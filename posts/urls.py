@@ -96,6 +96,24 @@ urlpatterns = [
         views.UserNotificationList.as_view(),
         name="all-notifications-by-userid",
     ),  # Get list of all the specific user notification in the database. (GET)
+    path(
+        "notifications/inbox/", views.InboxAPI.as_view(), name="notifications-inbox"
+    ),  # Keyset paginated notifications of the authenticated user. (GET)
+    path(
+        "notifications/inbox/unread-count/",
+        views.UnreadNotificationsCountAPI.as_view(),
+        name="notifications-unread-count",
+    ),  # Number of unread notifications of the authenticated user. (GET)
+    path(
+        "notifications/inbox/read/",
+        views.MarkNotificationsReadAPI.as_view(),
+        name="notifications-mark-read",
+    ),  # Mark notifications of the authenticated user as read. (POST)
+    path(
+        "notifications/socket-metrics/",
+        views.SocketMetricsAPI.as_view(),
+        name="notifications-socket-metrics",
+    ),  # Open notification sockets and queue depths, staff only. (GET)
     path(
         "notification/update/<int:pk>",
         views.DetailedNotification.as_view(),
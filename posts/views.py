@@ -1,9 +1,27 @@
 from rest_framework import generics, views, status, permissions
 from django.core.mail import send_mail
 from accounts.models import CustomUser, PremiumUser
-from accounts.serializer import PremiumUserSerializer
+from accounts.auth import aget_request_user
+from accounts.entitlements import has_premium_access
+from accounts.billing import aget_stripe_customer_id
+from blogs.cache import CachedResponseMixin
+from blogs.http import get_request_data
 from .models import Like, Comment, Post, PostHistory, Notifications
+from .counters import record_post_view
+from .scheduler import maybe_publish_due_posts
+from .detail_cache import (
+    POSTS_NAMESPACE,
+    get_cached_detail,
+    get_post_version,
+    set_cached_detail,
+)
+from . import feed_index
+from .comment_tree import CommentTree
+from .inbox import get_unread_count, mark_read, reset_unread_count
+from .socket_metrics import get_metrics as get_socket_metrics
+from .pagination import InboxPagination, PostFeedPagination
 from .serializer import (
+    merge_pending_views,
     LikeSerializer,
     CommentSerializer,
     PostSerializer,
@@ -14,7 +32,6 @@ from django.utils.text import slugify
 from django.http import Http404
 from rest_framework.response import Response
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Count
 from django.utils import timezone
 from .permissions import (
     PostPermissions,
@@ -23,8 +40,14 @@ from .permissions import (
     PostHistoryPermissions,
 )
 from django.conf import settings
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 import stripe
 from rest_framework.pagination import PageNumberPagination
+from blogs.pagination import OptionalPageNumberPagination, seek_filter
 from django.db.models import Q
 from django.shortcuts import get_object_or_404
 import uuid
@@ -53,37 +76,29 @@ class ScheduledPostPremiumUserMixin:  # Implementing DRY.
             - Authenticated NON - PREM User GET Detail Request -> Returns NO Premium Post
             - Authenticated PREM User GET List Request -> Returns Premium Post
         """
-        user = self.request.user
-
-        if (
-            user.is_anonymous
-        ):  # Checking for anonymous (Unauthenticated Read-Only) requets.
-            return (
-                super()
-                .get_queryset()
-                .filter(posted_at__lte=timezone.now(), is_premium_post=False)
-                .order_by("-posted_at")
-            )
-
-        # The request if from some authenticated user so, check if the user if premium user or not.
-        premium_user = PremiumUser.objects.filter(user=user).first()
+        # * Published posts only (is_published, see posts/scheduler.py), the queries don't depend on the time *
+        maybe_publish_due_posts()  # No-op with Redis (worker).
+        queryset = (
+            super().get_queryset().filter(is_published=True).order_by("-posted_at")
+        )
 
-        # If the user is Authenticated but not Premium User or does not have premium subscription - No Premium Posts.
-        if not premium_user or not premium_user.has_active_subscription():
-            return (
-                super()
-                .get_queryset()
-                .filter(posted_at__lte=timezone.now(), is_premium_post=False)
-                .order_by("-posted_at")
-            )
+        # Anonymous users and Authenticated users without premium subscription - No Premium Posts.
+        # * Cached entitlement lookup, no Stripe call per request (accounts/entitlements.py) *
+        if self.get_tier() == "free":
+            return queryset.filter(is_premium_post=False)
 
         # If the user is a premium user and has an active subscription, return all posts
-        return (
-            super()
-            .get_queryset()
-            .filter(posted_at__lte=timezone.now())
-            .order_by("-posted_at")
-        )
+        return queryset
+
+    def get_tier(self):
+        """
+        Returns the entitlement tier of the request's user, "premium" or "free" (anonymous / not premium).
+        * Used in cache keys, anonymous and non premium users get the same posts *
+        """
+        user = self.request.user
+        if not user.is_anonymous and has_premium_access(user):
+            return "premium"
+        return "free"
 
 
 class PremiumPostMixin:
@@ -99,24 +114,39 @@ class PremiumPostMixin:
             raise PermissionDenied("Permission Denied - Not Premium User")
 
         # The request if from some authenticated user so, check if the user if premium user or not.
-        premium_user = PremiumUser.objects.filter(user=user).first()
-
         # If the user is Authenticated but not Premium User or does not have premium subscription - No Premium Posts.
-        if not premium_user or not premium_user.has_active_subscription():
+        if not has_premium_access(user):
             raise PermissionDenied("Permission Denied - Not Premium User")
 
         # If the user is a premium user and has an active subscription, return all posts
-        return (
-            super()
-            .get_queryset()
-            .filter(posted_at__lte=timezone.now(), is_premium_post=True)
-        )
+        maybe_publish_due_posts()  # No-op with Redis (worker).
+        return super().get_queryset().filter(is_published=True, is_premium_post=True)
 
 
 class PaginationMixin:
     pagination_class = PageNumberPagination
 
 
+class FeedPaginationMixin:
+    """
+    Page Number Pagination by default, keyset (cursor) pagination with ?pagination=cursor.
+    * Applied to feeds ordered by latest (posted_at) *
+    """
+
+    pagination_class = PostFeedPagination
+
+
+def increment_post_views(instance):
+    """
+    Increments the 'views' of a post by +1.
+
+    The view goes to the buffered view counter (posts/counters.py) instead of an UPDATE per read,
+    'python manage.py flush_post_views' applies the views (and their Engagement Score) in bulk.
+    The pending views are merged into the response by PostSerializer.
+    """
+    instance.pending_views = record_post_view(instance.pk)
+
+
 class CreatePostAPI(generics.CreateAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
@@ -146,7 +176,7 @@ class CreatePostAPI(generics.CreateAPIView):
 
 
 class ListAllPostsAPI(
-    ScheduledPostPremiumUserMixin, PaginationMixin, generics.ListAPIView
+    ScheduledPostPremiumUserMixin, FeedPaginationMixin, generics.ListAPIView
 ):
     """
     List view using Generics.
@@ -158,7 +188,7 @@ class ListAllPostsAPI(
     """
 
     serializer_class = PostSerializer
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_listing()
     permission_classes = [PostPermissions]
 
 
@@ -173,7 +203,7 @@ class ListAllPostsAPIADMIN(ScheduledPostPremiumUserMixin, generics.ListAPIView):
     """
 
     serializer_class = PostSerializer
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_listing()
     permission_classes = [PostPermissions]
     pagination_class = None
 
@@ -188,7 +218,7 @@ class DetailPostAPI(
     """
 
     # queryset = Post.objects.filter(is_premium_post = False)
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_listing()
     serializer_class = PostSerializer
     permission_classes = [PostPermissions]
 
@@ -202,16 +232,7 @@ class DetailPostAPI(
         * How to Fix: Use Sessions to keep track of viewed Posts or Track the user's view count using IP Address. *
         """
         instance = self.get_object()  # Getting the instance of the object.
-        if instance.views is None:
-            instance.views = 1
-            instance.save(
-                update_fields=["views"]
-            )  # Updating the value in the database.
-            serializer = self.get_serializer(instance)  # Serializing the data.
-            return Response(serializer.data)  # Returning the object.
-
-        instance.views += 1  # Incrementing the view.
-        instance.save(update_fields=["views"])  # Updating the value in the database.
+        increment_post_views(instance)  # Incrementing the view.
         serializer = self.get_serializer(instance)  # Serializing the data.
         return Response(serializer.data)  # Returning the object.
 
@@ -225,7 +246,7 @@ class SlugPostAPI(ScheduledPostPremiumUserMixin, generics.RetrieveAPIView):
     * Scheduling enabled *
     """
 
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_listing()
     serializer_class = PostSerializer
     permission_classes = [PostPermissions]
     lookup_field = "post_slug"
@@ -254,96 +275,122 @@ class SlugPostAPI(ScheduledPostPremiumUserMixin, generics.RetrieveAPIView):
 
         Increments the 'views' by +1 when detailed post is retrieved and saves into the database.
 
+        * The response (post + next / previous post slugs) is cached per slug, tier (free / premium) and type,
+        * see posts/detail_cache.py. The view is counted on every request, outside of the cached part *
+
+        ?type= all (default) | featured | top | popular | trending -> feed of the next / previous posts.
+        NOTE: Popular / Trending neighbors of a cached response can be stale for POST_DETAIL_CACHE_TIMEOUT.
+
         ! BUG: Users can simply perform refresh the window to increase the views count !
         * How to Fix: Use Sessions to keep track of viewed Posts or Track the user's view count using IP Address. *
         """
-        instance = self.get_object()  # Getting the instance of the object.
-        if not instance.views:  # If views are 0 (null)
-            instance.views = 1
+        slug = self.kwargs.get(self.lookup_field)
+        post_type = request.GET.get("type")
+        if post_type not in feed_index.FEED_ORDERINGS:
+            post_type = "all"
+        tier = self.get_tier()
+
+        entry = get_cached_detail(slug, tier, post_type)
+        if entry is not None:
+            post_id, data = entry["post_id"], entry["data"]
         else:
-            instance.views += 1  # Incrementing the view.
-        instance.save(update_fields=["views"])  # Updating the value in the database.
+            instance = self.get_object()  # Getting the instance of the object.
+            post_id = instance.pk
+            post_version = get_post_version(post_id)  # Read before building the data.
+            data = self.get_detail_data(instance, post_type, tier)
+            set_cached_detail(slug, tier, post_type, post_id, post_version, data)
+
+        pending_views = record_post_view(post_id)  # Incrementing the view.
+        return Response(merge_pending_views(dict(data), pending_views))
+
+    def get_detail_data(self, instance, post_type, tier):
+        """
+        Serializes the post with the slugs of the next and previous posts.
+        """
         serializer = self.get_serializer(instance)  # Serializing the data.
 
-        # Get the queryset that excludes premium posts
-        queryset = self.get_queryset()
+        # * Neighbors are read from the feed index (posts/feed_index.py), O(log n) rank lookup in Redis.
+        # * Falls back to the database when the index can't answer (no Redis / not built yet) *
+        neighbors = feed_index.get_neighbors(instance.pk, post_type, tier)
+        if neighbors is None:
+            neighbors = self.get_db_neighbors(instance, post_type)
+        next_post, previous_post = neighbors
 
-        post_type = request.GET.get("type")
+        response = dict(serializer.data)
+        response["next_post_slug"] = next_post
+        response["previous_post_slug"] = previous_post
+        return response
 
-        if post_type == "featured":
-            queryset = queryset.filter(is_featured=True)
-        elif post_type == "top":
-            queryset = queryset.filter(is_top_post=True)
-        else:
-            queryset = self.get_queryset()
+    def get_db_neighbors(self, instance, post_type):
+        """
+        Gets the slugs of the next and previous posts with two queries, seeking from the post in the feed's ordering.
+
+        * Same (ordering values, id) tiebreak as the feeds, posts with the same date / score are never skipped *
+
+        Returns:
+            tuple: (next_post_slug, previous_post_slug)
+        """
+        # Get the queryset that excludes premium posts
+        queryset = self.get_queryset().filter(
+            **feed_index.FEED_FILTERS.get(post_type, {})
+        )
+        ordering = feed_index.FEED_ORDERINGS[post_type]
+        reverse_ordering = tuple(
+            field[1:] if field.startswith("-") else f"-{field}" for field in ordering
+        )
+        values = [getattr(instance, field.lstrip("-")) for field in ordering]
 
-        # Get the next and previous posts
-        # * This next_post and previous_post use a unique method to calculate posts.
-        # * This method fixes a bug where posts with same date and time used to skip in next and previous post.
         next_post = (
-            queryset.filter(
-                Q(posted_at__lt=instance.posted_at)
-                | (Q(posted_at=instance.posted_at) & Q(id__gt=instance.id))
-            )
-            .order_by("-posted_at", "id")
+            queryset.filter(seek_filter(ordering, values))
+            .order_by(*ordering)
+            .values_list("post_slug", flat=True)
             .first()
         )
         previous_post = (
-            queryset.filter(
-                Q(posted_at__gt=instance.posted_at)
-                | (Q(posted_at=instance.posted_at) & Q(id__lt=instance.id))
-            )
-            .order_by("posted_at", "-id")
+            queryset.filter(seek_filter(reverse_ordering, values))
+            .order_by(*reverse_ordering)
+            .values_list("post_slug", flat=True)
             .first()
         )
-        # Add the post_slug of the next and previous posts to the response
-
-        # ! Working only for All, Featured and Top posts !
-        # ! NOT working for Trending, Popular Posts !
-
-        response = serializer.data
-        response["next_post_slug"] = next_post.post_slug if next_post else None
-        response["previous_post_slug"] = (
-            previous_post.post_slug if previous_post else None
-        )
-
-        return Response(response)  # Returning the object.
+        return next_post, previous_post
 
 
 class GetFeaturedPosts(
-    ScheduledPostPremiumUserMixin, PaginationMixin, generics.ListAPIView
+    CachedResponseMixin,
+    ScheduledPostPremiumUserMixin,
+    FeedPaginationMixin,
+    generics.ListAPIView,
 ):
     """
     Getting all Featured posts by field 'is_featured' = True.
 
     * Scheduling enabled *
-    * Cache Enabled *
-    NOTE: Cache will only invalidate after a certain time. While post creation, Feature Post cache needs to be invalidated.
+    * Cache Enabled -> pages are cached per entitlement tier under the "posts" namespace (blogs/cache.py),
+    * invalidated when a post is saved, deleted or published *
+    NOTE: Likes / comments / views of the cached page can be stale for 'cache_timeout' seconds.
     """
 
-    queryset = Post.objects.filter(is_featured=True)
+    queryset = Post.objects.for_listing().filter(is_featured=True)
     serializer_class = PostSerializer
     permission_classes = [PostPermissions]
+    cache_namespaces = [POSTS_NAMESPACE]
+    cache_timeout = 60
 
-    def get_queryset(self):
-        page = self.request.query_params.get("page", 1)
-        cache_key = f"featured_post_page_{page}"
-        query_set = cache.get(cache_key)
-
-        if query_set is None:
-            query_set = super().get_queryset()
-            cache.set(cache_key, query_set, 6 * 10)
-        return query_set
+    def get_cache_key(self, request):
+        # Free and premium users get different posts.
+        return f"{super().get_cache_key(request)}:{self.get_tier()}"
 
 
-class GetTopPosts(ScheduledPostPremiumUserMixin, PaginationMixin, generics.ListAPIView):
+class GetTopPosts(
+    ScheduledPostPremiumUserMixin, FeedPaginationMixin, generics.ListAPIView
+):
     """
     Getting all LATEST Published Top Posts by field 'is_top_post' = True.
 
     * Scheduling enabled *
     """
 
-    queryset = Post.objects.filter(is_top_post=True)
+    queryset = Post.objects.for_listing().filter(is_top_post=True)
     serializer_class = PostSerializer
     permission_classes = [PostPermissions]
 
@@ -357,51 +404,36 @@ class GetPopularPosts(
     * Scheduling enabled *
     """
 
-    queryset = (
-        Post.objects.annotate(total_likes=Count("likes"))
-        .annotate(total_comments=Count("comments"))
-        .order_by("-total_likes", "-total_comments")
-    )
+    queryset = Post.objects.for_listing()
     serializer_class = PostSerializer
     permission_classes = [PostPermissions]
 
+    def get_queryset(self):
+        # Ordered after the mixin, which orders by latest.
+        return (
+            super().get_queryset().order_by(*feed_index.FEED_ORDERINGS["popular"])
+        )
+
 
 class GetTrendingPosts(
     ScheduledPostPremiumUserMixin, PaginationMixin, generics.ListAPIView
 ):
     """
-    This view, calls 'get_eng_score' to calculate eng_score for all posts.
+    Getting all Published Trending Posts by highest Engagement Score.
 
-    ! Issue 1: This method will cause performance issues if there are to many posts !
-    TODO: For now, Trending Published Posts are being processed but will have to work for an efficient solution.
     * Scheduling enabled *
-
-    * Caching Enabled *
-    ! Issue 2: Caching is enabled per pages, working perfectly but might cause an for stale data.
-    ! Example: If Page 1 is loaded at 10:00 and Page 2 is loaded at 10:05, engagement score might be changed
-    * Time reduces from 900+ ms to < 50ms *
+    * Uses the stored (indexed) 'eng_score' column -> ORDER BY ... LIMIT, no per-post scoring *
+    NOTE: Time-decay term of the score is refreshed by 'python manage.py refresh_eng_scores'.
     """
 
     serializer_class = PostSerializer
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_listing()
     permission_classes = [PostPermissions]
 
     def get_queryset(self):
-        page = self.request.query_params.get("page", 1)
-        cache_key = f"trending_post_page_{page}"
-        queryset = cache.get(cache_key)
-
-        if queryset is None:
-            queryset = super().get_queryset()
-            queryset = sorted(
-                queryset, key=lambda obj: obj.get_eng_score(), reverse=True
-            )
-            cache.set(
-                f"trending_post_page_{page}", queryset, 60 * 10
-            )  # Set the queryset in the cache
-            # return queryset
-
-        return queryset
+        return (
+            super().get_queryset().order_by(*feed_index.FEED_ORDERINGS["trending"])
+        )
 
 
 # Post Views End #
@@ -476,19 +508,24 @@ class GetPostComments(generics.ListAPIView):
         Retrieves the comments for the specified post.
 
         Returns:
-            QuerySet: The queryset containing the comments for the specified post.
+            list: The comments for the specified post, loaded with their CommentTree.
 
         Raises:
             Http404: If no comments are found for the specified post.
         """
         post_id = self.kwargs.get("post")
         post_obj = Post.objects.get(id=post_id)
-        queryset = self.queryset.filter(post=post_obj)
+        self.comment_tree = CommentTree.for_post(post_obj)
 
-        if not queryset.exists():
+        if not self.comment_tree.comments:
             raise Http404("No comments found for this post.")
 
-        return queryset
+        return self.comment_tree.comments
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["comment_tree"] = getattr(self, "comment_tree", None)
+        return context
 
 
 class GetPostCommentsbySlug(generics.ListAPIView):
@@ -505,31 +542,45 @@ class GetPostCommentsbySlug(generics.ListAPIView):
     Permissions:
         Comment Permissions.
     ! Bug: Does not return exact number of Comments as number of Replies is not included.
+
+    * Comments, authors and likes are loaded once with CommentTree (fixed number of queries) *
+
+    Query Params (optional):
+        depth (int): Max depth of nested replies, e.g. depth=1 -> top level comments + direct replies.
+        page_size (int), page (int): Paginate the top level threads. Not paginated if page_size is not provided.
     """
 
     serializer_class = CommentSerializer
     queryset = Comment.objects.filter(parent_comment=None)
-    pagination_class = None
+    pagination_class = OptionalPageNumberPagination
     # permission_classes = [CommentPermissions]
 
     def get_queryset(self):
         """
-        Retrieves the comments for the specified post.
+        Retrieves the top level comments (threads) for the specified post.
 
         Returns:
-            QuerySet: The queryset containing the comments for the specified post.
+            list: The top level comments for the specified post, loaded with their CommentTree.
 
         Raises:
             Http404: If no comments are found for the specified post.
         """
         slug = self.kwargs.get("slug")
         post_obj = Post.objects.get(post_slug=slug)
-        queryset = self.queryset.filter(post=post_obj)
+        self.comment_tree = CommentTree.for_post(post_obj)
 
-        if not queryset.exists():
+        if not self.comment_tree.roots:
             raise Http404(f"No comments found for this post {post_obj.id}.")
 
-        return queryset
+        return self.comment_tree.roots
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["comment_tree"] = getattr(self, "comment_tree", None)
+        depth = self.request.query_params.get("depth")
+        if depth is not None and depth.isdigit():
+            context["max_depth"] = int(depth)
+        return context
 
 
 # Comments View End #
@@ -637,7 +688,7 @@ class ListAllPostsHistory(generics.ListAPIView):
     List all Logs of PostHistory. (GET)
     """
 
-    queryset = PostHistory.objects.all()
+    queryset = PostHistory.objects.prefetch_related("tags")
     serializer_class = PostHistorySerializer
     permission_classes = [PostHistoryPermissions]
 
@@ -657,7 +708,11 @@ class ListSinglePostHistory(generics.ListAPIView):
 
     def get_queryset(self):
         post_id = self.kwargs.get(self.lookup_field)
-        return PostHistory.objects.filter(post=post_id).order_by("-updated_at")
+        return (
+            PostHistory.objects.filter(post=post_id)
+            .prefetch_related("tags")
+            .order_by("-updated_at")
+        )
 
 
 # PostHistory Views End #
@@ -729,88 +784,89 @@ class SendEmailView(views.APIView):
 
 stripe.api_key = settings.STRIPE_SECRET_KEY
 
+PREMIUM_PRICE_ID = "price_1Oqs9jLbIWA3Cm6Ek5D2k46i"
+
 
-class CreateSubscriptionView(generics.CreateAPIView):
+@method_decorator(csrf_exempt, name="dispatch")
+class CreateSubscriptionView(View):
     """
     API view to handle creation of a new subscription for a user.
     Each PremiumUser corresponds to a Stripe Customer with a Subscription.
     ! Products (Premium Post) is hard coded !
     ! Have to provide users with option to Cancel the subscription !
-    """
 
-    queryset = PremiumUser.objects.all()
-    serializer_class = PremiumUserSerializer
-    permission_classes = [permissions.IsAuthenticated]
+    * Async view: Stripe is called with the *_async methods (timeout and retries: accounts/billing.py),
+    * so a slow Stripe doesn't hold a worker thread of the server for the whole round trip *
+    * Authenticated with the DRF authentication classes (JWT / OAuth2 / social), like the API views *
+    """
 
-    def create(self, request, *args, **kwargs):
-        """
-        Overriding create() to create a Stripe Customer and Subscription,
-        and a corresponding PremiumUser in the database.
+    async def post(self, request, *args, **kwargs):
         """
-        data = request.data
-        customers = stripe.Customer.list(email=request.user.email).data
-
-        if customers:  # If the customer already exists in Stripe
-            customer = customers[0]
-            customer = stripe.Customer.retrieve(customer.id, expand=["subscriptions"])
-
-            # Check if the customer already has an active subscription
-            for subscription in customer.subscriptions.data:
-                if (
-                    subscription.plan.id == "price_1Oqs9jLbIWA3Cm6Ek5D2k46i"
-                    and subscription.status == "active"
-                ):
-                    return Response(
-                        {"message": "You are already subscribed to this plan"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-
-            # Else Create a new subscription for the customer
-            subscription = stripe.Subscription.create(
-                customer=customer.id,
-                items=[{"price": "price_1Oqs9jLbIWA3Cm6Ek5D2k46i"}],
-            )
+        Creates a Stripe Customer and Subscription, and a corresponding PremiumUser in the database.
 
-            # Update or create the corresponding PremiumUser
-            PremiumUser.objects.update_or_create(
-                user=request.user,
-                defaults={
-                    "stripe_customer_id": customer.id,
-                    "stripe_subscription_id": subscription.id,
-                    "has_active_subscription": True,
-                },
+        * The subscription status is checked locally and the stored Stripe Customer is reused,
+        * so subscribing only calls Stripe to create the subscription (and the customer the first time) *
+        """
+        user = await aget_request_user(request)
+        if user is None:
+            return JsonResponse(
+                {"detail": "Authentication credentials were not provided."},
+                status=status.HTTP_401_UNAUTHORIZED,
             )
-            return Response(
-                {"message": "Successfully Subscribed"}, status=status.HTTP_201_CREATED
+        data = get_request_data(request)
+        if data is None:
+            return JsonResponse(
+                {"message": "Invalid JSON."}, status=status.HTTP_400_BAD_REQUEST
             )
 
-        else:  # If the customer doesn't exist in Stripe, create a new customer and subscription
-            customer = stripe.Customer.create(
-                email=request.user.email, source=data["source"]
-            )
-            subscription = stripe.Subscription.create(
-                customer=customer.id,
-                items=[{"price": "price_1Oqs9jLbIWA3Cm6Ek5D2k46i"}],
+        # Check if the customer already has an active subscription
+        if await sync_to_async(has_premium_access)(user):
+            return JsonResponse(
+                {"message": "You are already subscribed to this plan"},
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-            # Create the corresponding PremiumUser
-            PremiumUser.objects.create(
-                user=request.user,
-                stripe_customer_id=customer.id,
-                stripe_subscription_id=subscription.id,
-                has_active_subscription=True,
+        create_kwargs = {"source": data["source"]} if data.get("source") else {}
+        # * One key per subscribe request, reused only by the retries of this request. A client resending
+        # * the same request (double click / network retry) sends the same 'Idempotency-Key' header *
+        request_key = request.headers.get("Idempotency-Key") or uuid.uuid4().hex
+        try:
+            customer_id = await aget_stripe_customer_id(user, **create_kwargs)
+            subscription = await stripe.Subscription.create_async(
+                customer=customer_id,
+                items=[{"price": PREMIUM_PRICE_ID}],
+                idempotency_key=f"subscription-{user.pk}-{request_key}",
             )
-            return Response(
-                {"message": "Successfully Subscribed"}, status=status.HTTP_201_CREATED
+        except stripe.APIConnectionError:  # Timed out (or unreachable) after the retries.
+            return JsonResponse(
+                {"message": "Payment provider timed out."},
+                status=status.HTTP_504_GATEWAY_TIMEOUT,
+            )
+        except stripe.StripeError as e:
+            return JsonResponse(
+                {"message": str(e)}, status=status.HTTP_400_BAD_REQUEST
             )
 
+        # Update or create the corresponding PremiumUser
+        await PremiumUser.objects.aupdate_or_create(
+            user=user,
+            defaults={
+                "stripe_customer_id": customer_id,
+                "stripe_subscription_id": subscription.id,
+                "has_active_subscription": True,
+            },
+        )
+        return JsonResponse(
+            {"message": "Successfully Subscribed"}, status=status.HTTP_201_CREATED
+        )
+
 
-class PremiumPostsList(PremiumPostMixin, PaginationMixin, generics.ListAPIView):
+class PremiumPostsList(PremiumPostMixin, FeedPaginationMixin, generics.ListAPIView):
     """
     This view returns list of Premium Posts to the Premium Users.
     """
 
-    queryset = Post.objects.all()
+    queryset = Post.objects.for_listing()
     serializer_class = PostSerializer
 
 
@@ -821,9 +877,9 @@ class NotificationsList(generics.ListAPIView):
     This view returns a list of all notifications in the database.
     """
 
-    queryset = Notifications.objects.all()
+    queryset = Notifications.objects.for_inbox().order_by("-created_at", "-id")
     serializer_class = NotificationsSerializier
-    pagination_class = None
+    pagination_class = OptionalPageNumberPagination
 
 
 class UserNotificationList(generics.ListAPIView):
@@ -840,15 +896,16 @@ class UserNotificationList(generics.ListAPIView):
         GET /notifications/1/
 
     Returns:
-        A list of notifications for the specified user.
+        A list of notifications for the specified user (paginated with ?page_size=).
+        * New clients should use the keyset paginated inbox, see InboxAPI *
 
     Raises:
         Http404: If no notifications are found for the user.
     """
 
-    queryset = Notifications.objects.all().order_by("-created_at")
+    queryset = Notifications.objects.for_inbox().order_by("-created_at", "-id")
     serializer_class = NotificationsSerializier
-    pagination_class = None
+    pagination_class = OptionalPageNumberPagination
 
     def get_queryset(self):
         userid = self.kwargs.get("user_id")
@@ -876,3 +933,98 @@ class DetailedNotification(generics.UpdateAPIView):
 
     queryset = Notifications.objects.all()
     serializer_class = NotificationsSerializier
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        reset_unread_count(serializer.instance.user_id)  # 'is_read' may have changed.
+
+
+class InboxAPI(generics.ListAPIView):
+    """
+    Notification inbox of the authenticated user, latest first. (GET)
+
+    * Keyset Pagination over (user, created_at, id), no OFFSET scan and no COUNT(*) *
+    * Post / comment slugs are loaded with JOINs (Notifications.objects.for_inbox()) *
+
+    Query Params:
+        - unread (optional): 'true' -> unread notifications only.
+        - cursor / page_size (optional): see InboxPagination.
+
+    Returns:
+        {"next": url | null, "previous": url | null, "unread_count": int, "results": [...]}
+    """
+
+    serializer_class = NotificationsSerializier
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = InboxPagination
+
+    def get_queryset(self):
+        queryset = Notifications.objects.for_inbox().filter(user=self.request.user)
+        if self.request.query_params.get("unread") == "true":
+            queryset = queryset.filter(is_read=False)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data["unread_count"] = get_unread_count(request.user.id)
+        return response
+
+
+class UnreadNotificationsCountAPI(views.APIView):
+    """
+    Number of unread notifications of the authenticated user. (GET)
+
+    * Served from the cached counter (posts/inbox.py), no COUNT per request *
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        return Response({"unread_count": get_unread_count(request.user.id)})
+
+
+class SocketMetricsAPI(views.APIView):
+    """
+    Open notification sockets and outbound queue depths of every server process. (GET) Staff only.
+
+    Returns:
+        {"processes": [...], "totals": {"connections": int, "queued_messages": int, "max_queue_depth": int, ...}}
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_socket_metrics())
+
+
+class MarkNotificationsReadAPI(views.APIView):
+    """
+    Marks notifications of the authenticated user as read, with one UPDATE. (POST)
+
+    Example usage:
+    POST /posts/notifications/inbox/read/
+    {"ids": [1, 2, 3]}  -> the given notifications.
+    {"all": true}  -> every notification.
+
+    Returns:
+        {"updated": int, "unread_count": int}
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        ids = request.data.get("ids")
+        if request.data.get("all") is True:
+            ids = None
+        elif not isinstance(ids, list) or not all(
+            isinstance(notification_id, int) for notification_id in ids
+        ):
+            return Response(
+                {"error": "Provide 'ids' (list of notification IDs) or 'all': true."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        updated = mark_read(request.user.id, ids)
+        return Response(
+            {"updated": updated, "unread_count": get_unread_count(request.user.id)}
+        )